@@ -0,0 +1,93 @@
+"""
+Асинхронные list/retrieve для ASGI.
+
+Под ASGI Django 3.2 выполняет синхронные представления через
+sync_to_async(thread_sensitive=True), то есть в одном общем потоке
+процесса: один медленный запрос к БД задерживает все остальные. Async
+ORM в Django 3.2 нет, поэтому async_view выполняет безопасные запросы
+(GET, HEAD, OPTIONS) к DRF-представлению целиком - аутентификация,
+кеш, ORM, сериализация и рендеринг - в отдельном пуле из
+ASYNC_DB_THREADS потоков, не занимая ни цикл событий, ни общий поток.
+У каждого потока пула свое соединение c БД, оно закрывается по
+правилам CONN_MAX_AGE, как после обычного запроса. Изменяющие запросы
+идут прежним синхронным путем.
+
+async_reads подменяет представления маршрутов ASYNC_ROUTES; api.urls
+делает это при настройке ASYNC_VIEWS, которую включает asgi.py.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+ASYNC_ROUTES = (
+    'categories-list',
+    'genres-list',
+    'titles-list',
+    'titles-detail',
+    'reviews-list',
+    'reviews-detail',
+)
+
+
+@lru_cache(maxsize=None)
+def db_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='api-db'
+    )
+
+
+def in_db_thread(func, *args, **kwargs):
+    """
+    Выполняет синхронную func в пуле потоков БД c контекстом вызывающей
+    корутины (измерения и проверки запроса). Возвращает awaitable.
+    """
+    def task():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(
+        db_executor(), partial(context.run, task)
+    )
+
+
+def render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
+
+
+def async_view(view):
+    """Асинхронный вариант DRF-представления view."""
+    sync_view = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await in_db_thread(render, view, request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_reads(patterns):
+    """Маршруты patterns c async_view для маршрутов ASYNC_ROUTES."""
+    return [
+        URLPattern(
+            pattern.pattern, async_view(pattern.callback),
+            pattern.default_args, pattern.name,
+        ) if pattern.name in ASYNC_ROUTES else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,304 @@
+"""
+JWT-аутентификация приложения api без запросов к БД.
+
+Токен, выданный access_token_for(), несет роль пользователя и флаги
+is_staff и is_superuser - все, что читают права доступа из
+api.permissions. Пользователь собирается из этих claims как экземпляр
+User c отложенными (deferred) остальными полями: права доступа и
+привязка автора к отзыву обходятся без БД, а обращение к другому полю
+догрузит его. Полная запись пользователя нужна редко (users/me/), ее
+дает full_user().
+
+Токены без claims и полные записи обслуживает LRU-кеш пользователей
+процесса: записи живут AUTH_USER_CACHE_TTL секунд и удаляются при
+изменении пользователя (сигналы api.signals). Изменения в других
+процессах кеш видит по версии user_namespace() в общем кеше.
+
+Отозванные токены (TokenRevocation) проверяются по копии списка отзывов
+в памяти процесса, без запросов к БД. Понижение роли, блокировка и
+удаление пользователя отзывают все его токены (сигналы api.signals),
+иначе claims токена пускали бы его до истечения токена.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_to_epoch
+from users.models import TokenRevocation, User
+
+from .cache import get_versions, invalidate, version_key
+
+USER_CLAIMS = ('username', 'role', 'is_staff', 'is_superuser')
+ACCESS_FIELDS = ('role', 'is_staff', 'is_superuser', 'is_active')
+ROLE_RANKS = {
+    User.Roles.USER: 0,
+    User.Roles.MODERATOR: 1,
+    User.Roles.ADMIN: 2,
+}
+REVOCATION_NAMESPACE = ('token-revocations',)
+
+
+def user_namespace(user_id):
+    """
+    Пространство имен записи пользователя по id: в отличие от username,
+    id не меняется и не устаревает в claims токена.
+    """
+    return ('user', user_id)
+
+
+class UserCache:
+    """
+    Потокобезопасный LRU-кеш записей пользователей c TTL. Отдает копии,
+    чтобы изменения пользователя в одном запросе не видели другие.
+
+    Запись хранит версию user_namespace() пользователя на момент чтения
+    из БД и не отдается, если версия в общем кеше c тех пор сменилась:
+    изменение пользователя в другом процессе сдвигает ее сигналами
+    api.signals.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    def version(self, user_id):
+        """Версия записи пользователя в общем кеше."""
+        return get_versions([user_namespace(user_id)])[0]
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        user, expires, version = entry
+        if (
+            expires < time.monotonic()
+            or version != self.version(user_id)
+        ):
+            self.invalidate(user_id)
+            return None
+        with self.lock:
+            if user_id in self.users:
+                self.users.move_to_end(user_id)
+        return copy.copy(user)
+
+    def set(self, user, version):
+        """
+        Кладет запись в кеш. version - версия из version(), прочитанная
+        до загрузки записи из БД.
+        """
+        with self.lock:
+            self.users[user.pk] = (
+                user, time.monotonic() + self.ttl, version
+            )
+            self.users.move_to_end(user.pk)
+            while len(self.users) > self.size:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+class RevocationList:
+    """
+    Копия действующих отзывов токенов в памяти процесса: множество
+    отозванных jti и отметки пользователей, токены которых, выданные до
+    отметки, отозваны. Проверка токена - поиск в множестве и словаре.
+
+    Список перечитывается из БД, когда в общем кеше меняется версия
+    REVOCATION_NAMESPACE (ее сдвигает каждый отзыв), и не реже раза в
+    TOKEN_REVOCATION_REFRESH секунд - на случай кеша, не общего для
+    процессов.
+    """
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.store(set(), {}, None)
+        self.loaded_at = float('-inf')
+
+    def reset(self):
+        """Пустой список, считающийся только что прочитанным."""
+        self.store(set(), {}, cache.get(version_key(REVOCATION_NAMESPACE)))
+
+    def store(self, jtis, watermarks, version):
+        with self.lock:
+            self.jtis = jtis
+            self.watermarks = watermarks
+            self.version = version
+            self.loaded_at = time.monotonic()
+
+    def load(self, version):
+        jtis = set()
+        watermarks = {}
+        for user_id, jti, created_at in TokenRevocation.active().values_list(
+            'user_id', 'jti', 'created_at'
+        ):
+            if jti:
+                jtis.add(jti)
+            else:
+                # iat токена - целые секунды: токен, выданный в ту же
+                # секунду, что и отзыв, отзывается вместе c ним, клиент
+                # просто получит новый.
+                watermarks[user_id] = max(
+                    watermarks.get(user_id, 0), int(created_at.timestamp())
+                )
+        self.store(jtis, watermarks, version)
+
+    def sync(self):
+        version = cache.get(version_key(REVOCATION_NAMESPACE))
+        if (
+            version is not None and version != self.version
+            or time.monotonic() - self.loaded_at > self.refresh
+        ):
+            self.load(version)
+
+    def is_revoked(self, token):
+        self.sync()
+        if token.get(api_settings.JTI_CLAIM) in self.jtis:
+            return True
+        watermark = self.watermarks.get(
+            token.get(api_settings.USER_ID_CLAIM)
+        )
+        return watermark is not None and issued_at(token) <= watermark
+
+
+user_cache = UserCache(
+    settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL
+)
+revocations = RevocationList(settings.TOKEN_REVOCATION_REFRESH)
+
+
+def access_token_for(user):
+    """Access-токен пользователя c claims для прав доступа."""
+    token = AccessToken.for_user(user)
+    token['iat'] = datetime_to_epoch(token.current_time)
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def issued_at(token):
+    """
+    Время выдачи токена. У токенов без claim iat оно выводится из срока
+    действия.
+    """
+    if 'iat' in token:
+        return token['iat']
+    return token['exp'] - token.lifetime.total_seconds()
+
+
+def is_demoted(old_state, user):
+    """Потерял ли пользователь роль или флаги из old_state."""
+    return (
+        ROLE_RANKS.get(user.role, 0) < ROLE_RANKS.get(old_state['role'], 0)
+        or any(
+            old_state[flag] and not getattr(user, flag)
+            for flag in ('is_staff', 'is_superuser', 'is_active')
+        )
+    )
+
+
+def revoke_user_tokens(user):
+    """Отзывает все выданные пользователю к этому моменту токены."""
+    TokenRevocation.objects.create(
+        user=user,
+        expires_at=(
+            timezone.now() + api_settings.ACCESS_TOKEN_LIFETIME
+        ),
+    )
+    user_cache.invalidate(user.pk)
+    invalidate(REVOCATION_NAMESPACE)
+
+
+def load_user(user_id):
+    """Полная запись пользователя из кеша процесса или БД."""
+    user = user_cache.get(user_id)
+    if user is None:
+        version = user_cache.version(user_id)
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first()
+        if user is not None:
+            user_cache.set(user, version)
+    return user
+
+
+def claims_user(user_id, token):
+    """
+    Пользователь из claims токена: загружены только id и USER_CLAIMS,
+    остальные поля отложены.
+    """
+    values = {api_settings.USER_ID_FIELD: user_id}
+    values.update((claim, token[claim]) for claim in USER_CLAIMS)
+    field_names = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in values
+    ]
+    return User.from_db(
+        DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names]
+    )
+
+
+def full_user(user):
+    """Полная запись пользователя, собранного из claims токена."""
+    if not user.get_deferred_fields():
+        return user
+    return load_user(user.pk) or user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT, которая берет пользователя из кеша процесса
+    или из claims токена и обращается к БД, только если нет ни того,
+    ни другого.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocations.is_revoked(token):
+            raise InvalidToken(_('Token is revoked'))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+        user = user_cache.get(user_id)
+        if user is None and all(
+            claim in validated_token for claim in USER_CLAIMS
+        ):
+            return claims_user(user_id, validated_token)
+        if user is None:
+            user = load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        return user
@@ -0,0 +1,77 @@
+"""
+Кеширование ответов и условные GET-запросы приложения api.
+
+Каждый ответ зависит от набора пространств имен, например ('titles',)
+для списка произведений или ('titles', 5) для произведения c id 5.
+У каждого пространства есть версия - момент последнего изменения его
+данных. Ключ кеша ответа включает версии всех его пространств, поэтому
+для инвалидации достаточно сменить версию: старые записи просто
+перестают быть доступны и вытесняются по таймауту.
+Из тех же версий строятся ETag и Last-Modified для условных GET-запросов.
+
+Версии сдвигают сигналы моделей (reviews.signals, api.signals). Сами
+версии живут CACHE_VERSION_TIMEOUT секунд: изменения в обход сигналов
+(bulk_create, update, load_data) становятся видны не позже, чем через
+это время.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(namespace):
+    return 'version:' + ':'.join(str(part) for part in namespace)
+
+
+def get_versions(namespaces):
+    """
+    Возвращает версии пространств имен в порядке их перечисления.
+    Отсутствующие в кеше версии заводятся текущим временем.
+    """
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time(), settings.CACHE_VERSION_TIMEOUT)
+            versions[key] = cache.get(key, time.time())
+    return [versions[key] for key in keys]
+
+
+def bump_versions(namespaces):
+    """Сдвигает версии пространств имен на текущее время."""
+    cache.set_many(
+        {version_key(namespace): time.time() for namespace in namespaces},
+        settings.CACHE_VERSION_TIMEOUT,
+    )
+
+
+def invalidate(*namespaces):
+    """
+    Инвалидирует пространства имен после фиксации текущей транзакции,
+    чтобы параллельный запрос не закешировал незафиксированные данные
+    под новой версией.
+    """
+    transaction.on_commit(lambda: bump_versions(namespaces))
+
+
+def response_key(request, versions):
+    """Ключ кеша ответа: путь, параметры запроса и версии данных."""
+    raw = f'{request.get_full_path()}|{versions}'
+    return 'response:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def make_etag(request, versions):
+    """
+    Слабый ETag ответа: путь, параметры запроса, формат ответа и версии
+    данных. Для вычисления не нужны ни БД, ни сериализация.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = (
+        f'{request.get_full_path()}|{getattr(renderer, "format", "")}'
+        f'|{versions}'
+    )
+    return 'W/"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
@@ -0,0 +1,45 @@
+"""
+Обертки SQL-запросов на время запроса к API.
+
+connection.execute_wrapper действует только на соединение текущего
+потока, а под ASGI код одного запроса выполняется в нескольких потоках:
+синхронные представления и middleware - в потоке sync_to_async,
+асинхронные представления - в пуле потоков БД (api.asyncviews). Поэтому
+обертки запроса хранятся в ContextVar, который копируется в эти потоки,
+а каждое соединение при создании получает одну постоянную обертку
+dispatch, вызывающую обертки текущего контекста.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_wrappers = ContextVar('execute_wrappers', default=())
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """
+    Аналог connection.execute_wrapper для всех соединений и потоков
+    текущего контекста. Вложенные обертки вызываются снаружи внутрь.
+    """
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
+
+
+def dispatch(execute, sql, params, many, context):
+    for wrapper in reversed(_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_dispatch(sender, connection, **kwargs):
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch)
@@ -0,0 +1,80 @@
+"""
+Выборочные поля ответа (sparse fieldsets).
+
+Параметр ?fields=id,name,rating запроса на чтение оставляет в ответе
+только перечисленные поля, а из БД читаются только нужные им столбцы:
+связи, которых нет среди полей, не присоединяются (select_related) и не
+догружаются (prefetch_related). Вложенные объекты из ?fields=
+выводятся компактно - своим slug, полностью их выводит параметр
+?expand=category,genre. Без ?fields= ответ не меняется.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def split_param(request, param):
+    value = request.query_params.get(param, '')
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fieldset(request):
+    """
+    Поля и раскрываемые связи из параметров запроса на чтение или None,
+    если ответ нужен целиком.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = split_param(request, FIELDS_PARAM)
+    if not fields:
+        return None
+    return set(fields), set(split_param(request, EXPAND_PARAM))
+
+
+def lookup_root(lookup):
+    if isinstance(lookup, Prefetch):
+        lookup = lookup.prefetch_through
+    return lookup.split('__')[0]
+
+
+def trim_queryset(queryset, serializer_fields, ordering=()):
+    """
+    Ограничивает выборку столбцами и связями, которые читают поля
+    serializer_fields, и полями сортировки ordering. Поля, источник
+    которых - свойство или метод модели, оставляют выборку как есть:
+    неизвестно, какие столбцы им нужны.
+    """
+    opts = queryset.model._meta
+    columns = {opts.pk.name}
+    sources = set()
+    for field in serializer_fields:
+        source = field.source.split('.')[0]
+        if source == '*':
+            return queryset
+        try:
+            model_field = opts.get_field(source)
+        except FieldDoesNotExist:
+            if hasattr(queryset.model, source):
+                return queryset
+            continue
+        sources.add(source)
+        if model_field.concrete and not model_field.many_to_many:
+            columns.add(source)
+    columns.update(name.lstrip('-') for name in ordering)
+
+    select_related = queryset.query.select_related
+    prefetch = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if lookup_root(lookup) in sources
+    ]
+    queryset = queryset.only(*columns).prefetch_related(None)
+    if isinstance(select_related, dict):
+        queryset = queryset.select_related(None)
+        joined = [name for name in select_related if name in sources]
+        if joined:
+            queryset = queryset.select_related(*joined)
+    return queryset.prefetch_related(*prefetch)
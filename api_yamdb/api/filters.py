@@ -4,6 +4,8 @@
 import django_filters
 from reviews.models import Title
 
+from .search import search_titles
+
 
 class TitleFilter(django_filters.FilterSet):
     """Фильтр для соритровки произведений."""
@@ -11,7 +13,12 @@ class TitleFilter(django_filters.FilterSet):
     genre = django_filters.Filter(field_name='genre__slug')
     name = django_filters.Filter(field_name='name', lookup_expr='contains')
     year = django_filters.NumberFilter(field_name='year')
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('category', 'genre', 'year', 'name')
+        fields = ('category', 'genre', 'year', 'name', 'search')
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск c сортировкой по релевантности."""
+        return search_titles(queryset, value)
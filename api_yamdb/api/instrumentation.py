@@ -0,0 +1,239 @@
+"""
+Инструментирование запросов.
+
+InstrumentationMiddleware измеряет каждый запрос: полное время ответа,
+число и время SQL-запросов (через api.dbwrappers.execute_wrapper), время
+сериализации (TimedRepresentationMixin сериализаторов api) и размер
+ответа. Измерения отдаются в заголовке Server-Timing ответа и
+накапливаются по маршрутам (titles-list, reviews-detail и т.п.) в
+памяти процесса: их отдает эндпоинт stats/ в JSON или в текстовом
+формате Prometheus (?format=prometheus).
+
+Включается настройкой INSTRUMENTATION_ENABLED. На запрос приходится
+несколько вызовов perf_counter и одна обертка на SQL-запрос, поэтому
+накладные расходы много меньше времени самих запросов.
+"""
+
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+from .dbwrappers import execute_wrapper
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+UNRESOLVED_ROUTE = 'unresolved'
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Измерения одного запроса. Экземпляр - обертка SQL-запросов."""
+    __slots__ = ('queries', 'sql_time', 'serialize_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def current_metrics():
+    """Измерения текущего запроса или None, если он не измеряется."""
+    return _metrics.get()
+
+
+class RouteStats:
+    """Накопленные измерения запросов по маршрутам и методам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, method, status, latency, metrics, size):
+        with self.lock:
+            entry = self.routes.get((route, method))
+            if entry is None:
+                entry = self.routes[(route, method)] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'latency': 0.0,
+                    'latency_max': 0.0,
+                    'queries': 0,
+                    'sql_time': 0.0,
+                    'serialize_time': 0.0,
+                    'bytes': 0,
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                }
+            entry['requests'] += 1
+            entry['errors'] += status >= 500
+            entry['latency'] += latency
+            entry['latency_max'] = max(entry['latency_max'], latency)
+            entry['queries'] += metrics.queries
+            entry['sql_time'] += metrics.sql_time
+            entry['serialize_time'] += metrics.serialize_time
+            entry['bytes'] += size
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    entry['buckets'][index] += 1
+                    break
+
+    def snapshot(self):
+        """Копия измерений: список словарей по маршрутам."""
+        with self.lock:
+            return [
+                dict(entry, route=route, method=method,
+                     buckets=list(entry['buckets']))
+                for (route, method), entry in sorted(self.routes.items())
+            ]
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+stats = RouteStats()
+
+
+def route_name(request):
+    match = request.resolver_match
+    if match is None or not match.view_name:
+        return UNRESOLVED_ROUTE
+    return match.view_name
+
+
+def server_timing(latency, metrics):
+    return (
+        f'db;dur={metrics.sql_time * 1000:.2f};'
+        f'desc="{metrics.queries} queries", '
+        f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+        f'total;dur={latency * 1000:.2f}'
+    )
+
+
+class InstrumentationMiddleware:
+    """
+    Измеряет запросы, если включена настройка INSTRUMENTATION_ENABLED.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with execute_wrapper(metrics):
+                response = await self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        latency = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+        stats.record(
+            route_name(request), request.method, response.status_code,
+            latency, metrics, size,
+        )
+        response['Server-Timing'] = server_timing(latency, metrics)
+        return response
+
+
+def prometheus_lines(snapshot):
+    yield '# HELP yamdb_requests_total Processed requests.'
+    yield '# TYPE yamdb_requests_total counter'
+    for entry in snapshot:
+        yield f'yamdb_requests_total{labels(entry)} {entry["requests"]}'
+    yield '# HELP yamdb_request_errors_total Requests answered with 5xx.'
+    yield '# TYPE yamdb_request_errors_total counter'
+    for entry in snapshot:
+        yield f'yamdb_request_errors_total{labels(entry)} {entry["errors"]}'
+    yield '# HELP yamdb_request_duration_seconds Request latency.'
+    yield '# TYPE yamdb_request_duration_seconds histogram'
+    for entry in snapshot:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, entry['buckets']):
+            cumulative += count
+            yield (
+                'yamdb_request_duration_seconds_bucket'
+                f'{labels(entry, le=bound)} {cumulative}'
+            )
+        yield (
+            'yamdb_request_duration_seconds_bucket'
+            f'{labels(entry, le="+Inf")} {entry["requests"]}'
+        )
+        yield (
+            f'yamdb_request_duration_seconds_sum{labels(entry)} '
+            f'{entry["latency"]}'
+        )
+        yield (
+            f'yamdb_request_duration_seconds_count{labels(entry)} '
+            f'{entry["requests"]}'
+        )
+    for name, key, help_text in (
+        ('yamdb_db_queries_total', 'queries', 'SQL queries.'),
+        ('yamdb_db_duration_seconds_total', 'sql_time',
+         'Time spent in SQL queries.'),
+        ('yamdb_serialization_seconds_total', 'serialize_time',
+         'Time spent in serializers.'),
+        ('yamdb_response_bytes_total', 'bytes', 'Response body bytes.'),
+    ):
+        yield f'# HELP {name} {help_text}'
+        yield f'# TYPE {name} counter'
+        for entry in snapshot:
+            yield f'{name}{labels(entry)} {entry[key]}'
+
+
+def labels(entry, **extra):
+    pairs = {'route': entry['route'], 'method': entry['method'], **extra}
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in pairs.items()
+    ) + '}'
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Текстовый формат Prometheus для снимка RouteStats."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, list):
+            return str(data).encode(self.charset)
+        return ('\n'.join(prometheus_lines(data)) + '\n').encode(
+            self.charset
+        )
@@ -2,12 +2,28 @@
 Миксины и кастомные вьюсеты приложения api.
 """
 
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from reviews.models import Review, Title
+
+from .cache import get_versions, make_etag, response_key
+from .fieldsets import (EXPAND_PARAM, FIELDS_PARAM, requested_fieldset,
+                        trim_queryset)
 
 
 class PartialUpdateModelMixin:
     """Миксин для частичного обновления модели."""
+    def perform_update(self, serializer):
+        serializer.save()
+
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(
@@ -16,7 +32,7 @@ class PartialUpdateModelMixin:
             partial=True
         )
         if serializer.is_valid():
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -48,3 +64,142 @@ class NotPUTViewSet(
     класса. Не поддерживает метод PUT.
     """
     pass
+
+
+class NestedResourceMixin:
+    """
+    Миксин вложенных ресурсов titles/<title_id>/reviews/<review_id>/.
+
+    Родительские объекты загружаются один раз за запрос и доступны
+    вьюсету и его сериализаторам (через context['view']) методами
+    get_title() и get_review(). Отзыв загружается вместе c
+    произведением одним запросом.
+    """
+    def get_title(self):
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title, id=self.kwargs.get('title_id')
+            )
+        return self._title
+
+    def get_review(self):
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.select_related('title'),
+                id=self.kwargs.get('review_id'),
+                title=self.kwargs.get('title_id'),
+            )
+            self._title = self._review.title
+        return self._review
+
+
+class SparseFieldsetViewMixin:
+    """
+    Миксин вьюсета для выборочных полей ответа (api.fieldsets): проверяет
+    параметры ?fields= и ?expand= и читает из БД только то, что нужно
+    запрошенным полям сериализатора. Действия, которые строят выборку
+    не через filter_queryset(), вызывают trim_fieldset() сами.
+    """
+    def filter_queryset(self, queryset):
+        return self.trim_fieldset(super().filter_queryset(queryset))
+
+    def trim_fieldset(self, queryset):
+        fieldset = requested_fieldset(self.request)
+        if fieldset is None:
+            return queryset
+        fields, expand = fieldset
+        serializer_class = self.get_serializer_class()
+        serializer_fields = serializer_class().fields
+        unknown = fields - set(serializer_fields)
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: [
+                'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            ]})
+        unknown = expand - set(getattr(serializer_class, 'compact_fields', {}))
+        if unknown:
+            raise ValidationError({EXPAND_PARAM: [
+                'Нельзя раскрыть поля: ' + ', '.join(sorted(unknown))
+            ]})
+        return trim_queryset(
+            queryset,
+            [serializer_fields[name] for name in fields],
+            getattr(self.pagination_class, 'ordering', ()),
+        )
+
+
+class VersionedResponseMixin:
+    """
+    Базовый миксин условных GET-запросов и кеширования ответов вьюсета.
+
+    Список объектов вьюсета живет в пространстве имен
+    get_list_namespace(), по умолчанию (cache_namespace,), отдельный
+    объект - в том же пространстве, дополненном значением lookup_field.
+    cache_depends_on - пространства, от которых зависят ответы (например,
+    вложенные категории и жанры у произведений, имена авторов у отзывов
+    и комментариев).
+
+    ETag и Last-Modified ответа строятся по версиям этих пространств без
+    обращения к БД, совпавший If-None-Match получает 304. При
+    cache_responses ответы еще и кешируются. Пространства инвалидируют
+    сигналы моделей (reviews.signals, api.signals), поэтому изменения
+    через админку и ORM, включая каскадные удаления, тоже видны сразу.
+    """
+    cache_namespace = None
+    cache_depends_on = ()
+    cache_responses = False
+
+    def get_list_namespace(self):
+        return (self.cache_namespace,)
+
+    def get_cache_namespaces(self):
+        namespace = self.get_list_namespace()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            namespace += (self.kwargs[lookup_url_kwarg],)
+        return [namespace] + [
+            (dependency,) for dependency in self.cache_depends_on
+        ]
+
+    def versioned(self, handler, request, *args, **kwargs):
+        versions = get_versions(self.get_cache_namespaces())
+        etag = make_etag(request, versions)
+        # Last-Modified точен до секунды: округление вниз выдало бы
+        # изменение в той же секунде за уже виденное клиентом.
+        last_modified = math.ceil(max(versions))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.build_response(
+                versions, handler, request, *args, **kwargs
+            )
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def build_response(self, versions, handler, request, *args, **kwargs):
+        if not self.cache_responses:
+            return handler(request, *args, **kwargs)
+        key = response_key(request, versions)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+class VersionedListMixin(VersionedResponseMixin):
+    """Миксин условных GET-запросов и кеширования списка объектов."""
+    def list(self, request, *args, **kwargs):
+        return self.versioned(super().list, request, *args, **kwargs)
+
+
+class VersionedRetrieveMixin(VersionedResponseMixin):
+    """Миксин условных GET-запросов и кеширования отдельного объекта."""
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned(super().retrieve, request, *args, **kwargs)
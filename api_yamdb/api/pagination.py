@@ -0,0 +1,53 @@
+"""
+Пагинация приложения api.
+"""
+
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+
+
+class OptionalCursorPagination(BasePagination):
+    """
+    Постраничная пагинация c опциональным режимом курсора.
+
+    По умолчанию работает как PageNumberPagination. С параметром
+    ?pagination=cursor (и на всех страницах по ссылкам next/previous,
+    которые несут параметр cursor) выдает страницы по ключу ordering
+    без OFFSET и без COUNT(*): страница N стоит столько же, сколько
+    первая, если для ordering есть индекс.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    ordering = ('-id',)
+
+    def get_paginator(self, request):
+        cursor_requested = (
+            request.query_params.get(self.mode_query_param)
+            == self.cursor_mode
+            or CursorPagination.cursor_query_param in request.query_params
+        )
+        if not cursor_requested:
+            return PageNumberPagination()
+        paginator = CursorPagination()
+        paginator.ordering = self.ordering
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+
+class PubDateCursorPagination(OptionalCursorPagination):
+    """Опциональный курсор по (pub_date, id) от новых к старым."""
+    ordering = ('-pub_date', '-id',)
+
+
+class IdCursorPagination(OptionalCursorPagination):
+    """Опциональный курсор по id."""
+    ordering = ('id',)
@@ -0,0 +1,151 @@
+"""
+Контроль SQL-запросов: N+1 и медленные запросы.
+
+QueryGuardMiddleware оборачивает SQL-запросы запроса к API
+(api.dbwrappers.execute_wrapper) и приводит каждый к отпечатку - тексту
+без значений. Если один отпечаток повторяется в запросе
+QUERY_GUARD_REPEAT_THRESHOLD раз, это N+1: выборка в цикле вместо
+select_related/prefetch_related. Запрос дольше QUERY_GUARD_SLOW_MS
+миллисекунд считается медленным.
+
+Режим задает QUERY_GUARD_MODE:
+strict - нарушение поднимает QueryGuardError (так работают тесты);
+sampling - измеряется доля QUERY_GUARD_SAMPLE_RATE запросов, нарушение
+пишется в лог api.queryguard вместе c маршрутом и стеком вызовов;
+off - контроль выключен.
+
+Намеренные повторы (например, поштучные INSERT там, где БД не
+поддерживает пакетную вставку c возвратом id) оборачиваются в
+allow_repeated_queries().
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+
+from .dbwrappers import execute_wrapper
+
+STRICT = 'strict'
+SAMPLING = 'sampling'
+OFF = 'off'
+STACK_DEPTH = 8
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+logger = logging.getLogger(__name__)
+_repeats_allowed = ContextVar('query_guard_repeats_allowed', default=False)
+
+
+class QueryGuardError(Exception):
+    """N+1 или медленный запрос в режиме strict."""
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """SQL без значений: литералы и списки IN (...) заменены на ?."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+@contextmanager
+def allow_repeated_queries():
+    """Отключает поиск N+1 для намеренно повторяющихся запросов."""
+    token = _repeats_allowed.set(True)
+    try:
+        yield
+    finally:
+        _repeats_allowed.reset(token)
+
+
+def project_stack():
+    """Кадры стека из кода проекта, без библиотек и самого модуля."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir)
+        and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class QueryGuard:
+    """Обертка SQL-запросов одного запроса к API."""
+
+    def __init__(self, request, strict):
+        self.request = request
+        self.strict = strict
+        self.counts = {}
+        self.reported = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            return result
+        key = fingerprint(sql)
+        if duration * 1000 > settings.QUERY_GUARD_SLOW_MS:
+            self.report('slow query', key, f'{duration * 1000:.0f} ms')
+        if not _repeats_allowed.get():
+            count = self.counts[key] = self.counts.get(key, 0) + 1
+            if count >= settings.QUERY_GUARD_REPEAT_THRESHOLD:
+                self.report('N+1', key, f'{count} repeats')
+        return result
+
+    def report(self, kind, key, detail):
+        if (kind, key) in self.reported:
+            return
+        self.reported.add((kind, key))
+        match = self.request.resolver_match
+        view = match.view_name if match else self.request.path
+        message = f'{kind} in {view} ({detail}): {key}'
+        if self.strict:
+            raise QueryGuardError(message)
+        logger.warning('%s\n%s', message, project_stack())
+
+
+class QueryGuardMiddleware:
+    """Включает QueryGuard для запроса в режиме QUERY_GUARD_MODE."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        guard = self.guard(request)
+        if guard is None:
+            return self.get_response(request)
+        with execute_wrapper(guard):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        guard = self.guard(request)
+        if guard is None:
+            return await self.get_response(request)
+        with execute_wrapper(guard):
+            return await self.get_response(request)
+
+    def guard(self, request):
+        """QueryGuard для запроса или None, если запрос не проверяется."""
+        mode = settings.QUERY_GUARD_MODE
+        if mode == OFF or (
+            mode == SAMPLING
+            and random.random() >= settings.QUERY_GUARD_SAMPLE_RATE
+        ):
+            return None
+        return QueryGuard(request, strict=mode == STRICT)
@@ -0,0 +1,82 @@
+"""
+Рейтинги произведений.
+
+Общий рейтинг и рейтинги по категории и жанру читаются по индексам
+байесовской оценки weighted_rating, которую сигналы reviews.signals
+поддерживают в Title и копируют в GenreTitle: первые N произведений -
+это первые N записей индекса, без агрегации отзывов и сортировки.
+Рейтинг за период складывается из дневных итогов TitleDailyScore и
+обходит только дни этого периода.
+"""
+
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+from reviews.models import GenreTitle, Title, TitleDailyScore, bayesian_rating
+
+WINDOWS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+}
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def top_titles(queryset, limit=DEFAULT_LIMIT, category=None, genre=None,
+               window=None):
+    """
+    Возвращает до limit произведений queryset c наибольшей байесовской
+    оценкой за все время или за период window. Оценка записывается в
+    атрибут score произведения.
+    """
+    if window:
+        scores = window_scores(window, category, genre)
+    elif genre:
+        scores = genre_scores(genre, category)
+    else:
+        scores = title_scores(category)
+    scores = list(scores[:limit])
+    titles = queryset.in_bulk([title_id for title_id, _ in scores])
+    ranked = []
+    for title_id, score in scores:
+        title = titles.get(title_id)
+        if title is not None:
+            title.score = score
+            ranked.append(title)
+    return ranked
+
+
+def title_scores(category=None):
+    titles = Title.objects.filter(reviews_count__gt=0)
+    if category:
+        titles = titles.filter(category__slug=category)
+    return titles.order_by('-weighted_rating', 'id').values_list(
+        'id', 'weighted_rating'
+    )
+
+
+def genre_scores(genre, category=None):
+    links = GenreTitle.objects.filter(
+        genre__slug=genre, title__reviews_count__gt=0
+    )
+    if category:
+        links = links.filter(title__category__slug=category)
+    return links.order_by('-weighted_rating', 'title').values_list(
+        'title', 'weighted_rating'
+    )
+
+
+def window_scores(window, category=None, genre=None):
+    since = timezone.localdate() - timedelta(days=WINDOWS[window] - 1)
+    days = TitleDailyScore.objects.filter(day__gte=since)
+    if category:
+        days = days.filter(title__category__slug=category)
+    if genre:
+        days = days.filter(title__genre__slug=genre)
+    return days.values('title').annotate(
+        total=Sum('score_sum'), count=Sum('reviews_count')
+    ).filter(count__gt=0).annotate(
+        score=bayesian_rating(F('total'), F('count'))
+    ).order_by('-score', 'title').values_list('title', 'score')
@@ -0,0 +1,157 @@
+"""
+Полнотекстовый поиск произведений.
+
+На PostgreSQL ищет по tsvector названия (вес A) и описания (вес B) c
+префиксным совпадением слов и по триграммному сходству названия, что
+прощает опечатки. Оба условия обслуживаются GIN-индексами из миграции
+reviews.0007_title_search. На остальных БД используется инвертированный
+индекс в памяти процесса, который перестраивается, когда меняются
+произведения (версия SEARCH_NAMESPACE).
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from difflib import get_close_matches
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import Case, F, Q, When
+from django.db.models.expressions import RawSQL
+from reviews.models import Title
+
+from .cache import get_versions
+
+SEARCH_NAMESPACE = ('titles-search',)
+SEARCH_CONFIG = 'simple'
+TITLE_DOCUMENT_SQL = (
+    "setweight(to_tsvector('simple', coalesce({table}name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({table}description, '')), 'B')"
+)
+MAX_RESULTS = 1000
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_PENALTY = 0.8
+TYPO_PENALTY = 0.5
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def search_titles(queryset, query):
+    """Фильтрует произведения по запросу и сортирует по релевантности."""
+    words = tokenize(query)
+    if not words:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return postgres_search(queryset, query, words)
+    ids = title_index().search(words)[:MAX_RESULTS]
+    return queryset.filter(id__in=ids).order_by(Case(
+        *[When(id=title_id, then=position)
+          for position, title_id in enumerate(ids)]
+    ))
+
+
+def postgres_search(queryset, query, words):
+    document = RawSQL(
+        TITLE_DOCUMENT_SQL.format(table=f'"{Title._meta.db_table}".'), [],
+        output_field=SearchVectorField(),
+    )
+    ts_query = SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        config=SEARCH_CONFIG,
+        search_type='raw',
+    )
+    return queryset.annotate(
+        document=document,
+        similarity=TrigramSimilarity('name', query),
+    ).filter(
+        Q(document=ts_query) | Q(name__trigram_similar=query)
+    ).annotate(
+        rank=SearchRank(F('document'), ts_query, cover_density=True),
+    ).order_by('-rank', '-similarity', 'id')
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс названий и описаний произведений.
+
+    Слово запроса совпадает со словом индекса точно, по префиксу или,
+    если таких нет, c опечаткой (difflib); неточные совпадения получают
+    меньший вес. Релевантность - сумма tf-idf совпавших слов, произведения,
+    у которых совпали не все слова запроса, идут ниже.
+    """
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        documents = 0
+        for title_id, name, description in rows:
+            documents += 1
+            for words, weight in (
+                (tokenize(name), NAME_WEIGHT),
+                (tokenize(description), DESCRIPTION_WEIGHT),
+            ):
+                for word in words:
+                    postings = self.postings[word]
+                    postings[title_id] = postings.get(title_id, 0) + weight
+        self.vocabulary = sorted(self.postings)
+        self.idf = {
+            word: math.log(1 + documents / len(postings))
+            for word, postings in self.postings.items()
+        }
+
+    def expand(self, word):
+        """Слова индекса, подходящие под слово запроса, c их весами."""
+        matches = {}
+        if word in self.postings:
+            matches[word] = 1.0
+        position = bisect_left(self.vocabulary, word)
+        while (position < len(self.vocabulary)
+               and self.vocabulary[position].startswith(word)):
+            matches.setdefault(self.vocabulary[position], PREFIX_PENALTY)
+            position += 1
+        if not matches:
+            for match in get_close_matches(word, self.vocabulary, n=3,
+                                           cutoff=0.75):
+                matches[match] = TYPO_PENALTY
+        return matches
+
+    def search(self, words):
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for word in words:
+            hits = {}
+            for match, penalty in self.expand(word).items():
+                for title_id, weight in self.postings[match].items():
+                    score = weight * penalty * self.idf[match]
+                    hits[title_id] = max(hits.get(title_id, 0), score)
+            for title_id, score in hits.items():
+                scores[title_id] += score
+                matched[title_id] += 1
+        return sorted(
+            scores, key=lambda title_id: (
+                -matched[title_id], -scores[title_id], title_id
+            )
+        )
+
+
+_index = {'version': None, 'index': None}
+_index_lock = threading.Lock()
+
+
+def title_index():
+    """Индекс текущей версии произведений, общий для потоков процесса."""
+    version = get_versions([SEARCH_NAMESPACE])[0]
+    with _index_lock:
+        if _index['version'] != version:
+            _index['index'] = InvertedIndex(
+                Title.objects.values_list('id', 'name', 'description')
+                .iterator()
+            )
+            _index['version'] = version
+        return _index['index']
@@ -1,13 +1,75 @@
+import copy
+import time
+
 from django.conf import settings
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
 from users.models import User
 
+from .fieldsets import requested_fieldset
+from .instrumentation import current_metrics
+from .queryguard import allow_repeated_queries
+from .rankings import DEFAULT_LIMIT, MAX_LIMIT, WINDOWS
+
+
+def is_top_level(serializer):
+    """Сериализатор ответа или элемента списка в ответе, не вложенный."""
+    parent = serializer.parent
+    if isinstance(parent, serializers.ListSerializer):
+        parent = parent.parent
+    return parent is None
+
+
+class TimedRepresentationMixin:
+    """
+    Учитывает время сериализации ответа в измерениях запроса
+    (api.instrumentation). Вложенные сериализаторы отдельно не
+    измеряются.
+    """
+
+    def to_representation(self, instance):
+        metrics = current_metrics()
+        if metrics is None or not is_top_level(self):
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+
+
+class SparseFieldsetMixin:
+    """
+    Оставляет в ответе на запрос на чтение только поля из параметра
+    ?fields= (api.fieldsets). Поля из compact_fields выводятся в
+    компактном виде, если их нет в параметре ?expand=. Вложенные
+    сериализаторы выводятся целиком.
+    """
+    compact_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = requested_fieldset(self.context.get('request'))
+        if fieldset is None or not is_top_level(self):
+            return fields
+        requested, expand = fieldset
+        return {
+            name: (
+                copy.deepcopy(self.compact_fields[name])
+                if name in self.compact_fields and name not in expand
+                else field
+            )
+            for name, field in fields.items() if name in requested
+        }
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class CategorySerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                         serializers.ModelSerializer):
 
     class Meta:
         model = Category
@@ -18,7 +80,8 @@ class CategorySerializer(serializers.ModelSerializer):
         }
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                      serializers.ModelSerializer):
 
     class Meta:
         model = Genre
@@ -29,7 +92,8 @@ class GenreSerializer(serializers.ModelSerializer):
         }
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                        serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True,
         slug_field='username',
@@ -41,10 +105,19 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'pub_date',)
 
 
-class TitleSerializer(serializers.ModelSerializer):
+class TitleSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                      serializers.ModelSerializer):
     genre = GenreSerializer(many=True)
     category = CategorySerializer()
     rating = serializers.FloatField(read_only=True)
+    compact_fields = {
+        'genre': serializers.SlugRelatedField(
+            slug_field='slug', many=True, read_only=True
+        ),
+        'category': serializers.SlugRelatedField(
+            slug_field='slug', read_only=True
+        ),
+    }
 
     class Meta:
         model = Title
@@ -59,22 +132,131 @@ class TitleSerializer(serializers.ModelSerializer):
         )
 
 
-class TitleCreateSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
+class TitleRankingSerializer(TitleSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(TitleSerializer.Meta):
+        fields = TitleSerializer.Meta.fields + ('score',)
+
+
+class TitleRankingParamsSerializer(serializers.Serializer):
+    category = serializers.SlugField(required=False)
+    genre = serializers.SlugField(required=False)
+    window = serializers.ChoiceField(choices=tuple(WINDOWS), required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_LIMIT, default=DEFAULT_LIMIT
+    )
+
+
+class PreloadedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    SlugRelatedField, который при пакетной записи берет объекты из
+    загруженных заранее корневым сериализатором, а не из БД.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = getattr(self.root, 'preloaded', None)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if not isinstance(data, str):
+            self.fail('invalid')
+        try:
+            return preloaded[self.queryset.model][data]
+        except KeyError:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field, value=data
+            )
+
+
+class TitleBulkSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание произведений: slug категорий и жанров всех
+    произведений разрешаются одним запросом на модель, произведения и
+    их связи c жанрами вставляются bulk_create в одной транзакции.
+    Ошибки возвращаются списком по одной записи на произведение, при
+    любой ошибке ничего не создается.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > settings.TITLES_BULK_MAX_SIZE:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'Не больше {} произведений за запрос'.format(
+                            settings.TITLES_BULK_MAX_SIZE
+                        )
+                    ]
+                })
+            self.preloaded = self.preload(data)
+        return super().to_internal_value(data)
+
+    def preload(self, data):
+        """
+        Загружает категории и жанры по slug из данных. Значения других
+        типов пропускаются: их отклонит проверка полей.
+        """
+        items = [item for item in data if isinstance(item, dict)]
+        categories = {
+            item['category'] for item in items
+            if isinstance(item.get('category'), str)
+        }
+        genres = {
+            slug for item in items
+            if isinstance(item.get('genre'), list)
+            for slug in item['genre'] if isinstance(slug, str)
+        }
+        return {
+            model: model.objects.in_bulk(list(slugs), field_name='slug')
+            for model, slugs in ((Category, categories), (Genre, genres))
+        }
+
+    def create(self, validated_data):
+        genres = [
+            dict.fromkeys(item.pop('genre')) for item in validated_data
+        ]
+        titles = [Title(**item) for item in validated_data]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Title.objects.bulk_create(titles)
+            else:
+                with allow_repeated_queries():
+                    for title in titles:
+                        title.save()
+            GenreTitle.objects.bulk_create([
+                GenreTitle(title=title, genre=genre)
+                for title, title_genres in zip(titles, genres)
+                for genre in title_genres
+            ])
+        prefetch_related_objects(titles, 'genre')
+        return titles
+
+
+class TitleCreateSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
+    category = PreloadedSlugRelatedField(
         slug_field='slug',
         queryset=Category.objects.all()
     )
-    genre = serializers.SlugRelatedField(
+    genre = PreloadedSlugRelatedField(
         slug_field='slug',
         queryset=Genre.objects.all(), many=True
     )
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'year',
+            'description',
+            'category',
+            'genre',
+        )
+        list_serializer_class = TitleBulkSerializer
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                       serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True,
@@ -87,26 +269,26 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = ('id', 'text', 'author', 'score', 'pub_date',)
 
-    def validate(self, data):
-        title_id = self.context['view'].kwargs.get('title_id')
-        review_exists = Review.objects.filter(
-            author=self.context['request'].user,
-            title=title_id
-        ).count()
-        title = get_object_or_404(
-            Title,
-            id=title_id
-        )
-
-        if self.context['request'].method == 'POST' and review_exists:
-            raise serializers.ValidationError(
-                f'Отзыв на произведение {title.name} уже существует'
-            )
-
-        return data
-
-
-class UserSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        """
+        Повторный отзыв автора на произведение отсекает ограничение
+        unique_review в БД, без предварительной проверки и без гонки
+        между параллельными запросами.
+        """
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            title = validated_data['title']
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Отзыв на произведение {title.name} уже существует'
+                ]
+            })
+
+
+class UserSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                     serializers.ModelSerializer):
     username = serializers.CharField(
         validators=[
             UniqueValidator(queryset=User.objects.all()),
@@ -156,25 +338,50 @@ class UserCreationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Нельзя использовать "me" в качестве username.'
             )
-        if User.objects.filter(username=data).exists():
-            email = self.initial_data.get('email')
-            existing = User.objects.get(username=data)
-            if existing.email != email:
-                raise serializers.ValidationError(
-                    detail='This name already used'
-                )
         return data
 
-    def validate_email(self, data):
-        if User.objects.filter(email=data).exists():
-            username = self.initial_data.get('username')
-            existing = User.objects.get(email=data)
-            if existing.username != username:
-                raise serializers.ValidationError(
-                    detail='This email already used'
-                )
+    def validate(self, data):
+        """
+        Находит одним запросом пользователей c тем же username или email.
+        Повторная регистрация c той же парой возвращает существующего
+        пользователя, занятые другими username или email - ошибки.
+        """
+        self.existing = None
+        errors = {}
+        for user in User.objects.filter(
+            Q(username=data['username']) | Q(email=data['email'])
+        ):
+            same_username = user.username == data['username']
+            if same_username and user.email == data['email']:
+                self.existing = user
+            elif same_username:
+                errors['username'] = ['This name already used']
+            else:
+                errors['email'] = ['This email already used']
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
+    def create(self, validated_data):
+        """
+        Создает пользователя, если его нет. Параллельная регистрация c
+        той же парой username и email получает уже созданного.
+        """
+        if self.existing is not None:
+            return self.existing
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            user = User.objects.filter(**validated_data).first()
+            if user is None:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'This name or email already used'
+                    ]
+                })
+            return user
+
 
 class GetTokenSerializer(serializers.ModelSerializer):
     username = serializers.CharField(
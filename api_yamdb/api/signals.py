@@ -0,0 +1,61 @@
+"""
+Сигналы модели пользователя для кешей и токенов приложения api.
+
+Любое сохранение и удаление пользователя - через api, админку или ORM -
+инвалидирует кеш ответов users/ и запись в кеше аутентификации,
+смена username - еще и ответы отзывов и комментариев c именем автора.
+Удаление, блокировка и понижение роли отзывают все токены
+пользователя: аутентификация по claims не обращается к БД и иначе
+пускала бы его до истечения токена. Массовые update и delete в обход
+сигналов токены не отзывают.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from users.models import User
+
+from .authentication import (ACCESS_FIELDS, is_demoted, revoke_user_tokens,
+                             user_cache, user_namespace)
+from .cache import invalidate
+
+
+@receiver(pre_save, sender=User)
+def remember_old_state(sender, instance, raw=False, **kwargs):
+    """
+    Запоминает прежние username, по которому адресован кеш пользователя,
+    роль и флаги доступа.
+    """
+    instance._old_state = None
+    if raw or instance.pk is None:
+        return
+    instance._old_state = User.objects.filter(pk=instance.pk).values(
+        'username', *ACCESS_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def apply_saved_user(sender, instance, **kwargs):
+    old_state = getattr(instance, '_old_state', None)
+    invalidate_user(instance, old_state)
+    if old_state is not None and is_demoted(old_state, instance):
+        revoke_user_tokens(instance)
+
+
+@receiver(post_delete, sender=User)
+def apply_deleted_user(sender, instance, **kwargs):
+    invalidate_user(instance)
+    revoke_user_tokens(instance)
+
+
+def invalidate_user(user, old_state=None):
+    usernames = {user.username}
+    if old_state is not None:
+        usernames.add(old_state['username'])
+    namespaces = [
+        ('users',), user_namespace(user.pk),
+        *[('users', username) for username in usernames],
+    ]
+    if len(usernames) > 1:
+        namespaces.append(('usernames',))
+    invalidate(*namespaces)
+    user_cache.invalidate(user.pk)
@@ -0,0 +1,163 @@
+"""
+Ограничение частоты запросов к auth/signup/ и auth/token/.
+
+Каждый запрос расходует лимиты по IP-адресу и по username и email из
+тела запроса, лимиты задаются для каждого эндпоинта в
+AUTH_THROTTLE_RATES. Запрос расходует лимиты, только если проходит по
+всем: отклоненный не тратит остаток других лимитов. Проверка идет до
+обращения к БД: отклоненный запрос не стоит ни одного запроса.
+
+IP-адрес берется из X-Forwarded-For c учетом NUM_PROXIES из настроек
+DRF: заголовок, присланный клиентом в обход прокси, не подменяет адрес.
+
+Счетчики хранит бэкенд AUTH_THROTTLE_BACKEND:
+MemoryBackend - token bucket в памяти процесса, для одного процесса;
+CacheBackend - скользящее окно в общем кеше Django для нескольких
+процессов и серверов.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60): число запросов и период в секундах."""
+    number, period = rate.split('/')
+    return int(number), PERIODS[period[0]]
+
+
+class MemoryBackend:
+    """
+    Token bucket в памяти процесса. Корзина вмещает number запросов и
+    пополняется на number за period секунд. Число корзин ограничено
+    max_keys, давно не использованные вытесняются.
+    """
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or settings.AUTH_THROTTLE_MAX_KEYS
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, limits):
+        """
+        Расходует запрос из корзин limits - троек (ключ, number, period),
+        только если в каждой есть запрос. Возвращает ожидание в секундах.
+        """
+        now = time.monotonic()
+        delay = 0
+        with self.lock:
+            buckets = []
+            for key, number, period in limits:
+                refill = number / period
+                tokens, updated = self.buckets.pop(key, (number, now))
+                tokens = min(number, tokens + (now - updated) * refill)
+                if tokens < 1:
+                    delay = max(delay, (1 - tokens) / refill)
+                buckets.append((key, tokens))
+            for key, tokens in buckets:
+                self.buckets[key] = (tokens - (not delay), now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return delay
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBackend:
+    """
+    Скользящее окно в общем кеше: число запросов за последние period
+    секунд оценивается по счетчикам текущего и прошлого окна. Счетчики
+    увеличиваются атомарным cache.incr, а у отклоненного запроса
+    уменьшаются обратно.
+    """
+
+    def hit(self, limits):
+        now = time.time()
+        delay = 0
+        counters = []
+        for key, number, period in limits:
+            window, offset = divmod(now, period)
+            current = f'throttle:{key}:{int(window)}'
+            cache.add(current, 0, period * 2)
+            try:
+                count = cache.incr(current)
+            except ValueError:
+                cache.set(current, 1, period * 2)
+                count = 1
+            counters.append(current)
+            previous = cache.get(f'throttle:{key}:{int(window) - 1}', 0)
+            if previous * (1 - offset / period) + count > number:
+                delay = max(delay, period - offset)
+        if delay:
+            for current in counters:
+                try:
+                    cache.decr(current)
+                except ValueError:
+                    pass
+        return delay
+
+    def clear(self):
+        pass
+
+
+_backend = {}
+
+
+def get_backend():
+    path = settings.AUTH_THROTTLE_BACKEND
+    if path not in _backend:
+        _backend[path] = import_string(path)()
+    return _backend[path]
+
+
+class AuthThrottle(BaseThrottle):
+    """
+    Лимиты эндпоинта scope по IP, username и email. Запрос проходит и
+    расходует их, только если не исчерпан ни один из его лимитов.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        rates = settings.AUTH_THROTTLE_RATES.get(self.scope, {})
+        limits = []
+        for kind, rate in rates.items():
+            value = self.get_value(request, kind)
+            if not value:
+                continue
+            digest = hashlib.md5(value.encode('utf-8')).hexdigest()
+            limits.append(
+                (f'{self.scope}:{kind}:{digest}', *parse_rate(rate))
+            )
+        self.delay = get_backend().hit(limits) if limits else 0
+        return not self.delay
+
+    def get_value(self, request, kind):
+        if kind == 'ip':
+            return self.get_ident(request)
+        if not isinstance(request.data, Mapping):
+            return None
+        value = request.data.get(kind)
+        return value.strip().lower() if isinstance(value, str) else None
+
+    def wait(self):
+        return self.delay
+
+
+class SignupThrottle(AuthThrottle):
+    scope = 'signup'
+
+
+class TokenThrottle(AuthThrottle):
+    scope = 'token'
@@ -3,15 +3,21 @@ URLs приложения api.
 
 router.urls включает адреса для доступа api к
 моделям проекта. auth/token/ и auth/signup/ - это
-адреса для регистрации и аутентификации пользователя.
+адреса для регистрации и аутентификации пользователя,
+stats/ - измерения запросов для администратора.
+
+При ASYNC_VIEWS чтение категорий, жанров, произведений и отзывов
+обслуживают асинхронные представления api.asyncviews.
 '''
 
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .asyncviews import async_reads
 from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
                     ReviewViewSet, TitleViewSet, UserViewSet, get_jwt_token,
-                    signup)
+                    request_stats, signup)
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='categories')
@@ -25,7 +31,10 @@ router.register(r'titles/(?P<title_id>\d+)/reviews/(?P<review_id>\d+)/'
 router.register(r'users', UserViewSet, basename='users')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(
+        async_reads(router.urls) if settings.ASYNC_VIEWS else router.urls
+    )),
     path('auth/token/', get_jwt_token, name='token'),
     path('auth/signup/', signup, name='signup'),
+    path('stats/', request_stats, name='stats'),
 ]
@@ -4,18 +4,20 @@
 
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from users.models import OutgoingEmail
 
 
 def mail_confirmation(request, user):
-    """Подтверждение на почту."""
+    """
+    Подтверждение на почту. Письмо только ставится в очередь, отправляет
+    его команда send_emails.
+    """
 
     confirmation_code = default_token_generator.make_token(user)
 
-    send_mail(
-        'Тема письма',
-        confirmation_code,
-        settings.MAIL,
-        [user.email],
-        fail_silently=False,
+    OutgoingEmail.objects.create(
+        subject='Тема письма',
+        body=confirmation_code,
+        from_email=settings.MAIL,
+        recipient=user.email,
     )
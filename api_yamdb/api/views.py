@@ -3,31 +3,42 @@
 '''
 
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes, throttle_classes)
 from rest_framework.filters import SearchFilter
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import Category, Genre, Title
 from users.models import User
 
+from .authentication import access_token_for, full_user, user_namespace
+from .cache import invalidate
 from .filters import TitleFilter
-from .mixins import ListCreateDestroyViewSet, NotPUTViewSet
+from .instrumentation import PrometheusRenderer, stats
+from .mixins import (ListCreateDestroyViewSet, NestedResourceMixin,
+                     NotPUTViewSet, SparseFieldsetViewMixin,
+                     VersionedListMixin, VersionedRetrieveMixin)
+from .pagination import IdCursorPagination, PubDateCursorPagination
 from .permissions import (AdminOnly, AdminOrReadOnly,
                           AuthorModeratorAdminOrReadOnly)
+from .rankings import top_titles
+from .search import SEARCH_NAMESPACE
 from .serializers import (CategorySerializer, CommentSerializer,
                           GenreSerializer, GetTokenSerializer,
                           ReviewSerializer, TitleCreateSerializer,
+                          TitleRankingParamsSerializer, TitleRankingSerializer,
                           TitleSerializer, UserCreationSerializer,
                           UserSerializer)
+from .throttling import SignupThrottle, TokenThrottle
 from .utils import mail_confirmation
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+class CategoryViewSet(SparseFieldsetViewMixin, VersionedListMixin,
+                      ListCreateDestroyViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса Category
     c функцией поиска по name. GET-запрос доступен всем пользователям.
@@ -38,6 +49,8 @@ class CategoryViewSet(ListCreateDestroyViewSet):
 
     Метод DELETE доступен только администратору. При удалении обязательно
     поле slug.
+
+    Ответы на GET-запросы кешируются до изменения категорий.
     '''
 
     queryset = Category.objects.all()
@@ -46,9 +59,12 @@ class CategoryViewSet(ListCreateDestroyViewSet):
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, SearchFilter,)
     search_fields = ('name',)
+    cache_namespace = 'categories'
+    cache_responses = True
 
 
-class GenreViewSet(ListCreateDestroyViewSet):
+class GenreViewSet(SparseFieldsetViewMixin, VersionedListMixin,
+                   ListCreateDestroyViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса Genre
     c функцией поиска по name. GET-запрос доступен всем пользователям.
@@ -59,6 +75,8 @@ class GenreViewSet(ListCreateDestroyViewSet):
 
     Метод DELETE доступен только администратору. При удалении обязательно
     поле slug.
+
+    Ответы на GET-запросы кешируются до изменения жанров.
     '''
 
     queryset = Genre.objects.all()
@@ -67,14 +85,27 @@ class GenreViewSet(ListCreateDestroyViewSet):
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, SearchFilter,)
     search_fields = ('name',)
+    cache_namespace = 'genres'
+    cache_responses = True
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(SparseFieldsetViewMixin, VersionedListMixin,
+                   VersionedRetrieveMixin, viewsets.ModelViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса Title
     c фильтрацией по name, genre, category и year или вернет конретный
     экземпляр класса Title c указаным title_id. GET-запрос доступен всем
-    пользователям.
+    пользователям. Параметр search ищет по названию и описанию и
+    сортирует результаты по релевантности. Параметры fields и expand
+    ограничивают поля ответа и читаемые из БД столбцы (api.fieldsets).
+
+    POST-запрос к titles/bulk/ со списком произведений создаст их все
+    в одной транзакции или вернет список ошибок по каждому
+    произведению. Доступен только администратору.
+
+    GET-запрос к titles/top/ возвращает limit произведений c наибольшей
+    байесовской оценкой, при необходимости в категории category, жанре
+    genre и за период window (day, week, month).
 
     При POST-запросе создаст экземпляр класса Title. Правом создания
     обладает только администратор. При создании обязательны поля name,
@@ -82,54 +113,110 @@ class TitleViewSet(viewsets.ModelViewSet):
     еще не вышло. Валидация идет на уровне модели.
 
     Методы PATCH и DELETE доступны только администратору.
+
+    Ответы на GET-запросы кешируются до изменения произведения, его
+    отзывов, категорий или жанров.
     '''
 
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')).order_by('rating')
+    queryset = Title.objects.select_related(
+        'category'
+    ).prefetch_related('genre').order_by('rating')
     serializer_class = TitleSerializer
     permission_classes = (AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
+    cache_namespace = 'titles'
+    cache_depends_on = ('categories', 'genres',)
+    cache_responses = True
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH',):
             return TitleCreateSerializer
+        if self.action == 'top':
+            return TitleRankingSerializer
         return TitleSerializer
 
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        # bulk_create не вызывает сигналов reviews.signals.
+        invalidate(self.get_list_namespace(), SEARCH_NAMESPACE)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, url_path='top')
+    def top(self, request):
+        return self.versioned(self.rank, request)
+
+    def rank(self, request):
+        params = TitleRankingParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        titles = top_titles(
+            self.trim_fieldset(self.get_queryset()), **params.validated_data
+        )
+        return Response(self.get_serializer(titles, many=True).data)
+
+
+class ReviewViewSet(NestedResourceMixin, SparseFieldsetViewMixin,
+                    VersionedListMixin, VersionedRetrieveMixin,
+                    viewsets.ModelViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса Review
     относящийся к определенному экземпляру класса Title или вернет конретный
     экземпляр класса Review c указаным title_id и review_id. GET-запрос
     доступен всем пользователям.
 
+    Список c параметром ?pagination=cursor отдается по курсору
+    (pub_date, id) вместо номеров страниц.
+
     При POST-запросе создаст экземпляр класса Review. Правом создания
     обладают только аутентифицированные пользователи. Нельзя написать
     несколько отзывов на одно произведение. Валидация идет на уровне модели.
 
     Методы PATCH и DELETE доступны автору, модератору и администратору.
+
+    Рейтинг произведения обновляется в той же транзакции сигналами
+    reviews.signals, они же инвалидируют кеш отзывов и произведения.
     '''
 
     serializer_class = ReviewSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly,)
+    pagination_class = PubDateCursorPagination
+    cache_namespace = 'reviews'
+    cache_depends_on = ('usernames',)
+
+    def get_list_namespace(self):
+        return (self.cache_namespace, self.kwargs.get('title_id'))
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        return title.reviews.all()
+        return self.get_title().reviews.select_related('author')
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(author=self.request.user, title=self.get_title())
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(NestedResourceMixin, SparseFieldsetViewMixin,
+                     VersionedListMixin, VersionedRetrieveMixin,
+                     viewsets.ModelViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса Comment
     относящийся к определенному экземпляру класса Review и Title
     или вернет конретный экземпляр класса Comment c указаным title_id,
     review_id и comment_id. GET-запрос доступен всем пользователям.
 
+    Список c параметром ?pagination=cursor отдается по курсору
+    (pub_date, id) вместо номеров страниц.
+
     При POST-запросе создаст экземпляр класса Comment. Правом создания
     обладают только аутентифицированные пользователи.
 
@@ -138,27 +225,31 @@ class CommentViewSet(viewsets.ModelViewSet):
 
     serializer_class = CommentSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly,)
+    pagination_class = PubDateCursorPagination
+    cache_namespace = 'comments'
+    cache_depends_on = ('usernames',)
+
+    def get_list_namespace(self):
+        return (self.cache_namespace, self.kwargs.get('review_id'))
 
     def get_queryset(self):
-        title_id = self.kwargs.get('title_id')
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, id=review_id, title=title_id)
-        return review.comments.all()
+        return self.get_review().comments.select_related('author')
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        reviews = title.reviews.all()
-        review = get_object_or_404(reviews, id=self.kwargs.get('review_id'))
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.get_review())
 
 
-class UserViewSet(NotPUTViewSet):
+class UserViewSet(SparseFieldsetViewMixin, VersionedListMixin,
+                  VersionedRetrieveMixin, NotPUTViewSet):
     '''
     При GET-запросе возвращает список всех экземпляров класса User
     или вернет конретный экземпляр класса User c указаным user_id.
     GET-запрос доступен только администратору. Или GET-запрос вернет
     данные учетной записи конкретного аутентифицированного пользователя.
 
+    Список c параметром ?pagination=cursor отдается по курсору
+    (id) вместо номеров страниц.
+
     При POST-запросе создаст экземпляр класса User. Правом создания
     обладает только администратор. Поля username и email должны быть
     уникальны. Валидация идет на уровне модели.
@@ -167,6 +258,10 @@ class UserViewSet(NotPUTViewSet):
     учетно записи или админу для всех учетных записей.
 
     Метод DELETE доступен только администратору.
+
+    Изменение пользователя удаляет его запись из кеша аутентификации
+    api.authentication (сигналы api.signals), понижение роли и удаление
+    отзывают его токены.
     '''
 
     queryset = User.objects.all()
@@ -174,8 +269,14 @@ class UserViewSet(NotPUTViewSet):
     permission_classes = (AdminOnly,)
     filter_backends = (DjangoFilterBackend, SearchFilter,)
     lookup_field = "username"
-    pagination_class = PageNumberPagination
+    pagination_class = IdCursorPagination
     search_fields = ['username', ]
+    cache_namespace = 'users'
+
+    def get_cache_namespaces(self):
+        if self.action == 'me':
+            return [user_namespace(self.request.user.pk)]
+        return super().get_cache_namespaces()
 
     @action(
         detail=False, methods=['get', 'patch'], url_path='me',
@@ -183,17 +284,25 @@ class UserViewSet(NotPUTViewSet):
     )
     def me(self, request):
         if request.method == 'GET':
-            serializer = UserSerializer(request.user)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.versioned(
+                lambda request: Response(
+                    UserSerializer(
+                        full_user(request.user), context={'request': request}
+                    ).data,
+                    status=status.HTTP_200_OK
+                ),
+                request
+            )
 
         if request.method == 'PATCH':
+            user = full_user(request.user)
             serializer = UserSerializer(
-                request.user,
+                user,
                 data=request.data,
                 partial=True
             )
             if serializer.is_valid():
-                serializer.save(role=request.user.role)
+                serializer.save(role=user.role)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
@@ -203,19 +312,16 @@ class UserViewSet(NotPUTViewSet):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([SignupThrottle])
 def signup(request):
-    """Функция регистрации пользователя."""
+    """
+    Функция регистрации пользователя. Частота запросов ограничена по IP,
+    username и email.
+    """
     if request.method == 'POST':
         serializer = UserCreationSerializer(data=request.data)
         if serializer.is_valid():
-            if not User.objects.filter(
-                username=serializer.validated_data['username'],
-                email=serializer.validated_data['email']
-            ).exists():
-                serializer.save()
-            username = serializer.data['username']
-            email = serializer.data['email']
-            user = get_object_or_404(User, username=username, email=email)
+            user = serializer.save()
             mail_confirmation(request, user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -224,8 +330,12 @@ def signup(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([TokenThrottle])
 def get_jwt_token(request):
-    """Функция получения jwt-токена."""
+    """
+    Функция получения jwt-токена. Частота запросов ограничена по IP и
+    username.
+    """
     if request.method == 'POST':
 
         serializer = GetTokenSerializer(data=request.data)
@@ -233,13 +343,25 @@ def get_jwt_token(request):
             username = serializer.data['username']
             confirmation_code = serializer.data['confirmation_code']
             user = get_object_or_404(User, username=username)
-            tokens = RefreshToken.for_user(user)
-            access = str(tokens.access_token)
             if default_token_generator.check_token(user, confirmation_code):
-                return Response({'token': access}, status=status.HTTP_200_OK)
+                return Response(
+                    {'token': str(access_token_for(user))},
+                    status=status.HTTP_200_OK
+                )
             return Response(
                 serializer.data,
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     return None
+
+
+@api_view(['GET'])
+@permission_classes([AdminOnly])
+@renderer_classes([JSONRenderer, PrometheusRenderer])
+def request_stats(request):
+    """
+    Измерения запросов процесса по маршрутам (api.instrumentation) в
+    JSON или c параметром ?format=prometheus в формате Prometheus.
+    """
+    return Response(stats.snapshot())
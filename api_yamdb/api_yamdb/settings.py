@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
@@ -40,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
+    'api.queryguard.QueryGuardMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +88,19 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='yamdb'),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+CACHE_VERSION_TIMEOUT = int(os.getenv('CACHE_VERSION_TIMEOUT', default=3600))
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -131,11 +147,19 @@ LENG_EMAIL = 254
 LENG_CUT = 30
 ROLE_LENG = 15
 
+RATING_PRIOR_MEAN = 5.5
+RATING_PRIOR_WEIGHT = 5
+
+TITLES_BULK_MAX_SIZE = 500
+
 MAIL = 'YaMDb@fake.com'
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', default=100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', default=60))
 
 MESSAGE_EMAIL_EXISTS = 'This email is already taken'
 MESSAGE_USERNAME_EXISTS = 'This name is already taken'
@@ -147,10 +171,13 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     "PAGE_SIZE": 5,
+    # Число прокси перед приложением: в infra это nginx. Адрес клиента для
+    # лимитов берется из X-Forwarded-For, который дописывает nginx.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
 
 SIMPLE_JWT = {
@@ -159,5 +186,32 @@ SIMPLE_JWT = {
 }
 
 AUTH_USER_MODEL = 'users.User'
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', default=10000))
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', default=60))
+TOKEN_REVOCATION_REFRESH = int(os.getenv('TOKEN_REVOCATION_REFRESH', default=60))
+
+AUTH_THROTTLE_BACKEND = os.getenv('AUTH_THROTTLE_BACKEND', default='api.throttling.MemoryBackend')
+AUTH_THROTTLE_MAX_KEYS = int(os.getenv('AUTH_THROTTLE_MAX_KEYS', default=100000))
+AUTH_THROTTLE_RATES = {
+    'signup': {
+        'ip': os.getenv('SIGNUP_THROTTLE_IP', default='30/m'),
+        'username': os.getenv('SIGNUP_THROTTLE_USERNAME', default='5/m'),
+        'email': os.getenv('SIGNUP_THROTTLE_EMAIL', default='5/m'),
+    },
+    'token': {
+        'ip': os.getenv('TOKEN_THROTTLE_IP', default='60/m'),
+        'username': os.getenv('TOKEN_THROTTLE_USERNAME', default='10/m'),
+    },
+}
+
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', default='') == '1'
+
+QUERY_GUARD_MODE = os.getenv('QUERY_GUARD_MODE', default='sampling')
+QUERY_GUARD_SAMPLE_RATE = float(os.getenv('QUERY_GUARD_SAMPLE_RATE', default=0.01))
+QUERY_GUARD_REPEAT_THRESHOLD = int(os.getenv('QUERY_GUARD_REPEAT_THRESHOLD', default=3))
+QUERY_GUARD_SLOW_MS = int(os.getenv('QUERY_GUARD_SLOW_MS', default=200))
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='') == '1'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default=16))
 
 BANNED_NAMES = ['me']
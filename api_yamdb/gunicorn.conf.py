@@ -0,0 +1,30 @@
+"""
+Настройки gunicorn, читаются из текущего каталога при запуске.
+
+SERVER_MODE=sync (по умолчанию) - синхронные воркеры и WSGI-приложение.
+SERVER_MODE=async - воркеры uvicorn и ASGI-приложение: чтение
+категорий, жанров, произведений и отзывов обслуживают асинхронные
+представления api.asyncviews.
+
+В обоих режимах по умолчанию один воркер: кеш ответов и версии данных,
+лимиты MemoryBackend, кеш аутентификации, список отзывов токенов и
+поисковый индекс живут в памяти процесса. Больше воркеров
+(GUNICORN_WORKERS) можно запускать только с общим кешем: CACHE_BACKEND
+на Redis или Memcached и AUTH_THROTTLE_BACKEND=api.throttling.CacheBackend.
+"""
+
+import os
+
+SYNC = 'sync'
+ASYNC = 'async'
+
+mode = os.getenv('SERVER_MODE', SYNC)
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+
+if mode == ASYNC:
+    wsgi_app = 'api_yamdb.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'api_yamdb.wsgi:application'
+
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
@@ -2,7 +2,9 @@
 Настройки админ-зоны приложения views.
 """
 
+from api.authentication import revoke_user_tokens
 from django.contrib import admin
+from users.models import TokenRevocation
 
 from .models import Category, Comment, Genre, GenreTitle, Review, Title, User
 
@@ -69,9 +71,28 @@ class TitleAdmin(admin.ModelAdmin):
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    """Регистрация админ-зоны для модели User."""
+    """
+    Регистрация админ-зоны для модели User.
+
+    Понижение роли отзывает токены пользователя, отозвать их можно и
+    действием revoke_tokens.
+    """
     list_display = ('id', 'email', 'first_name', 'last_name', 'bio', 'role')
     search_fields = ('first_name', 'last_name')
     list_filter = ('role',)
     list_editable = ('role',)
     empty_value_display = '-пусто-'
+    actions = ('revoke_tokens',)
+
+    @admin.action(description='Отозвать все токены')
+    def revoke_tokens(self, request, queryset):
+        for user in queryset:
+            revoke_user_tokens(user)
+        self.message_user(request, f'Отозваны токены: {len(queryset)}')
+
+
+@admin.register(TokenRevocation)
+class TokenRevocationAdmin(admin.ModelAdmin):
+    """Регистрация админ-зоны для модели TokenRevocation."""
+    list_display = ('id', 'user_id', 'jti', 'created_at', 'expires_at',)
+    search_fields = ('jti',)
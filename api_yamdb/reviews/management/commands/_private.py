@@ -0,0 +1,414 @@
+"""
+Вспомогательные функции менеджмент-команд.
+"""
+
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from csv import DictReader
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F
+from reviews.models import (Category, Comment, Genre, GenreTitle, ImportedFile,
+                            ImportedRow, Review, Title, User)
+
+BATCH_SIZE = 5000
+
+
+def read_chunks(path, size):
+    """Читает csv-файл порциями по size строк, не держа его в памяти."""
+    with open(path, encoding='utf-8', newline='') as file:
+        reader = DictReader(file)
+        while True:
+            chunk = list(islice(reader, size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def build_instance(model, fields, row, remaps=None):
+    """
+    Создает экземпляр модели по строке csv.
+
+    fields - словарь «поле модели: колонка csv». Пустые значения
+    внешних ключей превращаются в None. remaps - словарь
+    «модель: {id в csv: id в БД}» для записей, которые при
+    инкрементальной загрузке совпали с уже существующими по
+    естественному ключу и сохранили свой id.
+    """
+    data = {}
+    for field, column in fields.items():
+        value = row[column]
+        if field.endswith('_id') and value == '':
+            value = None
+        elif field.endswith('_id') and remaps:
+            related = model._meta.get_field(field[:-3]).related_model
+            value = remaps.get(related, {}).get(value, value)
+        data[field] = value
+    return model(**data)
+
+
+def insert_rows(model, instances, batch_size=BATCH_SIZE):
+    """
+    Вставляет экземпляры c заданными id, как bulk_create, но без
+    pre_save полей (raw, как loaddata): даты auto_now_add - pub_date
+    отзывов и комментариев - берутся из csv, а не заменяются текущим
+    временем.
+    """
+    fields = model._meta.concrete_fields
+    batch_size = max(1, min(
+        batch_size,
+        connection.ops.bulk_batch_size(fields, instances) or batch_size,
+    ))
+    for start in range(0, len(instances), batch_size):
+        model._base_manager._insert(
+            instances[start:start + batch_size], fields=fields, raw=True
+        )
+
+
+def load_csv(path, model, fields, batch_size=BATCH_SIZE, report=None):
+    """
+    Загружает csv-файл в таблицу модели пачками через insert_rows
+    в одной транзакции. После каждой пачки вызывает report(rows, seconds).
+    Возвращает число загруженных строк.
+    """
+    rows = 0
+    started = time.monotonic()
+    with transaction.atomic():
+        for chunk in read_chunks(path, batch_size):
+            insert_rows(
+                model,
+                [build_instance(model, fields, row) for row in chunk],
+                batch_size=batch_size,
+            )
+            rows += len(chunk)
+            if report is not None:
+                report(rows, time.monotonic() - started)
+    return rows
+
+
+def db_converter(field):
+    """
+    Преобразование значения csv в значение для БД: даты разбираются
+    полем модели, остальное передается как есть.
+    """
+    if field.get_internal_type() != 'DateTimeField':
+        return lambda value: value
+    return lambda value: field.get_db_prep_save(
+        field.to_python(value), connection
+    )
+
+
+def copy_csv(path, model, fields, batch_size=BATCH_SIZE, report=None):
+    """
+    Загружает csv-файл в таблицу модели в обход ORM, поэтому значения
+    полей auto_now_add (даты отзывов и комментариев) сохраняются. В
+    PostgreSQL файл передается в COPY целиком, в других БД строки
+    вставляются через executemany пачками, а даты c часовым поясом
+    приводятся к формату БД полем модели. Колонки идут в порядке fields,
+    все обязательные колонки таблицы должны быть в fields.
+    Возвращает число загруженных строк.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    rows = 0
+    started = time.monotonic()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with open(path, encoding='utf-8', newline='') as file:
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN '
+                    'WITH (FORMAT csv, HEADER true)',
+                    file,
+                )
+            rows = cursor.rowcount
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+            converters = [
+                db_converter(model._meta.get_field(field))
+                for field in fields
+            ]
+            for chunk in read_chunks(path, batch_size):
+                cursor.executemany(sql, [
+                    [
+                        convert(row[column]) for convert, column in zip(
+                            converters, fields.values()
+                        )
+                    ]
+                    for row in chunk
+                ])
+                rows += len(chunk)
+                if report is not None:
+                    report(rows, time.monotonic() - started)
+    return rows
+
+
+def reset_sequences(models):
+    """Сдвигает счетчики первичных ключей за максимальный загруженный id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def file_digest(path):
+    """Считает sha256 содержимого файла, читая его блоками."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_digest(fields, row):
+    """Считает md5 значений строки в колонках, которые идут в модель."""
+    values = '\x1f'.join(row[column] for column in fields.values())
+    return hashlib.md5(values.encode('utf-8')).hexdigest()
+
+
+def is_file_changed(name, digest):
+    """Проверяет, менялся ли файл с прошлой загрузки."""
+    return not ImportedFile.objects.filter(name=name, digest=digest).exists()
+
+
+def load_remaps(name):
+    """Возвращает {id в csv: id в БД} для строк файла, сменивших id."""
+    return {
+        str(key): object_id
+        for key, object_id in ImportedRow.objects.filter(
+            source=name
+        ).exclude(object_id=F('key')).values_list('key', 'object_id')
+    }
+
+
+class Upserter:
+    """
+    Инкрементальная загрузка csv-файла.
+
+    Строка, чей md5 совпадает с сохраненным в ImportedRow, пропускается.
+    Остальные строки обновляют запись с тем же id (или, если ее нет,
+    запись с тем же естественным ключом natural_key) либо создаются
+    заново. Отпечатки строк сохраняются для следующей загрузки.
+
+    track - поле, прежние и новые значения которого у измененных
+    записей собираются в touched, например id произведений, чьи
+    рейтинги нужно пересчитать.
+    """
+
+    def __init__(self, name, model, fields, natural_key=None, remaps=None,
+                 track=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.natural_key = natural_key
+        self.remaps = remaps if remaps is not None else {}
+        self.track = track
+        self.touched = set()
+        self.update_fields = [
+            field.name for field in model._meta.concrete_fields
+            if field.attname in fields
+            and not field.primary_key
+            and not getattr(field, 'auto_now_add', False)
+        ]
+        self.own_remaps = self.remaps.setdefault(model, {})
+        self.own_remaps.update(load_remaps(name))
+
+    def process(self, chunk):
+        """Загружает порцию строк. Возвращает число измененных строк."""
+        known = {
+            str(record.key): record
+            for record in ImportedRow.objects.filter(
+                source=self.name, key__in=[row['id'] for row in chunk]
+            )
+        }
+        changed = {}
+        for row in chunk:
+            digest = row_digest(self.fields, row)
+            record = known.get(row['id'])
+            if record is None or record.digest != digest:
+                instance = build_instance(
+                    self.model, self.fields, row, self.remaps
+                )
+                instance.pk = (
+                    record.object_id if record is not None else int(row['id'])
+                )
+                changed[row['id']] = (instance, digest)
+        if changed:
+            self.save([instance for instance, _ in changed.values()])
+            self.remember(changed, known)
+        return len(changed)
+
+    def save(self, instances):
+        existing = self.model.objects.in_bulk(
+            [instance.pk for instance in instances]
+        )
+        missing = [item for item in instances if item.pk not in existing]
+        if self.natural_key and missing:
+            matches = self.model.objects.in_bulk(
+                [getattr(item, self.natural_key) for item in missing],
+                field_name=self.natural_key,
+            )
+            for instance in missing:
+                match = matches.get(getattr(instance, self.natural_key))
+                if match is not None:
+                    self.own_remaps[str(instance.pk)] = match.pk
+                    instance.pk = match.pk
+                    existing[match.pk] = match
+        if self.track:
+            for item in instances:
+                self.touched.add(int(getattr(item, self.track)))
+                if item.pk in existing:
+                    self.touched.add(
+                        int(getattr(existing[item.pk], self.track))
+                    )
+        self.model.objects.bulk_update(
+            [item for item in instances if item.pk in existing],
+            self.update_fields,
+        )
+        insert_rows(
+            self.model,
+            [item for item in instances if item.pk not in existing],
+        )
+
+    def remember(self, changed, known):
+        records = []
+        for key, (instance, digest) in changed.items():
+            record = known.get(key) or ImportedRow(source=self.name, key=key)
+            record.object_id = instance.pk
+            record.digest = digest
+            records.append(record)
+        ImportedRow.objects.bulk_update(
+            [record for record in records if record.pk],
+            ('object_id', 'digest',),
+        )
+        ImportedRow.objects.bulk_create(
+            [record for record in records if not record.pk]
+        )
+
+
+def upsert_csv(path, upserter, batch_size=BATCH_SIZE, report=None):
+    """
+    Инкрементально загружает csv-файл в одной транзакции, пропуская
+    файл целиком, если его содержимое не менялось с прошлой загрузки.
+    Возвращает пару (прочитано строк, изменено строк) или None,
+    если файл пропущен.
+    """
+    digest = file_digest(path)
+    if not is_file_changed(upserter.name, digest):
+        return None
+    rows = changed = 0
+    started = time.monotonic()
+    with transaction.atomic():
+        for chunk in read_chunks(path, batch_size):
+            changed += upserter.process(chunk)
+            rows += len(chunk)
+            if report is not None:
+                report(rows, time.monotonic() - started)
+        ImportedFile.objects.update_or_create(
+            name=upserter.name, defaults={'digest': digest}
+        )
+    return rows, changed
+
+
+def in_own_connection(task):
+    """
+    Оборачивает задачу для пула потоков: каждый поток работает через
+    свое соединение с БД и закрывает его по завершении задачи.
+    """
+    def wrapper(*args, **kwargs):
+        try:
+            return task(*args, **kwargs)
+        finally:
+            connection.close()
+    return wrapper
+
+
+def run_stages(stages, task, workers=1, report=None):
+    """
+    Выполняет этапы строго по порядку, а задачи внутри этапа - в пуле
+    из workers потоков. После каждого этапа вызывает
+    report(stage, seconds).
+    """
+    for stage in stages:
+        started = time.monotonic()
+        if workers > 1 and len(stage) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(in_own_connection(task), stage))
+        else:
+            for item in stage:
+                task(item)
+        if report is not None:
+            report(stage, time.monotonic() - started)
+
+
+def bulk_insert(model, objects, batch_size=BATCH_SIZE):
+    """Вставляет объекты из итератора пачками, не собирая их в список."""
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def seed_catalogue(titles=1000, reviews_per_title=20, comments_per_review=2,
+                   seed=0, batch_size=BATCH_SIZE, users=100, categories=10,
+                   genres=20):
+    """
+    Заполняет пустую БД синтетическим каталогом для бенчмарков: id
+    задаются явно, поэтому вставка идет через bulk_create на любой БД.
+    Пользователей создается не меньше, чем отзывов на произведение.
+    """
+    rng = random.Random(seed)
+    users = max(reviews_per_title, comments_per_review, users)
+    bulk_insert(User, (
+        User(id=index, username=f'user{index}',
+             email=f'user{index}@yamdb.fake')
+        for index in range(1, users + 1)
+    ), batch_size)
+    bulk_insert(Category, (
+        Category(id=index, name=f'Категория {index}', slug=f'category{index}')
+        for index in range(1, categories + 1)
+    ), batch_size)
+    bulk_insert(Genre, (
+        Genre(id=index, name=f'Жанр {index}', slug=f'genre{index}')
+        for index in range(1, genres + 1)
+    ), batch_size)
+    bulk_insert(Title, (
+        Title(id=index, name=f'Произведение {rng.random():.8f}',
+              year=rng.randint(1900, 2020),
+              category_id=rng.randint(1, categories))
+        for index in range(1, titles + 1)
+    ), batch_size)
+    bulk_insert(GenreTitle, (
+        GenreTitle(title_id=title, genre_id=genre)
+        for title in range(1, titles + 1)
+        for genre in rng.sample(
+            range(1, genres + 1), rng.randint(1, min(3, genres))
+        )
+    ), batch_size)
+    bulk_insert(Review, (
+        Review(id=(title - 1) * reviews_per_title + number + 1,
+               title_id=title, author_id=author, text='Отзыв',
+               score=rng.randint(1, 10))
+        for title in range(1, titles + 1)
+        for number, author in enumerate(
+            rng.sample(range(1, users + 1), reviews_per_title)
+        )
+    ), batch_size)
+    bulk_insert(Comment, (
+        Comment(review_id=review, author_id=rng.randint(1, users),
+                text='Комментарий')
+        for review in range(1, titles * reviews_per_title + 1)
+        for _ in range(comments_per_review)
+    ), batch_size)
+    reset_sequences([User, Category, Genre, Title, GenreTitle, Review,
+                     Comment])
+    Title.rebuild_ratings()
@@ -0,0 +1,231 @@
+"""
+Генерация синтетического каталога.
+
+Функции модуля не обращаются к Django и БД: они выполняются в
+процессах пула, и каждый процесс пишет строки своей порции произведений
+в csv-файлы сразу, не собирая их в памяти. Случайность порции задается
+сидом и номером порции, поэтому результат не зависит от числа процессов.
+
+Распределения:
+число отзывов на произведение убывает по закону Ципфа от его ранга
+популярности (ранги перемешаны по id), но не больше числа пользователей;
+число комментариев к отзыву - хвост Парето: у большинства отзывов их нет
+или мало, у редких - сотни;
+у произведения от одного до четырех жанров, популярность жанров и
+категорий тоже по Ципфу;
+годы выпуска сгущаются к текущему, даты отзывов - к сегодняшнему дню.
+Даты пишутся в UTC c явным смещением +0000.
+"""
+
+import csv
+import math
+import os
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+WORDS = (
+    'тихий', 'ветер', 'город', 'ночь', 'море', 'последний', 'день', 'дом',
+    'звезда', 'дорога', 'старый', 'сад', 'история', 'время', 'огонь',
+    'белый', 'снег', 'песня', 'тень', 'река', 'свет', 'долгий', 'путь',
+    'сердце', 'зима', 'лето', 'король', 'остров', 'тайна', 'мост',
+    'отличный', 'скучный', 'сюжет', 'финал', 'герой', 'музыка', 'стоит',
+    'посмотреть', 'прочитать', 'слишком', 'очень', 'совсем', 'немного',
+)
+PART_FILES = ('titles.csv', 'genre_title.csv', 'review.csv', 'comments.csv')
+GENRE_COUNTS = (1, 2, 3, 4)
+GENRE_COUNT_WEIGHTS = (50, 30, 15, 5)
+COMMENTS_TAIL = 2.5
+MAX_COMMENTS = 1000
+QUALITY_MEAN = 6.5
+QUALITY_SPREAD = 1.5
+SCORE_SPREAD = 2
+FIRST_YEAR = 1900
+YEARS_MEAN_AGE = 15
+REVIEW_DAYS = 3 * 365
+REPLY_DAYS = 2
+ADMINS_SHARE = 0.001
+MODERATORS_SHARE = 0.01
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S%z'
+MAX_TEXT = 256
+
+
+def harmonic(count, exponent):
+    """Нормирующая сумма закона Ципфа по рангам 1..count."""
+    return math.fsum(rank ** -exponent for rank in range(1, count + 1))
+
+
+def zipf_cum_weights(count, exponent=1):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(accumulate(
+        rank ** -exponent for rank in range(1, count + 1)
+    ))
+
+
+def stream(spec, name, index):
+    """Независимый генератор случайных чисел порции index."""
+    return random.Random(f'{spec["seed"]}:{name}:{index}')
+
+
+def reviews_count(spec, rank):
+    """Число отзывов на произведение ранга rank."""
+    expected = spec['reviews'] * rank ** -spec['zipf'] / spec['harmonic']
+    return min(spec['users'], round(expected))
+
+
+def genres_count(rng, spec):
+    return min(
+        spec['genres'], rng.choices(GENRE_COUNTS, GENRE_COUNT_WEIGHTS)[0]
+    )
+
+
+def comments_count(rng, spec):
+    """Число комментариев к отзыву со средним spec['comments']."""
+    tail = (COMMENTS_TAIL - 1) * (rng.paretovariate(COMMENTS_TAIL) - 1)
+    return min(MAX_COMMENTS, round(spec['comments'] * tail))
+
+
+def sentence(rng, low, high):
+    words = ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+    return words.capitalize()[:MAX_TEXT]
+
+
+def plan_chunk(spec, task):
+    """
+    Размер порции: число отзывов, связей c жанрами и комментариев.
+    По нему родительский процесс вычисляет первые id каждой порции.
+    Числа тянутся из тех же генераторов, что и в write_chunk.
+    """
+    index, ranks = task
+    genre_rng = stream(spec, 'genre-count', index)
+    comment_rng = stream(spec, 'comment-count', index)
+    reviews = genre_titles = comments = 0
+    for rank in ranks:
+        count = reviews_count(spec, rank)
+        reviews += count
+        genre_titles += genres_count(genre_rng, spec)
+        comments += sum(
+            comments_count(comment_rng, spec) for _ in range(count)
+        )
+    return reviews, genre_titles, comments
+
+
+def part_path(directory, filename, index):
+    return os.path.join(directory, f'{filename}.{index:06d}')
+
+
+class ChunkWriter:
+    """
+    Пишет порцию произведений и их жанры, отзывы и комментарии в
+    csv-файлы без заголовков, колонки - в порядке SOURCES load_data.
+    """
+
+    def __init__(self, spec, index, first_ids):
+        self.spec = spec
+        self.rng = stream(spec, 'rows', index)
+        self.genre_rng = stream(spec, 'genre-count', index)
+        self.comment_rng = stream(spec, 'comment-count', index)
+        self.genre_title_id, self.review_id, self.comment_id = first_ids
+        self.categories = zipf_cum_weights(spec['categories'])
+        self.genres = zipf_cum_weights(spec['genres'])
+        self.users = range(1, spec['users'] + 1)
+        self.now = spec['now']
+
+    def write(self, files, first_title, ranks):
+        titles, genre_titles, reviews, comments = (
+            csv.writer(file) for file in files
+        )
+        for title_id, rank in enumerate(ranks, first_title):
+            titles.writerow(self.title_row(title_id))
+            for genre in self.sample_genres():
+                genre_titles.writerow((self.genre_title_id, genre, title_id))
+                self.genre_title_id += 1
+            self.write_reviews(reviews, comments, title_id, rank)
+
+    def title_row(self, title_id):
+        rng = self.rng
+        age = min(
+            int(rng.expovariate(1 / YEARS_MEAN_AGE)),
+            self.now.year - 1 - FIRST_YEAR,
+        )
+        description = sentence(rng, 5, 30) if rng.random() < 0.7 else ''
+        category = rng.choices(
+            range(1, self.spec['categories'] + 1),
+            cum_weights=self.categories,
+        )[0]
+        return (
+            title_id, sentence(rng, 1, 4), self.now.year - 1 - age,
+            description, category,
+        )
+
+    def sample_genres(self):
+        count = genres_count(self.genre_rng, self.spec)
+        genres = set()
+        while len(genres) < count:
+            genres.update(self.rng.choices(
+                range(1, self.spec['genres'] + 1),
+                cum_weights=self.genres, k=count - len(genres),
+            ))
+        return sorted(genres)
+
+    def write_reviews(self, reviews, comments, title_id, rank):
+        rng = self.rng
+        quality = rng.gauss(QUALITY_MEAN, QUALITY_SPREAD)
+        authors = rng.sample(self.users, reviews_count(self.spec, rank))
+        for author in authors:
+            published = self.now - timedelta(
+                days=REVIEW_DAYS * rng.random() ** 2
+            )
+            score = min(10, max(1, round(rng.gauss(quality, SCORE_SPREAD))))
+            reviews.writerow((
+                self.review_id, title_id, sentence(rng, 3, 40), author,
+                score, published.strftime(DATE_FORMAT),
+            ))
+            for _ in range(comments_count(self.comment_rng, self.spec)):
+                replied = min(self.now, published + timedelta(
+                    days=rng.expovariate(1 / REPLY_DAYS)
+                ))
+                comments.writerow((
+                    self.comment_id, sentence(rng, 2, 20),
+                    replied.strftime(DATE_FORMAT), rng.choice(self.users),
+                    self.review_id,
+                ))
+                self.comment_id += 1
+            self.review_id += 1
+
+
+def write_chunk(spec, directory, task):
+    """Пишет порцию в файлы part_path(directory, PART_FILES, index)."""
+    index, first_title, ranks, first_ids = task
+    files = [
+        open(part_path(directory, filename, index), 'w', encoding='utf-8',
+             newline='')
+        for filename in PART_FILES
+    ]
+    try:
+        ChunkWriter(spec, index, first_ids).write(files, first_title, ranks)
+    finally:
+        for file in files:
+            file.close()
+    return index
+
+
+def user_rows(spec):
+    rng = stream(spec, 'users', 0)
+    for user_id in range(1, spec['users'] + 1):
+        chance = rng.random()
+        if chance < ADMINS_SHARE:
+            role = 'admin'
+        elif chance < ADMINS_SHARE + MODERATORS_SHARE:
+            role = 'moderator'
+        else:
+            role = 'user'
+        bio = sentence(rng, 3, 15) if rng.random() < 0.2 else ''
+        yield (
+            user_id, f'user{user_id}', f'user{user_id}@yamdb.fake', role, bio
+        )
+
+
+def slug_rows(count, name, slug):
+    for item_id in range(1, count + 1):
+        yield item_id, f'{name} {item_id}', f'{slug}-{item_id}'
@@ -0,0 +1,277 @@
+"""
+Нагрузочный бенчмарк api.
+"""
+
+import json
+import math
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from api.authentication import access_token_for
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+from ._private import seed_catalogue
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def percentile(values, rank):
+    """Процентиль rank отсортированного списка по ближайшему рангу."""
+    if not values:
+        return None
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def api_endpoints():
+    """
+    Маршруты api.urls c объектами из БД: (имя, адрес, нужен ли токен
+    администратора).
+    """
+    title = Title.objects.filter(reviews_count__gt=0).order_by('id').first()
+    review = Review.objects.filter(title=title).order_by('id').first()
+    comment = Comment.objects.filter(review=review).order_by('id').first()
+    titles = reverse('titles-list')
+    reviews = reverse('reviews-list', args=[title.id])
+    comments = reverse('comments-list', args=[title.id, review.id])
+    genre = title.genre.order_by('id').first()
+    endpoints = [
+        ('categories-list', reverse('categories-list'), False),
+        ('genres-list', reverse('genres-list'), False),
+        ('titles-list', titles, False),
+        ('titles-list fields', titles + '?fields=id,name,rating', False),
+        ('titles-list genre', titles + f'?genre={genre.slug}', False),
+        ('titles-list search', titles + '?search=Произведение', False),
+        ('titles-top', reverse('titles-top'), False),
+        ('titles-detail', reverse('titles-detail', args=[title.id]), False),
+        ('reviews-list', reviews, False),
+        ('reviews-list cursor', reviews + '?pagination=cursor', False),
+        ('reviews-detail',
+         reverse('reviews-detail', args=[title.id, review.id]), False),
+        ('comments-list', comments, False),
+        ('users-list', reverse('users-list'), True),
+        ('users-me', reverse('users-me'), True),
+    ]
+    if comment is not None:
+        endpoints.append((
+            'comments-detail',
+            reverse('comments-detail', args=[title.id, review.id,
+                                             comment.id]),
+            False,
+        ))
+    return endpoints
+
+
+def measure(url, headers, requests, concurrency):
+    """
+    Выполняет requests GET-запросов к url в concurrency потоках, у
+    каждого потока свой клиент и соединение c БД. Возвращает сводку:
+    процентили времени ответа в мс, пропускную способность, число
+    SQL-запросов на запрос (из заголовка Server-Timing) и ошибки.
+    """
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    results = []
+
+    def worker():
+        client = Client(**headers)
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                response = client.get(url)
+                latency = time.perf_counter() - started
+                match = QUERIES_PATTERN.search(
+                    response.get('Server-Timing', '')
+                )
+                results.append((
+                    latency,
+                    int(match.group(1)) if match else 0,
+                    response.status_code >= 400,
+                ))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _, _ in results)
+    return {
+        'requests': requests,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': sum(latencies) / len(latencies),
+        'throughput_rps': requests / elapsed,
+        'queries_per_request': (
+            sum(queries for _, queries, _ in results) / requests
+        ),
+        'errors': sum(error for _, _, error in results),
+    }
+
+
+def run_suite(requests, concurrency, warmup=0, names=None):
+    """Бенчмарк маршрутов api_endpoints() на текущей БД."""
+    admin = User.objects.filter(role=User.Roles.ADMIN).first()
+    if admin is None:
+        admin = User.objects.create(
+            username='benchmark-admin', email='benchmark@yamdb.fake',
+            role=User.Roles.ADMIN,
+        )
+    admin_headers = {
+        'HTTP_AUTHORIZATION': f'Bearer {access_token_for(admin)}'
+    }
+    results = {}
+    for name, url, as_admin in api_endpoints():
+        if names and name not in names:
+            continue
+        headers = admin_headers if as_admin else {}
+        if warmup:
+            measure(url, headers, warmup, concurrency)
+        results[name] = dict(
+            measure(url, headers, requests, concurrency), url=url
+        )
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    '''
+    Создает тестовую БД, заполняет ее синтетическим каталогом заданного
+    размера через bulk_create и нагружает маршруты api.urls
+    параллельными GET-запросами встроенного клиента Django: запросы
+    проходят весь стек middleware, представлений и сериализаторов, но
+    без сети. Для каждого маршрута выводит процентили p50/p95/p99
+    времени ответа, пропускную способность и число SQL-запросов на
+    запрос. Рабочая БД не затрагивается, сервер не нужен.
+
+    --output сохраняет результаты в JSON вместе c коммитом и
+    параметрами запуска, --compare сравнивает их c сохраненными ранее.
+    По умолчанию ответы кешируются, как в продакшене; --no-cache
+    измеряет путь до БД.
+    '''
+    help = "Load-tests API routes and reports latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--titles', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--reviews', type=int, default=20,
+                            help='Reviews per title')
+        parser.add_argument('--comments', type=int, default=2,
+                            help='Comments per review')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoint', action='append', dest='names',
+                            help='Benchmark only these endpoints')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Disable the response cache')
+        parser.add_argument('--output', help='Save results to a JSON file')
+        parser.add_argument('--compare',
+                            help='JSON file of an earlier run to compare')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            started = time.perf_counter()
+            seed_catalogue(
+                options['titles'], options['reviews'], options['comments'],
+                users=options['users'], categories=options['categories'],
+                genres=options['genres'],
+            )
+            self.stdout.write(
+                f'Seeded in {time.perf_counter() - started:.1f} s'
+            )
+            overrides = {
+                'INSTRUMENTATION_ENABLED': True,
+                'QUERY_GUARD_MODE': 'off',
+            }
+            if options['no_cache']:
+                overrides['CACHES'] = DUMMY_CACHE
+            with override_settings(**overrides):
+                endpoints = run_suite(
+                    options['requests'], options['concurrency'],
+                    options['warmup'], options['names'],
+                )
+            vendor = connection.vendor
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'commit': current_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': vendor,
+            'options': {
+                name: options[name] for name in (
+                    'users', 'titles', 'categories', 'genres', 'reviews',
+                    'comments', 'requests', 'concurrency', 'warmup',
+                    'no_cache',
+                )
+            },
+            'endpoints': endpoints,
+        }
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['endpoints']
+        self.print_report(endpoints, previous)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Saved to {options["output"]}')
+
+    def print_report(self, endpoints, previous=None):
+        self.stdout.write(self.style.SUCCESS(
+            f'{"endpoint":<22} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"queries":>8} {"errors":>7}'
+        ))
+        for name, result in endpoints.items():
+            line = (
+                f'{name:<22} {result["throughput_rps"]:>8.1f} '
+                f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                f'{result["p99_ms"]:>8.2f} '
+                f'{result["queries_per_request"]:>8.1f} '
+                f'{result["errors"]:>7}'
+            )
+            old = (previous or {}).get(name)
+            if old:
+                line += ' rps {:+.0%}, p95 {:+.0%}'.format(
+                    result['throughput_rps'] / old['throughput_rps'] - 1,
+                    result['p95_ms'] / old['p95_ms'] - 1,
+                )
+            self.stdout.write(line)
@@ -0,0 +1,113 @@
+"""
+Бенчмарк индексов под запросы api.
+"""
+
+import statistics
+import time
+
+from django.apps import apps as current_apps
+from django.core.management import BaseCommand, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from ._private import seed_catalogue
+
+BEFORE_MIGRATION = '0004_import_state'
+
+
+def historical_apps(migration):
+    """Модели проекта в состоянии после миграции reviews migration."""
+    return MigrationExecutor(connection).loader.project_state(
+        ('reviews', migration)
+    ).apps
+
+
+def hot_queries(apps):
+    """
+    Запросы, которые api выполняет на каждой странице, через модели
+    apps: текущие или исторические, соответствующие схеме БД.
+    """
+    titles = apps.get_model('reviews', 'Title').objects
+    reviews = apps.get_model('reviews', 'Review').objects
+    comments = apps.get_model('reviews', 'Comment').objects
+    genre_titles = apps.get_model('reviews', 'GenreTitle').objects
+    title = titles.order_by('id').first()
+    review = reviews.filter(title=title).order_by('id').first()
+    genre_title = genre_titles.order_by('id').first()
+    return (
+        ('reviews of title', reviews.filter(
+            title=title).order_by('-pub_date', '-id')[:5]),
+        ('comments of review', comments.filter(
+            review=review).order_by('-pub_date', '-id')[:5]),
+        ('titles by year', titles.filter(
+            year=title.year).order_by('rating')[:5]),
+        ('titles by category', titles.filter(
+            category=title.category_id).order_by('rating')[:5]),
+        ('titles by genre', titles.filter(
+            genretitle__genre=genre_title.genre_id).order_by('rating')[:5]),
+        ('titles by rating', titles.order_by('rating')[:5]),
+        ('titles by name', titles.order_by('name')[:5]),
+        ('genre of title', genre_titles.filter(
+            genre=genre_title.genre_id, title=genre_title.title_id)),
+    )
+
+
+class Command(BaseCommand):
+    '''
+    Создает тестовую БД, заполняет ее синтетическим каталогом по
+    текущей схеме, откатывает миграции reviews до --before и показывает
+    планы EXPLAIN и медианное время горячих запросов api через
+    исторические модели этой миграции. Затем накатывает оставшиеся
+    миграции c индексами и повторяет замеры. Рабочая БД не затрагивается.
+    '''
+    help = "Compares query plans and timings before and after indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=20,
+                            help='Reviews per title')
+        parser.add_argument('--comments', type=int, default=2,
+                            help='Comments per review')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs of every query')
+        parser.add_argument('--before', default=BEFORE_MIGRATION,
+                            help='reviews migration without the indexes')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            seed_catalogue(
+                options['titles'], options['reviews'], options['comments']
+            )
+            call_command('migrate', 'reviews', options['before'], verbosity=0)
+            before = self.measure(
+                'before', options['repeat'],
+                historical_apps(options['before']),
+            )
+            call_command('migrate', 'reviews', verbosity=0)
+            after = self.measure('after', options['repeat'], current_apps)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(self.style.SUCCESS('Median time, ms'))
+        for name, timing in before.items():
+            self.stdout.write(
+                f'{name:<20} {timing:>10.3f} -> {after[name]:>10.3f}'
+            )
+
+    def measure(self, phase, repeat, apps):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        timings = {}
+        for name, queryset in hot_queries(apps):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{phase}: {name}'))
+            self.stdout.write(queryset.explain())
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(runs)
+        return timings
@@ -0,0 +1,182 @@
+"""
+Бенчмарк синхронного и асинхронного режимов сервера.
+"""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from api.asyncviews import ASYNC_ROUTES
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from reviews.models import Title
+
+from .benchmark_api import api_endpoints, percentile
+
+MODES = ('sync', 'async')
+HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 30
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+def http_load(port, urls, requests, concurrency, host=HOST):
+    """
+    Выполняет requests GET-запросов по кругу к адресам urls в
+    concurrency потоках, каждый запрос - в новом соединении. Возвращает
+    пропускную способность, процентили времени ответа в мс и ошибки.
+    """
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def worker():
+        while True:
+            with lock:
+                number = next(remaining, None)
+            if number is None:
+                return
+            started = time.perf_counter()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            try:
+                connection.request('GET', urls[number % len(urls)])
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except OSError:
+                failed = True
+            finally:
+                connection.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'errors': sum(errors),
+    }
+
+
+def wait_for_port(process, port, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Server exited with code {process.returncode}')
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Server did not start in {timeout} s')
+
+
+class Command(BaseCommand):
+    '''
+    Сравнивает режимы сервера из gunicorn.conf.py: синхронные воркеры
+    (SERVER_MODE=sync) и воркеры uvicorn c асинхронными представлениями
+    (SERVER_MODE=async). Для каждого режима запускает gunicorn c
+    --workers воркерами на текущей БД и нагружает по HTTP маршруты
+    ASYNC_ROUTES при каждом уровне --concurrency одновременных
+    соединений, затем выводит пропускную способность и процентили
+    времени ответа, а также отношение пропускной способности async к
+    sync.
+
+    Нужна БД c данными, например после generate_data --format db.
+    --no-cache отключает кеш ответов, иначе меряется в основном кеш.
+    '''
+    help = "Compares sync and async server throughput under load"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--concurrency', nargs='+', type=int,
+                            default=[1, 16, 64],
+                            help='Concurrent connections, one run per value')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Requests per run')
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='Unmeasured requests after server start')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Gunicorn workers in both modes')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Disable the response cache')
+
+    def handle(self, *args, **options):
+        if not Title.objects.filter(reviews_count__gt=0).exists():
+            raise CommandError(
+                'No reviewed titles: fill the database first, for example '
+                'with generate_data --format db'
+            )
+        urls = [
+            url for name, url, _ in api_endpoints() if name in ASYNC_ROUTES
+        ]
+        results = {}
+        for mode in options['modes']:
+            process = self.start_server(mode, options)
+            try:
+                wait_for_port(process, options['port'])
+                if options['warmup']:
+                    http_load(options['port'], urls, options['warmup'], 1)
+                results[mode] = [
+                    http_load(options['port'], urls, options['requests'],
+                              concurrency)
+                    for concurrency in options['concurrency']
+                ]
+            finally:
+                process.terminate()
+                process.wait()
+        self.print_report(results)
+
+    def start_server(self, mode, options):
+        env = dict(
+            os.environ,
+            SERVER_MODE=mode,
+            GUNICORN_BIND=f'{HOST}:{options["port"]}',
+            GUNICORN_WORKERS=str(options['workers']),
+            QUERY_GUARD_MODE='off',
+        )
+        if options['no_cache']:
+            env['CACHE_BACKEND'] = DUMMY_CACHE
+        return subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn'), cwd=settings.BASE_DIR,
+            env=env, stdout=subprocess.DEVNULL,
+        )
+
+    def print_report(self, results):
+        self.stdout.write(self.style.SUCCESS(
+            f'{"mode":<6} {"conns":>6} {"rps":>8} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"errors":>7}'
+        ))
+        for mode, runs in results.items():
+            for run in runs:
+                self.stdout.write(
+                    f'{mode:<6} {run["concurrency"]:>6} '
+                    f'{run["throughput_rps"]:>8.1f} {run["p50_ms"]:>8.2f} '
+                    f'{run["p95_ms"]:>8.2f} {run["p99_ms"]:>8.2f} '
+                    f'{run["errors"]:>7}'
+                )
+        if set(MODES) <= set(results):
+            for sync, asynchronous in zip(results['sync'], results['async']):
+                ratio = asynchronous['throughput_rps'] / sync['throughput_rps']
+                self.stdout.write(
+                    f'{sync["concurrency"]} connections: async/sync rps '
+                    f'{ratio:.2f}'
+                )
@@ -0,0 +1,195 @@
+"""
+Генератор синтетического каталога.
+"""
+
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import accumulate
+
+from django.core.management import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from reviews.models import Comment, Review, Title
+
+from ._private import BATCH_SIZE, copy_csv, load_csv, reset_sequences
+from ._synthetic import (PART_FILES, harmonic, part_path, plan_chunk,
+                         slug_rows, user_rows, write_chunk)
+from .load_data import ALREDY_LOADED_ERROR_MESSAGE, SOURCES
+
+CSV = 'csv'
+DB = 'db'
+DIR = './static/data/synthetic/'
+CHUNK_SIZE = 1000
+RAW_MODELS = (Review, Comment)
+
+
+@contextmanager
+def process_map(workers):
+    """map по пулу из workers процессов или обычный map при одном."""
+    if workers <= 1:
+        yield map
+        return
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield partial(executor.map, chunksize=1)
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def join_parts(path, header, parts):
+    """Склеивает части в один csv-файл c заголовком, удаляя части."""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerow(header)
+        for part in parts:
+            with open(part, encoding='utf-8', newline='') as source:
+                shutil.copyfileobj(source, file)
+            os.remove(part)
+
+
+class Command(BaseCommand):
+    '''
+    Генерирует синтетический каталог заданного размера c реалистичными
+    распределениями (см. _synthetic): отзывы по произведениям по закону
+    Ципфа c показателем --zipf, комментарии c тяжелым хвостом, несколько
+    жанров на произведение, разброс годов и дат.
+
+    Произведения делятся на порции по --chunk-size, порции генерируются
+    в --workers процессах. Сначала процессы считают размеры порций, по
+    ним вычисляются первые id, затем каждый процесс пишет строки своей
+    порции в отдельные файлы, которые склеиваются по порядку. Ни один
+    процесс не держит данные в памяти целиком, результат при одном
+    --seed не зависит от числа процессов.
+
+    --format csv пишет в --path файлы в раскладке load_data. --format db
+    загружает их в пустую БД: отзывы и комментарии - через COPY в
+    PostgreSQL или executemany в других БД, c сохранением дат, остальное
+    - через bulk_create; затем пересчитываются рейтинги.
+    '''
+    help = "Generates a synthetic catalogue as csv-files or into the DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--titles', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--genres', type=int, default=50)
+        parser.add_argument('--reviews', type=int, default=200000,
+                            help='Total reviews, capped by users per title')
+        parser.add_argument('--comments', type=float, default=1.0,
+                            help='Mean comments per review')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Zipf exponent of reviews per title')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--format', choices=(CSV, DB), default=CSV)
+        parser.add_argument('--path', default=DIR,
+                            help='Directory for csv-files')
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1,
+                            help='Number of generating processes')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Titles per generated chunk')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Rows inserted at once with --format db')
+
+    def handle(self, *args, **options):
+        if options['format'] == DB and self.is_loaded():
+            return
+        spec = {
+            name: options[name] for name in (
+                'seed', 'users', 'titles', 'categories', 'genres',
+                'reviews', 'comments', 'zipf',
+            )
+        }
+        spec['harmonic'] = harmonic(spec['titles'], spec['zipf'])
+        spec['now'] = timezone.now().replace(microsecond=0)
+        if options['format'] == CSV:
+            os.makedirs(options['path'], exist_ok=True)
+            self.generate(spec, options['path'], options)
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            self.generate(spec, directory, options)
+            self.load(directory, options)
+
+    def is_loaded(self):
+        for _, model, _ in SOURCES:
+            if model.objects.exists():
+                self.stderr.write(f'{model} data already exiting.')
+                self.stderr.write(ALREDY_LOADED_ERROR_MESSAGE)
+                return True
+        return False
+
+    def generate(self, spec, directory, options):
+        headers = {
+            filename: list(fields.values())
+            for filename, _, fields in SOURCES
+        }
+        write_csv(os.path.join(directory, 'users.csv'),
+                  headers['users.csv'], user_rows(spec))
+        write_csv(os.path.join(directory, 'category.csv'),
+                  headers['category.csv'],
+                  slug_rows(spec['categories'], 'Категория', 'category'))
+        write_csv(os.path.join(directory, 'genre.csv'),
+                  headers['genre.csv'],
+                  slug_rows(spec['genres'], 'Жанр', 'genre'))
+
+        ranks = array('L', range(1, spec['titles'] + 1))
+        random.Random(spec['seed']).shuffle(ranks)
+        size = options['chunk_size']
+        chunks = [
+            (index, ranks[start:start + size])
+            for index, start in enumerate(range(0, len(ranks), size))
+        ]
+        started = time.monotonic()
+        with process_map(options['workers']) as map_chunks:
+            sizes = list(map_chunks(partial(plan_chunk, spec), chunks))
+            first_ids = accumulate(
+                [(1, 1, 1)] + [
+                    (genre_titles, reviews, comments)
+                    for reviews, genre_titles, comments in sizes
+                ],
+                lambda first, counts: tuple(map(sum, zip(first, counts))),
+            )
+            tasks = [
+                (index, index * size + 1, chunk_ranks, ids)
+                for (index, chunk_ranks), ids in zip(chunks, first_ids)
+            ]
+            list(map_chunks(partial(write_chunk, spec, directory), tasks))
+        for filename in PART_FILES:
+            join_parts(
+                os.path.join(directory, filename), headers[filename],
+                [part_path(directory, filename, index)
+                 for index, _ in chunks],
+            )
+        reviews, genre_titles, comments = map(sum, zip(*sizes))
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {spec["users"]} users, {spec["titles"]} titles, '
+            f'{genre_titles} genre links, {reviews} reviews, {comments} '
+            f'comments in {time.monotonic() - started:.1f} s'
+        ))
+
+    def load(self, directory, options):
+        for filename, model, fields in SOURCES:
+            load = copy_csv if model in RAW_MODELS else load_csv
+            started = time.monotonic()
+            rows = load(
+                os.path.join(directory, filename), model, fields,
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{filename}: {rows} rows in '
+                f'{time.monotonic() - started:.1f} s'
+            ))
+        reset_sequences([model for _, model, _ in SOURCES])
+        Title.rebuild_ratings()
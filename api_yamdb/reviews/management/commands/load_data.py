@@ -2,12 +2,15 @@
 Кастомные менеджмент-команды.
 """
 
-from csv import DictReader
+import os
 
 from django.core.management import BaseCommand
 from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
                             Title, User)
 
+from ._private import (BATCH_SIZE, Upserter, load_csv, reset_sequences,
+                       run_stages, upsert_csv)
+
 ALREDY_LOADED_ERROR_MESSAGE = """
 If you need to reload data from the CSV file,
 first delete the db.sqlite3 file to destroy the database.
@@ -16,95 +19,200 @@ database with tables"""
 
 DIR = './static/data/'
 
+NATURAL_KEYS = {
+    User: 'username',
+    Category: 'slug',
+    Genre: 'slug',
+}
+
+TRACKED = {
+    Title: 'pk',
+    GenreTitle: 'title_id',
+    Review: 'title_id',
+}
+
+SOURCES = (
+    ('users.csv', User, {
+        'id': 'id',
+        'username': 'username',
+        'email': 'email',
+        'role': 'role',
+        'bio': 'bio',
+    }),
+    ('category.csv', Category, {
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+    }),
+    ('genre.csv', Genre, {
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+    }),
+    ('titles.csv', Title, {
+        'id': 'id',
+        'name': 'name',
+        'year': 'year',
+        'description': 'description',
+        'category_id': 'category',
+    }),
+    ('genre_title.csv', GenreTitle, {
+        'id': 'id',
+        'genre_id': 'genre_id',
+        'title_id': 'title_id',
+    }),
+    ('review.csv', Review, {
+        'id': 'id',
+        'title_id': 'title_id',
+        'text': 'text',
+        'author_id': 'author',
+        'score': 'score',
+        'pub_date': 'pub_date',
+    }),
+    ('comments.csv', Comment, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author_id': 'author',
+        'review_id': 'review_id',
+    }),
+)
+
+
+STAGES = (
+    ('users.csv', 'category.csv', 'genre.csv'),
+    ('titles.csv',),
+    ('genre_title.csv', 'review.csv'),
+    ('comments.csv',),
+)
+
 
 class Command(BaseCommand):
     '''
     Загружает данные из csv в БД.
-    Если данные уже есть в БД, выдаст ошибку ALREDY_LOADED_ERROR_MESSAGE.
+    Если данные уже есть в БД, выдаст ошибку ALREDY_LOADED_ERROR_MESSAGE,
+    если не указан флаг --incremental.
+
+    Файлы читаются порциями по --batch-size строк и пишутся через
+    insert_rows c датами из csv, каждый файл - в своей транзакции.
+    После загрузки сбрасываются счетчики первичных ключей и
+    пересчитываются рейтинги.
+
+    С флагом --incremental загружает только изменения: файлы, не
+    менявшиеся с прошлой загрузки, и строки с прежним md5 пропускаются,
+    остальные строки обновляют записи по id или естественному ключу
+    (slug, username) либо создаются. Рейтинги пересчитываются только у
+    произведений, которых коснулись измененные строки.
+
+    Файлы загружаются этапами STAGES в порядке зависимостей по внешним
+    ключам. Файлы одного этапа независимы и при --workers больше 1
+    загружаются параллельно, каждый поток - через свое соединение с БД.
     '''
     help = "Loads data from .csv-files"
 
-    def handle(self, *args, **options):
-
-        models = (
-            Category,
-            Comment,
-            GenreTitle,
-            Genre,
-            Review,
-            Title,
-            User
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=DIR,
+            help='Directory with csv-files',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Number of rows read and inserted at once',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Upsert changed rows instead of refusing to load',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of files of one stage loaded concurrently',
         )
 
-        for model in models:
+    def handle(self, *args, **options):
+        incremental = options['incremental']
+        if not incremental and self.is_loaded():
+            return
+
+        self.stdout.write("Loading changes" if incremental else "Loading data")
+        sources = {filename: (model, fields)
+                   for filename, model, fields in SOURCES}
+        remaps = {}
+        touched = set()
+
+        def load_file(filename):
+            model, fields = sources[filename]
+            if incremental:
+                touched.update(
+                    self.upsert(filename, model, fields, options, remaps)
+                )
+            else:
+                self.load(filename, model, fields, options)
+
+        run_stages(
+            STAGES, load_file, options['workers'], report=self.report_stage
+        )
+        reset_sequences([model for _, model, _ in SOURCES])
+        if not incremental:
+            Title.rebuild_ratings()
+            return
+        touched = sorted(touched)
+        batch_size = options['batch_size']
+        for start in range(0, len(touched), batch_size):
+            Title.rebuild_ratings(touched[start:start + batch_size])
+        self.stdout.write(f'Ratings rebuilt for {len(touched)} titles')
+
+    def is_loaded(self):
+        for _, model, _ in SOURCES:
             if model.objects.exists():
-                print(f'{model} data already exiting.')
-                print(ALREDY_LOADED_ERROR_MESSAGE)
-                return
-
-        print("Loading data")
-
-        for row in DictReader(open(DIR + 'users.csv')):
-            data = User(
-                id=row['id'],
-                username=row['username'],
-                email=row['email'],
-                role=row['role'],
-                bio=row['bio']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'category.csv')):
-            data = Category(
-                id=row['id'],
-                name=row['name'],
-                slug=row['slug']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'genre.csv')):
-            data = Genre(
-                id=row['id'],
-                name=row['name'],
-                slug=row['slug']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'titles.csv')):
-            data = Title(
-                id=row['id'],
-                name=row['name'],
-                year=row['year'],
-                description=row['description'],
-                category_id=row['category']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'genre_title.csv')):
-            data = GenreTitle(
-                id=row['id'],
-                genre_id=row['genre_id'],
-                title_id=row['title_id']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'review.csv')):
-            data = Review(
-                id=row['id'],
-                title_id=row['title_id'],
-                text=row['text'],
-                author_id=row['author'],
-                score=row['score'],
-                pub_date=row['pub_date']
-            )
-            data.save()
-
-        for row in DictReader(open(DIR + 'comments.csv')):
-            data = Comment(
-                id=row['id'],
-                text=row['text'],
-                pub_date=row['pub_date'],
-                author_id=row['author'],
-                review_id=row['review_id']
-            )
-            data.save()
+                self.stderr.write(f'{model} data already exiting.')
+                self.stderr.write(ALREDY_LOADED_ERROR_MESSAGE)
+                return True
+        return False
+
+    def load(self, filename, model, fields, options):
+        rows = load_csv(
+            os.path.join(options['path'], filename),
+            model,
+            fields,
+            batch_size=options['batch_size'],
+            report=self.reporter(filename),
+        )
+        self.stdout.write(self.style.SUCCESS(f'{filename}: {rows} rows'))
+
+    def upsert(self, filename, model, fields, options, remaps):
+        """Возвращает id произведений, чьи рейтинги затронула загрузка."""
+        upserter = Upserter(
+            filename, model, fields, NATURAL_KEYS.get(model), remaps,
+            TRACKED.get(model),
+        )
+        result = upsert_csv(
+            os.path.join(options['path'], filename),
+            upserter,
+            batch_size=options['batch_size'],
+            report=self.reporter(filename),
+        )
+        if result is None:
+            self.stdout.write(f'{filename}: unchanged, skipped')
+        else:
+            rows, changed = result
+            self.stdout.write(self.style.SUCCESS(
+                f'{filename}: {rows} rows, {changed} changed'
+            ))
+        return upserter.touched
+
+    def report_stage(self, stage, seconds):
+        self.stdout.write(self.style.SUCCESS(
+            f'Stage {", ".join(stage)}: {seconds:.2f} s'
+        ))
+
+    def reporter(self, filename):
+        def report(rows, seconds):
+            rate = rows / seconds if seconds else rows
+            self.stdout.write(f'{filename}: {rows} rows, {rate:.0f} rows/s')
+        return report
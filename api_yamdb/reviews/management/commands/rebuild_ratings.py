@@ -0,0 +1,21 @@
+"""
+Пересчет денормализованных рейтингов произведений.
+"""
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    '''
+    Пересчитывает rating, reviews_count и score_sum всех произведений
+    по таблице отзывов. Нужна после массовых изменений отзывов в обход
+    модели (bulk_create, update, прямые запросы к БД).
+    '''
+    help = "Rebuilds denormalized title ratings from reviews"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Title.rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS('Ratings rebuilt'))
@@ -0,0 +1,55 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = (
+    ('title_search_idx', 'reviews_title',
+     "(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+     "setweight(to_tsvector('simple', coalesce(description, '')), 'B'))"),
+    ('title_name_trgm_idx', 'reviews_title', 'name gin_trgm_ops'),
+    ('category_name_trgm_idx', 'reviews_category', 'name gin_trgm_ops'),
+    ('genre_name_trgm_idx', 'reviews_genre', 'name gin_trgm_ops'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin ({expression})'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class PostgresTrigramExtension(TrigramExtension):
+    """
+    TrigramExtension, откат которой на других БД ничего не делает:
+    в Django 3.2 он проверяет расширение запросом к pg_extension.
+    """
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_backwards(
+            app_label, schema_editor, from_state, to_state
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_access_path_indexes'),
+    ]
+
+    operations = [
+        PostgresTrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 3.2 on 2026-10-18 20:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, TruncDate
+import django.db.models.deletion
+
+
+def fill_leaderboard(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    Review = apps.get_model('reviews', 'Review')
+    TitleDailyScore = apps.get_model('reviews', 'TitleDailyScore')
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    Title.objects.update(weighted_rating=(
+        (Cast(F('score_sum'), FloatField())
+         + settings.RATING_PRIOR_MEAN * prior_weight)
+        / (Cast(F('reviews_count'), FloatField()) + prior_weight)
+    ))
+    GenreTitle.objects.update(weighted_rating=Subquery(
+        Title.objects.filter(pk=OuterRef('title_id')).values('weighted_rating')
+    ))
+    totals = Review.objects.annotate(
+        day=TruncDate('pub_date')
+    ).order_by().values('title', 'day').annotate(
+        total=Sum('score'), count=Count('id')
+    )
+    TitleDailyScore.objects.bulk_create(
+        (TitleDailyScore(title_id=row['title'], day=row['day'],
+                         score_sum=row['total'], reviews_count=row['count'])
+         for row in totals.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_title_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleDailyScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('reviews_count', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='genretitle',
+            name='weighted_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='weighted_rating',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='weighted rating'),
+        ),
+        migrations.AddIndex(
+            model_name='genretitle',
+            index=models.Index(fields=['genre', '-weighted_rating', 'title'], name='genretitle_genre_weighted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-weighted_rating', 'id'], name='title_weighted_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', '-weighted_rating', 'id'], name='title_category_weighted_idx'),
+        ),
+        migrations.AddField(
+            model_name='titledailyscore',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_scores', to='reviews.title'),
+        ),
+        migrations.AddIndex(
+            model_name='titledailyscore',
+            index=models.Index(fields=['day', 'title'], name='titledailyscore_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='titledailyscore',
+            constraint=models.UniqueConstraint(fields=('title', 'day'), name='unique_title_day'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
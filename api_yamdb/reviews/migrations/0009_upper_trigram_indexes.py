@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# SearchFilter ищет категории и жанры через icontains, который в
+# PostgreSQL превращается в UPPER(name::text) LIKE UPPER(...): индекс
+# подходит только c тем же выражением.
+OLD_INDEXES = (
+    ('category_name_trgm_idx', 'reviews_category', 'name gin_trgm_ops'),
+    ('genre_name_trgm_idx', 'reviews_genre', 'name gin_trgm_ops'),
+)
+NEW_INDEXES = (
+    ('category_name_trgm_idx', 'reviews_category',
+     '(UPPER(name::text)) gin_trgm_ops'),
+    ('genre_name_trgm_idx', 'reviews_genre',
+     '(UPPER(name::text)) gin_trgm_ops'),
+)
+
+
+def replace_indexes(indexes):
+    def replace(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name, table, expression in indexes:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} USING gin ({expression})'
+            )
+    return replace
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_title_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            replace_indexes(NEW_INDEXES), replace_indexes(OLD_INDEXES)
+        ),
+    ]
@@ -5,12 +5,29 @@
 from core.models import GenreAndCategoryModel, ReviewAndCommentModel
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, NullIf, TruncDate
 from users.models import User
 
 from .validators import validate_year
 
 
+def bayesian_rating(score_sum, reviews_count):
+    """
+    Выражение байесовской оценки: средняя оценка, сглаженная к
+    RATING_PRIOR_MEAN так, будто у произведения есть еще
+    RATING_PRIOR_WEIGHT таких отзывов. Не дает произведениям c парой
+    отзывов обойти произведения c сотнями.
+    """
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    return (
+        (Cast(score_sum, FloatField())
+         + settings.RATING_PRIOR_MEAN * prior_weight)
+        / (Cast(reviews_count, FloatField()) + prior_weight)
+    )
+
+
 class Category(GenreAndCategoryModel):
     """
     Модель категорий произведений.
@@ -41,6 +58,12 @@ class Title(models.Model):
     category - id категории, к которой относится данное произведение;
     genre - id жанра, к которому относится данное произведение;
     description - необязательное поле - подробное описание произведения.
+
+    rating, reviews_count и score_sum - денормализованные средняя оценка,
+    число отзывов и сумма оценок, weighted_rating - байесовская оценка
+    для рейтингов произведений. Обновляются инкрементально сигналами
+    reviews.signals при изменении отзывов, пересчитываются целиком
+    rebuild_ratings.
     """
 
     name = models.CharField(
@@ -70,21 +93,159 @@ class Title(models.Model):
         Genre,
         through='genretitle',
     )
+    rating = models.FloatField(
+        'rating',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    reviews_count = models.PositiveIntegerField(
+        'reviews count',
+        default=0,
+        editable=False,
+    )
+    score_sum = models.PositiveIntegerField(
+        'score sum',
+        default=0,
+        editable=False,
+    )
+    weighted_rating = models.FloatField(
+        'weighted rating',
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            models.Index(fields=('rating', 'id',), name='title_rating_idx'),
+            models.Index(
+                fields=('-weighted_rating', 'id',),
+                name='title_weighted_rating_idx'
+            ),
+            models.Index(
+                fields=('category', '-weighted_rating', 'id',),
+                name='title_category_weighted_idx'
+            ),
+            models.Index(
+                fields=('year', 'rating',), name='title_year_rating_idx'
+            ),
+            models.Index(
+                fields=('category', 'rating',),
+                name='title_category_rating_idx'
+            ),
+            models.Index(fields=('name',), name='title_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def update_rating(cls, title_id, score_delta, count_delta=0):
+        """
+        Сдвигает сумму оценок и число отзывов произведения на заданные
+        величины и пересчитывает рейтинг одним UPDATE, затем копирует
+        байесовскую оценку в связи c жанрами.
+        """
+        score_sum = F('score_sum') + score_delta
+        reviews_count = F('reviews_count') + count_delta
+        cls.objects.filter(pk=title_id).update(
+            score_sum=score_sum,
+            reviews_count=reviews_count,
+            rating=(
+                Cast(score_sum, FloatField())
+                / Cast(NullIf(reviews_count, 0), FloatField())
+            ),
+            weighted_rating=bayesian_rating(score_sum, reviews_count),
+        )
+        GenreTitle.copy_weighted_rating(title_id=title_id)
+
+    @classmethod
+    def rebuild_ratings(cls, title_ids=None):
+        """
+        Пересчитывает рейтинги по таблице отзывов: всех произведений или,
+        если задан title_ids, только перечисленных.
+        """
+        titles = cls.objects.all()
+        links = {}
+        if title_ids is not None:
+            titles = titles.filter(pk__in=title_ids)
+            links = {'title_id__in': title_ids}
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        titles.update(
+            score_sum=Coalesce(
+                Subquery(reviews.annotate(total=models.Sum('score'))
+                         .values('total')),
+                0,
+            ),
+            reviews_count=Coalesce(
+                Subquery(reviews.annotate(total=models.Count('id'))
+                         .values('total')),
+                0,
+            ),
+            rating=Subquery(
+                reviews.annotate(total=models.Avg('score')).values('total')
+            ),
+        )
+        titles.update(
+            weighted_rating=bayesian_rating(
+                F('score_sum'), F('reviews_count')
+            )
+        )
+        GenreTitle.copy_weighted_rating(**links)
+        TitleDailyScore.rebuild(title_ids)
+
 
 class GenreTitle(models.Model):
+    """
+    Связь произведения c жанром.
+
+    weighted_rating - копия байесовской оценки произведения, по которой
+    рейтинг жанра читается из индекса без сортировки.
+    """
+
     title = models.ForeignKey(Title, on_delete=models.CASCADE)
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    weighted_rating = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('title', 'genre',),
+                name='unique_genre_title',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('genre', 'title',), name='genretitle_genre_title_idx'
+            ),
+            models.Index(
+                fields=('genre', '-weighted_rating', 'title',),
+                name='genretitle_genre_weighted_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.genre} {self.title}'
 
+    @classmethod
+    def copy_weighted_rating(cls, **filters):
+        """Копирует байесовскую оценку произведений в связи c жанрами."""
+        cls.objects.filter(**filters).update(
+            weighted_rating=Subquery(
+                Title.objects.filter(
+                    pk=OuterRef('title_id')
+                ).values('weighted_rating')
+            )
+        )
+
 
 class Review(ReviewAndCommentModel):
     """
@@ -126,6 +287,12 @@ class Review(ReviewAndCommentModel):
                 name='unique_review',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('title', '-pub_date', '-id',),
+                name='review_title_pub_date_idx',
+            )
+        ]
 
 
 class Comment(ReviewAndCommentModel):
@@ -146,3 +313,138 @@ class Comment(ReviewAndCommentModel):
         User,
         on_delete=models.CASCADE,
         verbose_name='comments')
+
+    class Meta(ReviewAndCommentModel.Meta):
+        indexes = [
+            models.Index(
+                fields=('review', '-pub_date', '-id',),
+                name='comment_review_pub_date_idx',
+            )
+        ]
+
+
+class TitleDailyScore(models.Model):
+    """
+    Дневные итоги отзывов на произведение для рейтингов за период.
+
+    title - произведение;
+    day - день публикации отзывов;
+    reviews_count и score_sum - число и сумма оценок отзывов этого дня.
+    """
+
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='daily_scores',
+    )
+    day = models.DateField()
+    reviews_count = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('title', 'day',),
+                name='unique_title_day',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('day', 'title',), name='titledailyscore_day_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.title_id} {self.day}'
+
+    @classmethod
+    def add_score(cls, title_id, day, score_delta, count_delta=0,
+                  create=True):
+        """
+        Сдвигает итоги произведения за день. Если итогов за этот день нет,
+        создает их, а при create=False (удаление отзыва) ничего не делает.
+        """
+        scores = cls.objects.filter(title_id=title_id, day=day)
+        changes = {
+            'score_sum': F('score_sum') + score_delta,
+            'reviews_count': F('reviews_count') + count_delta,
+        }
+        if scores.update(**changes) or not create:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    title_id=title_id,
+                    day=day,
+                    score_sum=score_delta,
+                    reviews_count=count_delta,
+                )
+        except IntegrityError:
+            scores.update(**changes)
+
+    @classmethod
+    def rebuild(cls, title_ids=None, batch_size=5000):
+        """
+        Пересчитывает дневные итоги всех произведений или, если задан
+        title_ids, только перечисленных.
+        """
+        scores = cls.objects.all()
+        reviews = Review.objects.all()
+        if title_ids is not None:
+            scores = scores.filter(title_id__in=title_ids)
+            reviews = reviews.filter(title_id__in=title_ids)
+        scores.delete()
+        totals = reviews.annotate(
+            day=TruncDate('pub_date')
+        ).order_by().values('title', 'day').annotate(
+            total=models.Sum('score'), count=models.Count('id')
+        )
+        cls.objects.bulk_create(
+            (cls(title_id=row['title'], day=row['day'],
+                 score_sum=row['total'], reviews_count=row['count'])
+             for row in totals.iterator()),
+            batch_size=batch_size,
+        )
+
+
+class ImportedFile(models.Model):
+    """
+    Отпечаток csv-файла, загруженного командой load_data.
+
+    name - имя файла;
+    digest - sha256 содержимого на момент последней загрузки.
+    """
+
+    name = models.CharField(max_length=settings.LENG_MAX, unique=True)
+    digest = models.CharField(max_length=64)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImportedRow(models.Model):
+    """
+    Отпечаток строки csv-файла, загруженной в режиме --incremental.
+
+    source - имя файла;
+    key - id строки в csv;
+    object_id - id записи в БД, в которую попала строка;
+    digest - md5 значений строки.
+    """
+
+    source = models.CharField(max_length=settings.LENG_MAX)
+    key = models.BigIntegerField()
+    object_id = models.BigIntegerField()
+    digest = models.CharField(max_length=32)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('source', 'key',),
+                name='unique_imported_row',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.key}'
@@ -0,0 +1,166 @@
+"""
+Сигналы приложения reviews.
+
+Поддерживают денормализованный рейтинг произведения и его дневные
+итоги при любом сохранении и удалении отзыва: через api, админку или
+ORM, а также копию байесовской оценки в связях c жанрами. Там же
+инвалидируется кеш ответов api (api.cache), в том числе при каскадном
+удалении отзывов вместе c произведением или автором. Массовые
+операции (bulk_create, update) сигналов не вызывают, после них нужен
+Title.rebuild_ratings().
+"""
+
+from contextvars import ContextVar
+
+from api.cache import invalidate
+from api.search import SEARCH_NAMESPACE
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (Category, Comment, Genre, GenreTitle, Review, Title,
+                     TitleDailyScore)
+
+_deleting_titles = ContextVar('deleting_titles', default=frozenset())
+
+
+def title_namespaces(title_id):
+    """Пространства кеша api со списком произведений и произведением."""
+    return [('titles',), ('titles', title_id)]
+
+
+def add_score(title_id, review, score_delta, count_delta=0, create=True):
+    """Сдвигает рейтинг произведения и его итоги за день отзыва."""
+    Title.update_rating(title_id, score_delta, count_delta)
+    invalidate(*title_namespaces(title_id))
+    TitleDailyScore.add_score(
+        title_id, timezone.localdate(review.pub_date),
+        score_delta, count_delta, create=create,
+    )
+
+
+@receiver(pre_delete, sender=Title)
+def remember_deleting_title(sender, instance, **kwargs):
+    """
+    Отмечает удаляемое произведение: его отзывы удаляются каскадом
+    раньше него, и пересчитывать их рейтинг незачем.
+    """
+    _deleting_titles.set(_deleting_titles.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Title)
+def forget_deleting_title(sender, instance, **kwargs):
+    _deleting_titles.set(_deleting_titles.get() - {instance.pk})
+
+
+@receiver(pre_save, sender=Review)
+def remember_old_score(sender, instance, raw=False, **kwargs):
+    """Запоминает произведение и оценку отзыва до изменения."""
+    instance._old_rating = None
+    if raw or instance.pk is None:
+        return
+    reviews = Review.objects.filter(pk=instance.pk)
+    if transaction.get_connection().in_atomic_block:
+        reviews = reviews.select_for_update()
+    instance._old_rating = reviews.values_list('title_id', 'score').first()
+
+
+@receiver(post_save, sender=Review)
+def apply_saved_score(sender, instance, raw=False, **kwargs):
+    """Учитывает новую или измененную оценку в рейтинге произведения."""
+    if raw:
+        return
+    old_rating = getattr(instance, '_old_rating', None)
+    if old_rating is None:
+        add_score(instance.title_id, instance, instance.score, 1)
+        return
+    old_title_id, old_score = old_rating
+    if old_title_id != instance.title_id:
+        add_score(old_title_id, instance, -old_score, -1)
+        add_score(instance.title_id, instance, instance.score, 1)
+    elif old_score != instance.score:
+        add_score(instance.title_id, instance, instance.score - old_score)
+
+
+@receiver(post_delete, sender=Review)
+def apply_deleted_score(sender, instance, **kwargs):
+    """
+    Исключает оценку удаленного отзыва из рейтинга произведения. Итоги
+    дня только уменьшаются: при каскадном удалении они уже удалены.
+    """
+    if instance.title_id in _deleting_titles.get():
+        return
+    add_score(instance.title_id, instance, -instance.score, -1, create=False)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def copy_weighted_rating(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Переносит байесовскую оценку в новые связи произведения c жанрами."""
+    if action != 'post_add':
+        return
+    if reverse:
+        GenreTitle.copy_weighted_rating(title_id__in=pk_set)
+    else:
+        GenreTitle.copy_weighted_rating(title_id=instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review(sender, instance, **kwargs):
+    """Инвалидирует кеш отзывов произведения и комментариев к отзыву."""
+    title_ids = {instance.title_id}
+    old_rating = getattr(instance, '_old_rating', None)
+    if old_rating is not None:
+        title_ids.add(old_rating[0])
+    namespaces = [('comments', instance.pk)]
+    for title_id in title_ids:
+        namespaces += [('reviews', title_id), ('reviews', title_id,
+                                               instance.pk)]
+    invalidate(*namespaces)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    invalidate(
+        ('comments', instance.review_id),
+        ('comments', instance.review_id, instance.pk),
+    )
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    """Инвалидирует кеш произведения, его отзывов и поиска."""
+    invalidate(
+        *title_namespaces(instance.pk),
+        ('reviews', instance.pk),
+        SEARCH_NAMESPACE,
+    )
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_title_genres(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not action.startswith('post_'):
+        return
+    title_ids = (pk_set or ()) if reverse else {instance.pk}
+    invalidate(('titles',), SEARCH_NAMESPACE, *[
+        ('titles', title_id) for title_id in title_ids
+    ])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_group(sender, instance, **kwargs):
+    """
+    Инвалидирует кеш категорий или жанров, а c ними и произведений,
+    ответы которых от них зависят.
+    """
+    namespace = 'categories' if sender is Category else 'genres'
+    invalidate((namespace,), (namespace, instance.slug))
@@ -0,0 +1,121 @@
+"""
+Отправка писем из очереди.
+"""
+
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from users.models import OutgoingEmail
+
+SEND_ERRORS = (smtplib.SMTPException, OSError)
+
+
+class Command(BaseCommand):
+    '''
+    Отправляет письма из очереди OutgoingEmail порциями по --batch-size
+    через одно соединение c почтовым сервером на порцию.
+
+    Неотправленное письмо откладывается на EMAIL_OUTBOX_RETRY_DELAY
+    секунд, c каждой следующей неудачей задержка удваивается. Порция
+    блокируется в БД (SELECT ... FOR UPDATE SKIP LOCKED), поэтому
+    несколько команд могут работать параллельно.
+
+    Без флага --once команда работает постоянно и, разобрав очередь,
+    проверяет ее раз в --interval секунд.
+    '''
+    help = "Sends queued emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Number of emails sent over one connection',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is due now and exit',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while self.deliver(options['batch_size']):
+                pass
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def deliver(self, batch_size):
+        """Отправляет одну порцию писем, возвращает ее размер."""
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                OutgoingEmail.pending(now)
+                .select_for_update(skip_locked=True)[:batch_size]
+            )
+            if not emails:
+                return 0
+            errors = self.send(emails)
+            OutgoingEmail.objects.filter(
+                pk__in=[email.pk for email in emails if email not in errors]
+            ).update(sent_at=now, attempts=F('attempts') + 1)
+            self.postpone(errors, now)
+        self.stdout.write(
+            f'{len(emails) - len(errors)} sent, {len(errors)} failed'
+        )
+        return len(emails)
+
+    def send(self, emails):
+        """
+        Отправляет письма через одно соединение, возвращает ошибки
+        неотправленных писем.
+        """
+        errors = {}
+        sent = set()
+        try:
+            with get_connection(fail_silently=False) as connection:
+                for email in emails:
+                    try:
+                        connection.send_messages([EmailMessage(
+                            email.subject,
+                            email.body,
+                            email.from_email,
+                            [email.recipient],
+                        )])
+                    except SEND_ERRORS as error:
+                        errors[email] = error
+                    else:
+                        sent.add(email)
+        except SEND_ERRORS as error:
+            for email in emails:
+                if email not in sent:
+                    errors.setdefault(email, error)
+        return errors
+
+    def postpone(self, errors, now):
+        for email, error in errors.items():
+            email.attempts += 1
+            email.last_error = str(error) or type(error).__name__
+            email.send_after = now + timedelta(
+                seconds=settings.EMAIL_OUTBOX_RETRY_DELAY
+                * 2 ** (email.attempts - 1)
+            )
+            if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                self.stderr.write(f'{email}: giving up, {email.last_error}')
+        OutgoingEmail.objects.bulk_update(
+            list(errors), ('attempts', 'last_error', 'send_after')
+        )
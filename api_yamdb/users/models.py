@@ -2,6 +2,7 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -80,3 +81,86 @@ class User(AbstractUser):
 
     def __str__(self):
         return f'{self.username} {self.email} {self.role}'
+
+
+class OutgoingEmail(models.Model):
+    """
+    Письмо в очереди на отправку.
+
+    Запросы только ставят письма в очередь, отправляет их команда
+    send_emails. Неудачная отправка повторяется не раньше send_after,
+    всего не больше EMAIL_OUTBOX_MAX_ATTEMPTS попыток.
+
+    attempts - число неудачных и удачной попыток отправки;
+    sent_at - время отправки, пусто у неотправленных писем;
+    last_error - текст последней ошибки отправки.
+    """
+
+    subject = models.CharField('subject', max_length=settings.LENG_MAX)
+    body = models.TextField('body')
+    from_email = models.EmailField('from', max_length=settings.LENG_EMAIL)
+    recipient = models.EmailField('to', max_length=settings.LENG_EMAIL)
+    created_at = models.DateTimeField('created', auto_now_add=True)
+    send_after = models.DateTimeField('send after', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('attempts', default=0)
+    sent_at = models.DateTimeField('sent', blank=True, null=True)
+    last_error = models.TextField('last error', blank=True)
+
+    class Meta:
+        ordering = ('send_after', 'id',)
+        indexes = [
+            models.Index(
+                fields=('send_after', 'id',),
+                name='outgoingemail_pending_idx',
+                condition=models.Q(sent_at__isnull=True),
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+    @classmethod
+    def pending(cls, now=None):
+        """Неотправленные письма, которые пора отправить."""
+        return cls.objects.filter(
+            sent_at__isnull=True,
+            send_after__lte=now or timezone.now(),
+            attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        ).order_by('send_after', 'id')
+
+
+class TokenRevocation(models.Model):
+    """
+    Отзыв access-токенов пользователя.
+
+    Запись c jti отзывает один токен, запись без jti - все токены
+    пользователя, выданные до created_at. После expires_at отозванные
+    токены истекли бы сами, и запись больше не нужна. Записи
+    переживают удаление пользователя, поэтому связь без ограничения в БД.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='token_revocations',
+    )
+    jti = models.CharField('jti', max_length=255, blank=True)
+    created_at = models.DateTimeField('revoked at', default=timezone.now)
+    expires_at = models.DateTimeField('expires at')
+
+    class Meta:
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(
+                fields=('expires_at',), name='tokenrevocation_expires_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.jti or self.created_at}'
+
+    @classmethod
+    def active(cls):
+        """Отзывы, токены которых еще не истекли сами."""
+        return cls.objects.filter(expires_at__gt=timezone.now())
@@ -1,9 +1,31 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
+    'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from api.authentication import revocations, user_cache
+    from api.instrumentation import stats
+    from api.throttling import get_backend
+    from django.core.cache import cache
+    cache.clear()
+    user_cache.clear()
+    revocations.reset()
+    get_backend().clear()
+    stats.clear()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_guard(settings):
+    settings.QUERY_GUARD_MODE = 'strict'
@@ -0,0 +1,62 @@
+import pytest
+
+
+def create_users(django_user_model, count, prefix='author'):
+    return [
+        django_user_model.objects.create_user(
+            username=f'{prefix}{index}',
+            email=f'{prefix}{index}@yamdb.fake',
+        )
+        for index in range(count)
+    ]
+
+
+def create_titles(count, start=0):
+    from reviews.models import Category, Genre, Title
+    titles = []
+    for index in range(start, start + count):
+        category = Category.objects.create(
+            name=f'Категория {index}', slug=f'category-{index}'
+        )
+        genres = [
+            Genre.objects.create(
+                name=f'Жанр {index}-{number}', slug=f'genre-{index}-{number}'
+            )
+            for number in range(2)
+        ]
+        title = Title.objects.create(
+            name=f'Произведение {index}', year=2000, category=category
+        )
+        title.genre.set(genres)
+        titles.append(title)
+    return titles
+
+
+def create_reviews(title, authors):
+    from reviews.models import Review
+    return [
+        Review.objects.create(
+            title=title, author=author, text=f'Отзыв {author}', score=5
+        )
+        for author in authors
+    ]
+
+
+def create_comments(review, authors):
+    from reviews.models import Comment
+    return [
+        Comment.objects.create(
+            review=review, author=author, text=f'Комментарий {author}'
+        )
+        for author in authors
+    ]
+
+
+@pytest.fixture
+def title():
+    return create_titles(1)[0]
+
+
+@pytest.fixture
+def review(title, user):
+    return create_reviews(title, [user])[0]
@@ -0,0 +1,23 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def signup(client, username, email=None, ip='10.0.0.1'):
+    return client.post(
+        '/api/v1/auth/signup/',
+        {'username': username, 'email': email or f'{username}@yamdb.fake'},
+        REMOTE_ADDR=ip,
+    )
+
+
+def count_queries(request, *args, **kwargs):
+    """
+    Ответ request(*args, **kwargs) и число запросов к БД при нем, без
+    точек сохранения транзакций.
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = request(*args, **kwargs)
+    return response, len([
+        query for query in context.captured_queries
+        if 'SAVEPOINT' not in query['sql']
+    ])
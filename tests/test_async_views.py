@@ -0,0 +1,106 @@
+import asyncio
+import time
+from contextvars import ContextVar
+
+import pytest
+from api.asyncviews import in_db_thread
+from api.authentication import access_token_for
+from api.dbwrappers import execute_wrapper
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.urls import resolve
+from reviews.models import Category
+
+from .fixtures.fixture_data import create_reviews, create_titles
+
+ASYNC_URLS = 'tests.urls_async'
+marker = ContextVar('marker', default=None)
+
+
+def async_get(url):
+    return async_to_sync(AsyncClient().get)(url)
+
+
+@pytest.mark.urls(ASYNC_URLS)
+@pytest.mark.django_db(transaction=True)
+class TestAsyncViews:
+
+    def test_routes(self):
+        assert asyncio.iscoroutinefunction(
+            resolve('/api/v1/titles/').func
+        ), 'Проверьте, что чтение произведений обслуживает async-представление'
+        assert not asyncio.iscoroutinefunction(
+            resolve('/api/v1/users/').func
+        )
+
+    def test_same_responses(self, client, admin, django_user_model):
+        title = create_titles(2)[0]
+        create_reviews(title, [admin])
+        for url in (
+            '/api/v1/categories/', '/api/v1/genres/', '/api/v1/titles/',
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{title.id}/reviews/',
+            '/api/v1/titles/?fields=id,name',
+        ):
+            response = async_get(url)
+            assert response.status_code == 200, url
+            assert response.json() == client.get(url).json(), (
+                f'Проверьте, что async-ответ на `{url}` совпадает c '
+                'синхронным'
+            )
+
+    def test_write_stays_sync(self, admin):
+        response = async_to_sync(AsyncClient().post)(
+            '/api/v1/categories/', {'name': 'Книги', 'slug': 'books'},
+            content_type='application/json',
+            authorization=f'Bearer {access_token_for(admin)}',
+        )
+        assert response.status_code == 201
+        assert Category.objects.filter(slug='books').exists()
+
+    def test_instrumented(self, settings):
+        settings.INSTRUMENTATION_ENABLED = True
+        create_titles(1)
+        response = async_get('/api/v1/titles/')
+        assert 'desc="0 queries"' not in response['Server-Timing'], (
+            'Проверьте, что SQL-запросы в пуле потоков БД измеряются'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDbThreads:
+
+    def test_concurrent(self):
+        async def sleep_twice():
+            started = time.perf_counter()
+            await asyncio.gather(
+                in_db_thread(time.sleep, 0.2), in_db_thread(time.sleep, 0.2)
+            )
+            return time.perf_counter() - started
+
+        assert async_to_sync(sleep_twice)() < 0.35, (
+            'Проверьте, что запросы в пуле потоков БД идут параллельно'
+        )
+
+    def test_context(self):
+        seen = []
+
+        def wrapper(execute, sql, params, many, context):
+            seen.append(marker.get())
+            return execute(sql, params, many, context)
+
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        async def run():
+            marker.set('request')
+            with execute_wrapper(wrapper):
+                await in_db_thread(query)
+
+        async_to_sync(run)()
+        assert seen == ['request'], (
+            'Проверьте, что обертки SQL-запросов и контекст запроса '
+            'доступны в пуле потоков БД'
+        )
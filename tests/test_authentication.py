@@ -0,0 +1,287 @@
+import time
+from datetime import timedelta
+
+import pytest
+from api.authentication import (UserCache, access_token_for, revocations,
+                                user_cache, user_namespace)
+from api.cache import bump_versions
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import TokenRevocation, User
+
+from .fixtures.fixture_data import create_reviews
+from .fixtures.fixture_user import get_client
+
+
+def claims_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {access_token_for(user)}'
+    )
+    return client
+
+
+def user_queries(client, method, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data=data, format='json')
+    return response, [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('SELECT')
+        and 'FROM "users_user"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+
+    def test_token_has_role_claims(self, client, moderator):
+        response = client.post('/api/v1/auth/token/', {
+            'username': moderator.username,
+            'confirmation_code': default_token_generator.make_token(
+                moderator
+            ),
+        })
+        assert response.status_code == 200
+        token = AccessToken(response.json()['token'])
+        assert token['role'] == 'moderator', (
+            'Проверьте, что токен содержит роль пользователя'
+        )
+        assert token['username'] == moderator.username
+
+    def test_write_without_user_query(self, user, title):
+        response, queries = user_queries(
+            claims_client(user), 'post',
+            f'/api/v1/titles/{title.id}/reviews/',
+            {'text': 'Отзыв', 'score': 5},
+        )
+        assert response.status_code == 201
+        assert response.json()['author'] == user.username
+        assert queries == [], (
+            'Проверьте, что пользователь токена с claims не загружается '
+            'из БД'
+        )
+
+    def test_admin_permissions_from_claims(self, admin):
+        response, queries = user_queries(
+            claims_client(admin), 'post', '/api/v1/categories/',
+            {'name': 'Фильм', 'slug': 'movie'},
+        )
+        assert response.status_code == 201
+        assert queries == []
+
+    def test_moderator_permissions_from_claims(self, moderator, review):
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.id}/'
+        response, queries = user_queries(
+            claims_client(moderator), 'delete', url
+        )
+        assert response.status_code == 204
+        assert queries == []
+
+    def test_me_returns_full_profile(self, user):
+        client = claims_client(user)
+        response = client.get('/api/v1/users/me/')
+        assert response.json()['email'] == user.email
+        assert response.json()['bio'] == user.bio
+        response = client.patch('/api/v1/users/me/', {'first_name': 'Имя'})
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert (user.first_name, user.bio) == ('Имя', 'user bio'), (
+            'Проверьте, что PATCH-запрос к users/me/ c токеном с claims '
+            'не затирает остальные поля'
+        )
+
+
+@pytest.mark.django_db
+class TestUserCache:
+
+    def test_token_without_claims_cached(self, user, title):
+        client = get_client(user)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        _, first = user_queries(client, 'get', url)
+        _, second = user_queries(client, 'get', url)
+        assert len(first) == 1 and second == [], (
+            'Проверьте, что пользователь токена без claims загружается '
+            'из БД один раз и дальше берется из кеша'
+        )
+
+    def test_role_change_invalidates(self, admin, admin_client, user,
+                                     title):
+        client = get_client(user)
+        client.get('/api/v1/users/me/')
+        assert user_cache.get(user.id) is not None
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': 'moderator'}
+        )
+        assert response.status_code == 200
+        assert user_cache.get(user.id) is None, (
+            'Проверьте, что изменение пользователя удаляет его из кеша'
+        )
+        other = create_reviews(title, [admin])[0]
+        response = client.delete(
+            f'/api/v1/titles/{other.title_id}/reviews/{other.id}/'
+        )
+        assert response.status_code == 204, (
+            'Проверьте, что новая роль действует сразу после изменения'
+        )
+
+
+    def test_change_in_other_process(self, user):
+        client = get_client(user)
+        client.get('/api/v1/users/me/')
+        assert user_cache.get(user.id) is not None
+        User.objects.filter(pk=user.pk).update(bio='Новое био')
+        bump_versions([user_namespace(user.pk)])
+        response = client.get('/api/v1/users/me/')
+        assert response.json()['bio'] == 'Новое био', (
+            'Проверьте, что запись кеша пользователя устаревает, когда '
+            'другой процесс сдвигает версию пользователя в общем кеше'
+        )
+
+
+class TestUserCacheStructure:
+
+    class Record:
+        def __init__(self, pk):
+            self.pk = pk
+
+    def test_lru_eviction(self):
+        cache = UserCache(size=2, ttl=60)
+        for pk in (1, 2):
+            cache.set(self.Record(pk), cache.version(pk))
+        cache.get(1)
+        cache.set(self.Record(3), cache.version(3))
+        assert cache.get(2) is None, (
+            'Проверьте, что кеш вытесняет давно не использованные записи'
+        )
+        assert cache.get(1).pk == 1
+
+    def test_ttl(self):
+        cache = UserCache(size=2, ttl=-1)
+        cache.set(self.Record(1), cache.version(1))
+        assert cache.get(1) is None, (
+            'Проверьте, что записи кеша устаревают через TTL'
+        )
+
+
+def backdated_token(user, seconds=10):
+    """Токен, выданный seconds секунд назад."""
+    token = access_token_for(user)
+    token['iat'] -= seconds
+    return token
+
+
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@pytest.mark.django_db(transaction=True)
+class TestTokenRevocation:
+
+    def test_demotion_revokes_tokens(self, admin_client, moderator, review):
+        client = token_client(backdated_token(moderator))
+        response = admin_client.patch(
+            f'/api/v1/users/{moderator.username}/', {'role': 'user'}
+        )
+        assert response.status_code == 200
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.id}/'
+        assert client.delete(url).status_code == 401, (
+            'Проверьте, что понижение роли отзывает токены пользователя'
+        )
+        time.sleep(1)
+        fresh = claims_client(User.objects.get(pk=moderator.pk))
+        assert fresh.delete(url).status_code == 403, (
+            'Проверьте, что новый токен выдается с новой ролью'
+        )
+
+    def test_promotion_keeps_tokens(self, admin_client, user):
+        client = token_client(backdated_token(user))
+        admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': 'moderator'}
+        )
+        assert client.get('/api/v1/users/me/').status_code == 200
+        assert not TokenRevocation.objects.exists()
+
+    def test_single_token(self, user):
+        token = access_token_for(user)
+        other = access_token_for(user)
+        TokenRevocation.objects.create(
+            user=user, jti=token['jti'],
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        revocations.load(None)
+        assert token_client(token).get(
+            '/api/v1/users/me/'
+        ).status_code == 401
+        assert token_client(other).get(
+            '/api/v1/users/me/'
+        ).status_code == 200
+
+    def test_check_without_queries(self, user, title):
+        client = token_client(backdated_token(user))
+        client.get(f'/api/v1/titles/{title.id}/reviews/')
+        with CaptureQueriesContext(connection) as context:
+            client.get(f'/api/v1/titles/{title.id}/reviews/')
+        assert not any(
+            'users_tokenrevocation' in query['sql']
+            for query in context.captured_queries
+        ), 'Проверьте, что проверка отзыва токена не обращается к БД'
+
+    def test_admin_action(self, admin_user, user):
+        client = token_client(backdated_token(user))
+        site = Client()
+        site.force_login(admin_user)
+        response = site.post('/admin/users/user/', {
+            'action': 'revoke_tokens', '_selected_action': [user.pk],
+        })
+        assert response.status_code == 302
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что действие админки отзывает токены пользователя'
+        )
+
+    def test_deactivation_revokes_tokens(self, user):
+        client = token_client(backdated_token(user))
+        user.is_active = False
+        user.save()
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что блокировка пользователя отзывает его токены'
+        )
+
+    def test_delete_revokes_tokens(self, user, title):
+        client = token_client(backdated_token(user))
+        user.delete()
+        response = client.post(
+            f'/api/v1/titles/{title.id}/reviews/',
+            {'text': 'Отзыв', 'score': 5}, format='json',
+        )
+        assert response.status_code == 401, (
+            'Проверьте, что удаление пользователя отзывает его токены'
+        )
+
+    def test_token_in_revocation_second(self, user):
+        revoked_at = timezone.now().replace(microsecond=100000)
+        token = access_token_for(user)
+        token['iat'] = int(revoked_at.timestamp())
+        TokenRevocation.objects.create(
+            user=user, created_at=revoked_at,
+            expires_at=revoked_at + timedelta(days=1),
+        )
+        revocations.load(None)
+        assert token_client(token).get(
+            '/api/v1/users/me/'
+        ).status_code == 401, (
+            'Проверьте, что токен, выданный в ту же секунду, что и отзыв, '
+            'отзывается'
+        )
+        token['iat'] += 1
+        assert token_client(token).get(
+            '/api/v1/users/me/'
+        ).status_code == 200, (
+            'Проверьте, что токен, выданный после отзыва, действует'
+        )
@@ -0,0 +1,32 @@
+import pytest
+from django.test import override_settings
+from reviews.management.commands._private import seed_catalogue
+from reviews.management.commands.benchmark_api import percentile, run_suite
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_suite():
+    seed_catalogue(titles=5, reviews_per_title=3, comments_per_review=1,
+                   users=5, categories=2, genres=3)
+    with override_settings(INSTRUMENTATION_ENABLED=True):
+        results = run_suite(requests=4, concurrency=2)
+    assert {'titles-list', 'reviews-detail', 'users-me'} <= set(results), (
+        'Проверьте, что бенчмарк проходит по маршрутам api'
+    )
+    for name, result in results.items():
+        assert result['errors'] == 0, f'{name}: {result}'
+        assert result['requests'] == 4
+        assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+        assert result['throughput_rps'] > 0
+    assert results['reviews-list']['queries_per_request'] > 0, (
+        'Проверьте, что число SQL-запросов берется из Server-Timing'
+    )
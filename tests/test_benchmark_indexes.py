@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+from django.conf import settings
+
+
+def test_benchmark_indexes():
+    result = subprocess.run(
+        (sys.executable, 'manage.py', 'benchmark_indexes', '--titles', '5',
+         '--reviews', '2', '--comments', '1', '--repeat', '1'),
+        cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    assert 'before: titles by rating' in result.stdout
+    assert 'after: titles by rating' in result.stdout
+    assert 'Median time, ms' in result.stdout, (
+        'Проверьте, что бенчмарк откатывает миграции до --before и '
+        'накатывает их обратно'
+    )
@@ -0,0 +1,130 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .fixtures.fixture_data import create_titles
+
+
+def get(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает статус 200'
+    )
+    return response.json(), len(context)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestResponseCache:
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/categories/',
+        '/api/v1/genres/',
+        '/api/v1/titles/',
+        '/api/v1/titles/?year=2000&page=1',
+    ])
+    def test_repeated_get_is_cached(self, client, title, url):
+        first, _ = get(client, url)
+        second, queries = get(client, url)
+        assert second == first
+        assert queries == 0, (
+            f'Проверьте, что повторный GET-запрос к `{url}` '
+            'отдается из кеша без запросов к БД'
+        )
+
+    def test_title_detail_is_cached(self, client, title):
+        url = f'/api/v1/titles/{title.id}/'
+        get(client, url)
+        _, queries = get(client, url)
+        assert queries == 0, (
+            f'Проверьте, что повторный GET-запрос к `{url}` '
+            'отдается из кеша без запросов к БД'
+        )
+
+    def test_review_invalidates_title(self, client, user_client, title):
+        detail_url = f'/api/v1/titles/{title.id}/'
+        other = create_titles(1, start=1)[0]
+        other_url = f'/api/v1/titles/{other.id}/'
+        get(client, '/api/v1/titles/')
+        get(client, detail_url)
+        get(client, other_url)
+
+        response = user_client.post(
+            f'/api/v1/titles/{title.id}/reviews/',
+            data={'text': 'Отзыв', 'score': 8}
+        )
+        assert response.status_code == 201
+
+        detail, _ = get(client, detail_url)
+        assert detail['rating'] == 8, (
+            'Проверьте, что новый отзыв инвалидирует кеш произведения'
+        )
+        titles, _ = get(client, '/api/v1/titles/')
+        ratings = {item['id']: item['rating'] for item in titles['results']}
+        assert ratings[title.id] == 8, (
+            'Проверьте, что новый отзыв инвалидирует кеш списка произведений'
+        )
+        _, queries = get(client, other_url)
+        assert queries == 0, (
+            'Проверьте, что отзыв не инвалидирует кеш других произведений'
+        )
+
+    def test_category_write_invalidates(self, client, admin_client, title):
+        get(client, '/api/v1/categories/')
+        get(client, f'/api/v1/titles/{title.id}/')
+
+        response = admin_client.delete(
+            f'/api/v1/categories/{title.category.slug}/'
+        )
+        assert response.status_code == 204
+
+        categories, _ = get(client, '/api/v1/categories/')
+        assert categories['count'] == 0, (
+            'Проверьте, что удаление категории инвалидирует кеш категорий'
+        )
+        detail, _ = get(client, f'/api/v1/titles/{title.id}/')
+        assert detail['category'] is None, (
+            'Проверьте, что удаление категории инвалидирует кеш произведений'
+        )
+
+    def test_title_update_invalidates(self, client, admin_client, title):
+        url = f'/api/v1/titles/{title.id}/'
+        get(client, url)
+
+        response = admin_client.patch(url, data={'name': 'Новое название'})
+        assert response.status_code == 200
+
+        detail, _ = get(client, url)
+        assert detail['name'] == 'Новое название', (
+            'Проверьте, что изменение произведения инвалидирует его кеш'
+        )
+
+    def test_user_delete_invalidates_title(self, client, review, user):
+        url = f'/api/v1/titles/{review.title_id}/'
+        detail, _ = get(client, url)
+        assert detail['rating'] == 5
+
+        user.delete()
+
+        detail, _ = get(client, url)
+        assert detail['rating'] is None, (
+            'Проверьте, что удаление автора c его отзывами инвалидирует кеш '
+            'произведения'
+        )
+        reviews, _ = get(client, f'{url}reviews/')
+        assert reviews['results'] == [], (
+            'Проверьте, что удаление автора инвалидирует кеш отзывов'
+        )
+
+    def test_orm_write_invalidates(self, client, title):
+        url = f'/api/v1/titles/{title.id}/'
+        get(client, url)
+
+        title.name = 'Новое название'
+        title.save()
+
+        detail, _ = get(client, url)
+        assert detail['name'] == 'Новое название', (
+            'Проверьте, что изменение произведения в обход api (админка, '
+            'ORM) инвалидирует его кеш'
+        )
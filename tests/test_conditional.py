@@ -0,0 +1,173 @@
+import pytest
+from api.authentication import access_token_for
+from api.cache import version_key
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from .fixtures.fixture_data import create_comments
+
+
+def conditional_get(client, url, etag):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    return response, len(context)
+
+
+def get_etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает статус 200'
+    )
+    assert response.has_header('ETag'), (
+        f'Проверьте, что ответ на GET-запрос к `{url}` содержит ETag'
+    )
+    assert response.has_header('Last-Modified'), (
+        f'Проверьте, что ответ на GET-запрос к `{url}` содержит Last-Modified'
+    )
+    return response['ETag']
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConditionalGet:
+
+    def assert_not_modified(self, client, url, max_queries=0):
+        etag = get_etag(client, url)
+        response, queries = conditional_get(client, url, etag)
+        assert response.status_code == 304, (
+            f'Проверьте, что GET-запрос к `{url}` c актуальным '
+            'If-None-Match возвращает статус 304'
+        )
+        assert queries <= max_queries, (
+            f'Проверьте, что ответ 304 на GET-запрос к `{url}` не требует '
+            'сериализации и запросов к БД'
+        )
+        return etag
+
+    def assert_modified(self, client, url, etag):
+        response, _ = conditional_get(client, url, etag)
+        assert response.status_code == 200, (
+            f'Проверьте, что после изменения данных GET-запрос к `{url}` '
+            'c прежним If-None-Match возвращает статус 200'
+        )
+        assert response['ETag'] != etag
+
+    def test_catalogue(self, client, title):
+        for url in (
+            '/api/v1/categories/',
+            '/api/v1/genres/',
+            '/api/v1/titles/',
+            f'/api/v1/titles/{title.id}/',
+        ):
+            self.assert_not_modified(client, url)
+
+    def test_reviews(self, client, user_client, title):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        etag = self.assert_not_modified(client, url)
+        response = user_client.post(url, data={'text': 'Отзыв', 'score': 8})
+        assert response.status_code == 201
+        self.assert_modified(client, url, etag)
+
+        detail_url = f'{url}{response.json()["id"]}/'
+        etag = self.assert_not_modified(client, detail_url)
+        response = user_client.patch(detail_url, data={'text': 'Правка'})
+        assert response.status_code == 200
+        self.assert_modified(client, detail_url, etag)
+
+    def test_comments(self, client, user_client, review, user):
+        url = (
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/comments/'
+        )
+        etag = self.assert_not_modified(client, url)
+        response = user_client.post(url, data={'text': 'Комментарий'})
+        assert response.status_code == 201
+        self.assert_modified(client, url, etag)
+
+        comment = create_comments(review, [user])[0]
+        detail_url = f'{url}{comment.id}/'
+        self.assert_not_modified(client, detail_url)
+
+    def test_author_rename(self, client, admin_client, review, user):
+        create_comments(review, [user])
+        reviews_url = f'/api/v1/titles/{review.title_id}/reviews/'
+        urls = (
+            reviews_url,
+            f'{reviews_url}{review.id}/',
+            f'{reviews_url}{review.id}/comments/',
+        )
+        etags = [get_etag(client, url) for url in urls]
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', data={'username': 'Renamed'}
+        )
+        assert response.status_code == 200
+        for url, etag in zip(urls, etags):
+            response, _ = conditional_get(client, url, etag)
+            assert response.status_code == 200, (
+                f'Проверьте, что после смены имени автора GET-запрос к '
+                f'`{url}` c прежним If-None-Match возвращает статус 200'
+            )
+
+    def test_review_delete_invalidates_comments(self, client, user_client,
+                                                review):
+        url = (
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/comments/'
+        )
+        etag = get_etag(client, url)
+        response = user_client.delete(
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/'
+        )
+        assert response.status_code == 204
+        response, _ = conditional_get(client, url, etag)
+        assert response.status_code == 404
+
+    def test_users(self, admin_client, user_client, user):
+        self.assert_not_modified(admin_client, '/api/v1/users/', 1)
+        url = f'/api/v1/users/{user.username}/'
+        etag = self.assert_not_modified(admin_client, url, 1)
+        response = admin_client.patch(url, data={'bio': 'Новое био'})
+        assert response.status_code == 200
+        self.assert_modified(admin_client, url, etag)
+
+        etag = self.assert_not_modified(user_client, '/api/v1/users/me/', 1)
+        response = user_client.patch(
+            '/api/v1/users/me/', data={'bio': 'Еще одно био'}
+        )
+        assert response.status_code == 200
+        self.assert_modified(user_client, '/api/v1/users/me/', etag)
+
+    def test_me_after_rename(self, admin_client, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {access_token_for(user)}'
+        )
+        response = client.patch(
+            '/api/v1/users/me/', data={'username': 'RenamedUser'}
+        )
+        assert response.status_code == 200
+        etag = get_etag(client, '/api/v1/users/me/')
+        response = admin_client.patch(
+            '/api/v1/users/RenamedUser/', data={'bio': 'Био от админа'}
+        )
+        assert response.status_code == 200
+        response, _ = conditional_get(client, '/api/v1/users/me/', etag)
+        assert response.status_code == 200, (
+            'Проверьте, что users/me/ не отдает 304 после изменения '
+            'пользователя, переименованного после выдачи токена'
+        )
+
+    def test_signup_invalidates_users(self, client, admin_client):
+        etag = self.assert_not_modified(admin_client, '/api/v1/users/', 1)
+        response = client.post('/api/v1/auth/signup/', {
+            'username': 'newbie', 'email': 'newbie@yamdb.fake',
+        })
+        assert response.status_code == 200
+        self.assert_modified(admin_client, '/api/v1/users/', etag)
+
+    def test_last_modified_rounds_up(self, client):
+        cache.set(version_key(('categories',)), 1000000000.5)
+        response = client.get('/api/v1/categories/')
+        assert response['Last-Modified'] == http_date(1000000001), (
+            'Проверьте, что Last-Modified не раньше версии данных'
+        )
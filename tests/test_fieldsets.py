@@ -0,0 +1,162 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .fixtures.fixture_data import (create_comments, create_reviews,
+                                    create_titles, create_users)
+
+RUNS = 5
+
+
+def get(client, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает статус 200'
+    )
+    return response, context.captured_queries
+
+
+def cpu_time(client, url):
+    """Лучшее из RUNS процессорное время ответа без кеша."""
+    timings = []
+    for _ in range(RUNS):
+        cache.clear()
+        started = time.process_time()
+        client.get(url)
+        timings.append(time.process_time() - started)
+    return min(timings)
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+
+    def test_titles_fields(self, client):
+        create_titles(3)
+        response, queries = get(client, '/api/v1/titles/?fields=id,name')
+        assert response.json()['results'][0] == {
+            'id': response.json()['results'][0]['id'],
+            'name': 'Произведение 0',
+        }, 'Проверьте, что параметр fields оставляет только указанные поля'
+        sql = ' '.join(query['sql'] for query in queries)
+        assert 'reviews_genre' not in sql, (
+            'Проверьте, что без поля genre жанры не загружаются'
+        )
+        assert 'reviews_category' not in sql
+        assert '"description"' not in sql, (
+            'Проверьте, что из БД читаются только нужные столбцы'
+        )
+
+    def test_titles_compact_and_expand(self, client):
+        title = create_titles(1)[0]
+        url = '/api/v1/titles/?fields=id,category,genre'
+        item = get(client, url)[0].json()['results'][0]
+        assert item['category'] == title.category.slug, (
+            'Проверьте, что вложенные объекты без expand выводятся slug'
+        )
+        assert sorted(item['genre']) == sorted(
+            title.genre.values_list('slug', flat=True)
+        )
+        item = get(client, url + '&expand=category')[0].json()['results'][0]
+        assert item['category'] == {
+            'name': title.category.name, 'slug': title.category.slug
+        }, 'Проверьте, что expand выводит вложенный объект целиком'
+        assert isinstance(item['genre'][0], str)
+
+    def test_titles_retrieve(self, client):
+        title = create_titles(1)[0]
+        response, queries = get(
+            client, f'/api/v1/titles/{title.id}/?fields=name,rating'
+        )
+        assert response.json() == {'name': title.name, 'rating': None}
+        assert len(queries) == 1
+
+    def test_default_unchanged(self, client):
+        create_titles(1)
+        item = get(client, '/api/v1/titles/?expand=genre')[0].json()
+        assert set(item['results'][0]) == {
+            'id', 'name', 'year', 'description', 'category', 'genre',
+            'rating',
+        }
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/titles/', '/api/v1/titles/top/',
+    ])
+    @pytest.mark.parametrize('params', [
+        'fields=id,unknown', 'fields=id&expand=name',
+    ])
+    def test_invalid(self, client, url, params):
+        create_titles(1)
+        response = client.get(f'{url}?{params}')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестные поля возвращают статус 400'
+        )
+
+    def test_top(self, client, django_user_model):
+        title = create_titles(1)[0]
+        create_reviews(title, create_users(django_user_model, 2))
+        response, queries = get(client, '/api/v1/titles/top/?fields=id,score')
+        assert set(response.json()[0]) == {'id', 'score'}
+        sql = ' '.join(query['sql'] for query in queries)
+        assert 'reviews_genre' not in sql and '"description"' not in sql, (
+            'Проверьте, что titles/top/ c параметром fields читает из БД '
+            'только нужные столбцы'
+        )
+
+    def test_reviews_and_comments(self, client, django_user_model):
+        title = create_titles(1)[0]
+        authors = create_users(django_user_model, 2)
+        review = create_reviews(title, authors)[0]
+        create_comments(review, authors)
+        base = f'/api/v1/titles/{title.id}/reviews/'
+        for url in (base, f'{base}{review.id}/comments/'):
+            response, queries = get(client, url + '?fields=id,text')
+            assert set(response.json()['results'][0]) == {'id', 'text'}
+            assert not any(
+                'users_user' in query['sql'] for query in queries
+            ), 'Проверьте, что без поля author автор не загружается'
+        response, _ = get(
+            client, base + '?fields=id&pagination=cursor'
+        )
+        assert response.json()['next'] is None
+
+    def test_users(self, admin_client, admin):
+        response, queries = get(admin_client, '/api/v1/users/?fields=username')
+        assert response.json()['results'] == [{'username': admin.username}]
+        assert '"bio"' not in queries[-1]['sql'], (
+            'Проверьте, что из БД читаются только нужные столбцы'
+        )
+        response, _ = get(admin_client, '/api/v1/users/me/?fields=email')
+        assert response.json() == {'email': admin.email}
+
+    def test_payload(self, client):
+        """Объем страницы произведений c fields=id,name,rating и без него."""
+        create_titles(5)
+        full = len(get(client, '/api/v1/titles/')[0].content)
+        sparse = len(
+            get(client, '/api/v1/titles/?fields=id,name,rating')[0].content
+        )
+        assert sparse * 3 < full, (
+            'Проверьте, что fields=id,name,rating сокращает ответ хотя бы '
+            f'втрое: {full} байт целиком, {sparse} выборочно'
+        )
+
+    @pytest.mark.benchmark
+    def test_cpu(self, client):
+        """
+        Бенчмарк процессорного времени страницы произведений c
+        fields=id,name,rating и без него. Зависит от нагрузки машины,
+        поэтому запускается только явно: pytest -m benchmark.
+        """
+        create_titles(5)
+        full_cpu = cpu_time(client, '/api/v1/titles/')
+        sparse_cpu = cpu_time(client, '/api/v1/titles/?fields=id,name,rating')
+        assert sparse_cpu < full_cpu, (
+            'Проверьте, что выборочные поля дешевле по процессорному '
+            f'времени: {full_cpu:.4f} c целиком, {sparse_cpu:.4f} c '
+            'выборочно'
+        )
@@ -0,0 +1,150 @@
+import csv
+import os
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from reviews.management.commands.load_data import SOURCES
+from reviews.models import Comment, Review, Title, TitleDailyScore
+
+OPTIONS = {
+    'users': 30, 'titles': 40, 'categories': 3, 'genres': 5,
+    'reviews': 300, 'comments': 1.0, 'chunk_size': 7, 'workers': 1,
+}
+
+
+def read(directory, filename):
+    with open(os.path.join(directory, filename), encoding='utf-8',
+              newline='') as file:
+        return list(csv.reader(file))
+
+
+def generate(directory, **options):
+    call_command('generate_data', path=str(directory),
+                 **dict(OPTIONS, **options))
+
+
+@contextmanager
+def no_naive_datetimes():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        yield
+    naive = [
+        warning for warning in caught
+        if 'naive datetime' in str(warning.message)
+    ]
+    assert not naive, (
+        'Проверьте, что даты синтетических данных пишутся c часовым поясом'
+    )
+
+
+class TestGenerateData:
+
+    def test_csv_layout(self, tmp_path):
+        generate(tmp_path)
+        for filename, _, fields in SOURCES:
+            rows = read(tmp_path, filename)
+            assert rows[0] == list(fields.values()), (
+                f'Проверьте, что заголовок {filename} совпадает c SOURCES '
+                'команды load_data'
+            )
+            assert [int(row[0]) for row in rows[1:]] == list(
+                range(1, len(rows))
+            ), f'Проверьте, что id в {filename} идут подряд c 1'
+
+        reviews = read(tmp_path, 'review.csv')[1:]
+        pairs = [(row[1], row[3]) for row in reviews]
+        assert len(set(pairs)) == len(pairs), (
+            'Проверьте, что автор пишет не больше одного отзыва на '
+            'произведение'
+        )
+        per_title = Counter(title for title, _ in pairs).most_common()
+        assert per_title[0][1] >= 5 * per_title[-1][1], (
+            'Проверьте, что отзывы распределены по произведениям неравномерно'
+        )
+        assert all(1 <= int(row[4]) <= 10 for row in reviews)
+
+    def test_independent_of_workers(self, tmp_path):
+        generate(tmp_path / 'one')
+        generate(tmp_path / 'many', workers=3)
+        for filename in ('titles.csv', 'genre_title.csv', 'review.csv'):
+            one = [row[:4] for row in read(tmp_path / 'one', filename)]
+            many = [row[:4] for row in read(tmp_path / 'many', filename)]
+            assert one == many, (
+                'Проверьте, что результат не зависит от числа процессов'
+            )
+
+    @pytest.mark.django_db
+    def test_load_data(self, tmp_path):
+        generate(tmp_path)
+        with no_naive_datetimes():
+            call_command('load_data', path=str(tmp_path))
+        assert Title.objects.count() == OPTIONS['titles']
+        assert Review.objects.count() == len(read(tmp_path, 'review.csv')) - 1
+        assert Review.objects.dates('pub_date', 'day').count() > 1, (
+            'Проверьте, что load_data сохраняет даты отзывов из csv'
+        )
+        assert Comment.objects.dates('pub_date', 'day').count() > 1, (
+            'Проверьте, что load_data сохраняет даты комментариев из csv'
+        )
+
+    @pytest.mark.django_db
+    def test_incremental_ratings(self, tmp_path):
+        generate(tmp_path)
+        call_command('load_data', path=str(tmp_path), incremental=True)
+        rows = read(tmp_path, 'review.csv')
+        rows[1][4] = '1' if rows[1][4] != '1' else '10'
+        with open(tmp_path / 'review.csv', 'w', encoding='utf-8',
+                  newline='') as file:
+            csv.writer(file).writerows(rows)
+        changed = int(rows[1][1])
+        untouched = set(
+            TitleDailyScore.objects.exclude(
+                title_id=changed
+            ).values_list('pk', flat=True)
+        )
+
+        call_command('load_data', path=str(tmp_path), incremental=True)
+        assert untouched <= set(
+            TitleDailyScore.objects.values_list('pk', flat=True)
+        ), (
+            'Проверьте, что --incremental не пересоздает дневные итоги '
+            'незатронутых произведений'
+        )
+        fields = ('pk', 'score_sum', 'reviews_count', 'rating',
+                  'weighted_rating')
+        incremental = list(Title.objects.order_by('pk').values(*fields))
+        scores = list(TitleDailyScore.objects.order_by(
+            'title', 'day'
+        ).values('title', 'day', 'score_sum', 'reviews_count'))
+        Title.rebuild_ratings()
+        assert list(Title.objects.order_by('pk').values(*fields)) == (
+            incremental
+        ), 'Проверьте, что --incremental пересчитывает рейтинги'
+        assert list(TitleDailyScore.objects.order_by(
+            'title', 'day'
+        ).values('title', 'day', 'score_sum', 'reviews_count')) == scores
+
+    @pytest.mark.django_db
+    def test_database(self, tmp_path):
+        with no_naive_datetimes():
+            generate(tmp_path, format='db')
+        reviews = Review.objects.count()
+        assert reviews > 0
+        assert Comment.objects.exists()
+        assert sum(
+            Title.objects.values_list('reviews_count', flat=True)
+        ) == reviews, 'Проверьте, что после загрузки пересчитаны рейтинги'
+        assert Review.objects.dates('pub_date', 'day').count() > 1, (
+            'Проверьте, что даты отзывов сохраняются при загрузке в БД'
+        )
+        assert TitleDailyScore.objects.exists()
+        assert not Review.objects.filter(
+            pub_date__gt=timezone.now()
+        ).exists(), 'Проверьте, что даты отзывов не позже текущего момента'
+        assert not os.listdir(tmp_path), (
+            'Проверьте, что c --format db csv-файлы не остаются в --path'
+        )
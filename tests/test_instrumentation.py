@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from api.instrumentation import InstrumentationMiddleware, stats
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from .fixtures.fixture_data import create_titles
+
+RUNS = 200
+
+
+@pytest.fixture
+def instrumented(settings):
+    settings.INSTRUMENTATION_ENABLED = True
+
+
+def route(method, name):
+    return next(
+        entry for entry in stats.snapshot()
+        if entry['route'] == name and entry['method'] == method
+    )
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+
+    def test_server_timing(self, client, instrumented):
+        create_titles(2)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/titles/')
+        header = response['Server-Timing']
+        assert f'desc="{len(context)} queries"' in header, (
+            'Проверьте, что заголовок Server-Timing содержит число '
+            'SQL-запросов'
+        )
+        for metric in ('db;dur=', 'serialize;dur=', 'total;dur='):
+            assert metric in header
+
+    def test_route_stats(self, client, instrumented):
+        title = create_titles(1)[0]
+        client.get('/api/v1/titles/')
+        client.get('/api/v1/titles/')
+        response = client.get(f'/api/v1/titles/{title.id}/')
+        entry = route('GET', 'titles-list')
+        assert entry['requests'] == 2, (
+            'Проверьте, что измерения накапливаются по маршрутам'
+        )
+        assert entry['queries'] > 0
+        assert entry['serialize_time'] > 0
+        assert sum(entry['buckets']) <= entry['requests']
+        detail = route('GET', 'titles-detail')
+        assert detail['bytes'] == len(response.content)
+
+    def test_unresolved_route(self, client, instrumented):
+        client.get('/no/such/page/')
+        assert route('GET', 'unresolved')['requests'] == 1
+
+    def test_disabled(self, client):
+        create_titles(1)
+        response = client.get('/api/v1/titles/')
+        assert 'Server-Timing' not in response
+        assert stats.snapshot() == []
+
+    def test_stats_endpoint(self, admin_client, instrumented):
+        admin_client.get('/api/v1/titles/')
+        response = admin_client.get('/api/v1/stats/')
+        assert response.status_code == 200
+        assert any(
+            entry['route'] == 'titles-list' for entry in response.json()
+        )
+        response = admin_client.get('/api/v1/stats/?format=prometheus')
+        assert response.status_code == 200
+        text = response.content.decode()
+        assert (
+            'yamdb_requests_total{route="titles-list",method="GET"} 1'
+            in text
+        ), 'Проверьте, что stats/ отдает счетчики в формате Prometheus'
+        assert 'yamdb_request_duration_seconds_bucket{' in text
+
+    def test_stats_admin_only(self, client, user_client):
+        assert client.get('/api/v1/stats/').status_code == 401
+        assert user_client.get('/api/v1/stats/').status_code == 403
+
+    def test_overhead(self, client, instrumented, settings):
+        """
+        Накладные расходы middleware на запрос меньше 2% времени ответа
+        на список произведений.
+        """
+        create_titles(5)
+        started = time.perf_counter()
+        for _ in range(RUNS // 10):
+            client.get('/api/v1/titles/')
+        request_time = (time.perf_counter() - started) / (RUNS // 10)
+
+        request = RequestFactory().get('/')
+        response = HttpResponse('ok')
+        bare = InstrumentationMiddleware(lambda request: response)
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            bare(request)
+        overhead = (time.perf_counter() - started) / RUNS
+        assert overhead < request_time * 0.02, (
+            'Проверьте, что измерения добавляют к запросу меньше 2%: '
+            f'{overhead * 1e6:.0f} мкс на запрос '
+            f'при ответе за {request_time * 1e6:.0f} мкс'
+        )
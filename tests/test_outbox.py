@@ -0,0 +1,109 @@
+import smtplib
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from users.models import OutgoingEmail
+
+from .fixtures.fixture_requests import signup
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+class FailingBackend(BaseEmailBackend):
+    """Почтовый сервер, отклоняющий письма на адреса c 'bounce'."""
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if any('bounce' in address for address in message.to):
+                raise smtplib.SMTPRecipientsRefused({})
+            mail.outbox.append(message)
+        return len(email_messages)
+
+
+class UnreachableBackend(BaseEmailBackend):
+    """Почтовый сервер, к которому не удается подключиться."""
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP недоступен')
+
+    def send_messages(self, email_messages):
+        return 0
+
+
+def send_emails():
+    call_command('send_emails', '--once')
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    @pytest.fixture(autouse=True)
+    def locmem(self, settings):
+        settings.EMAIL_BACKEND = LOCMEM_BACKEND
+        settings.EMAIL_OUTBOX_RETRY_DELAY = 60
+        settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 3
+        mail.outbox = []
+
+    def test_signup_only_enqueues(self, client):
+        response = signup(client, 'newbie')
+        assert response.status_code == 200
+        assert mail.outbox == [], (
+            'Проверьте, что регистрация не отправляет письмо в запросе'
+        )
+        email = OutgoingEmail.objects.get()
+        assert email.recipient == 'newbie@yamdb.fake'
+        assert email.sent_at is None
+
+    def test_worker_sends_batch(self, client):
+        for username in ('first', 'second', 'third'):
+            signup(client, username)
+        call_command('send_emails', '--once', '--batch-size', '2')
+        assert sorted(message.to[0] for message in mail.outbox) == [
+            'first@yamdb.fake', 'second@yamdb.fake', 'third@yamdb.fake',
+        ]
+        assert not OutgoingEmail.objects.filter(
+            sent_at__isnull=True
+        ).exists()
+        send_emails()
+        assert len(mail.outbox) == 3, (
+            'Проверьте, что отправленные письма не отправляются повторно'
+        )
+
+    def test_failed_email_backs_off(self, client, settings):
+        settings.EMAIL_BACKEND = 'tests.test_outbox.FailingBackend'
+        signup(client, 'bounce')
+        signup(client, 'good')
+        send_emails()
+        assert [message.to for message in mail.outbox] == [
+            ['good@yamdb.fake']
+        ], 'Проверьте, что ошибка одного письма не мешает остальным'
+        failed = OutgoingEmail.objects.get(recipient='bounce@yamdb.fake')
+        assert failed.sent_at is None
+        assert failed.attempts == 1
+        assert failed.last_error
+        delay = (failed.send_after - timezone.now()).total_seconds()
+        assert 50 < delay <= 60, (
+            'Проверьте, что неотправленное письмо откладывается на '
+            'EMAIL_OUTBOX_RETRY_DELAY секунд'
+        )
+
+    def test_retries_double_and_stop(self, client, settings):
+        settings.EMAIL_BACKEND = 'tests.test_outbox.UnreachableBackend'
+        signup(client, 'patient')
+        delays = []
+        for _ in range(settings.EMAIL_OUTBOX_MAX_ATTEMPTS + 1):
+            OutgoingEmail.objects.update(send_after=timezone.now())
+            started = timezone.now()
+            send_emails()
+            email = OutgoingEmail.objects.get()
+            delays.append(round((email.send_after - started).total_seconds()))
+        assert delays[:3] == [60, 120, 240], (
+            'Проверьте, что задержка повторной отправки удваивается'
+        )
+        assert email.attempts == settings.EMAIL_OUTBOX_MAX_ATTEMPTS, (
+            'Проверьте, что после EMAIL_OUTBOX_MAX_ATTEMPTS попыток письмо '
+            'больше не отправляется'
+        )
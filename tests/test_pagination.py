@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .fixtures.fixture_data import (create_comments, create_reviews,
+                                    create_users)
+
+ITEMS = 12
+
+
+def walk(client, url):
+    """Проходит все страницы по ссылкам next, считая запросы к БД."""
+    items, queries = [], []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET-запрос к `{url}` возвращает статус 200'
+        )
+        data = response.json()
+        assert 'count' not in data, (
+            'Проверьте, что в режиме курсора не выполняется COUNT(*)'
+        )
+        items.extend(data['results'])
+        queries.append(len(context))
+        url = data['next']
+    return items, queries
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def assert_cursor_walk(self, client, url, expected_ids):
+        items, queries = walk(client, f'{url}?pagination=cursor')
+        assert [item['id'] for item in items] == expected_ids, (
+            f'Проверьте, что курсор по `{url}` обходит все объекты '
+            'по одному разу в стабильном порядке'
+        )
+        assert len(set(queries)) == 1, (
+            f'Проверьте, что страницы курсора по `{url}` стоят одинаковое '
+            f'число запросов к БД: {queries}'
+        )
+
+    def test_reviews(self, client, title, django_user_model):
+        reviews = create_reviews(
+            title, create_users(django_user_model, ITEMS)
+        )
+        self.assert_cursor_walk(
+            client, f'/api/v1/titles/{title.id}/reviews/',
+            [review.id for review in reversed(reviews)]
+        )
+
+    def test_comments(self, client, review, django_user_model):
+        comments = create_comments(
+            review, create_users(django_user_model, ITEMS)
+        )
+        self.assert_cursor_walk(
+            client,
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/comments/',
+            [comment.id for comment in reversed(comments)]
+        )
+
+    def test_users(self, admin_client, admin, django_user_model):
+        users = create_users(django_user_model, ITEMS)
+        items, _ = walk(admin_client, '/api/v1/users/?pagination=cursor')
+        assert [item['username'] for item in items] == [
+            user.username for user in [admin] + users
+        ]
+
+    def test_page_number_is_default(self, client, title):
+        response = client.get(f'/api/v1/titles/{title.id}/reviews/')
+        assert response.status_code == 200
+        assert response.json()['count'] == 0, (
+            'Проверьте, что без ?pagination=cursor используется '
+            'постраничная пагинация'
+        )
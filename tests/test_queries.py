@@ -0,0 +1,188 @@
+import pytest
+from api.authentication import user_cache
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .fixtures.fixture_data import (create_comments, create_reviews,
+                                    create_titles, create_users)
+
+PAGE_SIZE = 5
+
+
+def count_queries(client, url):
+    cache.clear()
+    user_cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает статус 200'
+    )
+    return len(context)
+
+
+def assert_constant_queries(client, url, grow):
+    """
+    Число запросов к БД не должно зависеть от числа объектов на странице.
+    grow() досоздает объекты так, чтобы страница заполнилась целиком.
+    """
+    queries_before = count_queries(client, url)
+    grow()
+    queries_after = count_queries(client, url)
+    assert queries_before == queries_after, (
+        f'Проверьте, что число запросов к БД при GET-запросе к `{url}` '
+        'не растет вместе с числом объектов на странице: '
+        f'{queries_before} запросов для одного объекта, '
+        f'{queries_after} для полной страницы'
+    )
+
+
+@pytest.mark.django_db
+class TestQueryCount:
+
+    def test_categories_list(self, client):
+        create_titles(1)
+        assert_constant_queries(
+            client, '/api/v1/categories/',
+            lambda: create_titles(PAGE_SIZE - 1, start=1)
+        )
+
+    def test_genres_list(self, client):
+        create_titles(1)
+        assert_constant_queries(
+            client, '/api/v1/genres/',
+            lambda: create_titles(PAGE_SIZE - 1, start=1)
+        )
+
+    def test_titles_list(self, client):
+        create_titles(1)
+        assert_constant_queries(
+            client, '/api/v1/titles/',
+            lambda: create_titles(PAGE_SIZE - 1, start=1)
+        )
+
+    def test_titles_detail(self, client, title):
+        def grow():
+            title.genre.add(*[
+                genre
+                for other in create_titles(PAGE_SIZE - 1, start=1)
+                for genre in other.genre.all()
+            ])
+
+        assert_constant_queries(client, f'/api/v1/titles/{title.id}/', grow)
+
+    def test_reviews_list(self, client, title, django_user_model):
+        authors = create_users(django_user_model, PAGE_SIZE)
+        create_reviews(title, authors[:1])
+        assert_constant_queries(
+            client, f'/api/v1/titles/{title.id}/reviews/',
+            lambda: create_reviews(title, authors[1:])
+        )
+
+    def test_reviews_detail(self, client, review):
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.id}/'
+        assert count_queries(client, url) <= 2, (
+            f'Проверьте, что GET-запрос к `{url}` выполняет не больше '
+            'двух запросов к БД'
+        )
+
+    def test_comments_list(self, client, review, django_user_model):
+        authors = create_users(django_user_model, PAGE_SIZE)
+        create_comments(review, authors[:1])
+        assert_constant_queries(
+            client,
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/comments/',
+            lambda: create_comments(review, authors[1:])
+        )
+
+    def test_comments_detail(self, client, review, user):
+        comment = create_comments(review, [user])[0]
+        url = (
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/'
+            f'comments/{comment.id}/'
+        )
+        assert count_queries(client, url) <= 2, (
+            f'Проверьте, что GET-запрос к `{url}` выполняет не больше '
+            'двух запросов к БД'
+        )
+
+    def test_users_list(self, admin_client, django_user_model):
+        assert_constant_queries(
+            admin_client, '/api/v1/users/',
+            lambda: create_users(django_user_model, PAGE_SIZE)
+        )
+
+    def test_users_detail(self, admin_client, user):
+        url = f'/api/v1/users/{user.username}/'
+        assert count_queries(admin_client, url) <= 2, (
+            f'Проверьте, что GET-запрос к `{url}` выполняет не больше '
+            'двух запросов к БД'
+        )
+
+    def test_users_me(self, user_client):
+        assert count_queries(user_client, '/api/v1/users/me/') <= 1, (
+            'Проверьте, что GET-запрос к `/api/v1/users/me/` выполняет '
+            'не больше одного запроса к БД'
+        )
+
+
+def count_write_queries(client, method, url, data=None):
+    """
+    Запросы к БД при обращении к вложенному ресурсу, без точек
+    сохранения транзакций. Отдельно считаются чтения произведения.
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data=data, format='json')
+    assert response.status_code < 300, (
+        f'Проверьте, что {method.upper()}-запрос к `{url}` выполняется '
+        'успешно'
+    )
+    queries = [
+        query['sql'] for query in context.captured_queries
+        if 'SAVEPOINT' not in query['sql']
+    ]
+    title_reads = [
+        sql for sql in queries
+        if sql.startswith('SELECT') and 'FROM "reviews_title"' in sql
+    ]
+    return len(queries), len(title_reads)
+
+
+@pytest.mark.django_db
+class TestNestedResourceQueries:
+    """
+    Произведение и отзыв из адреса загружаются один раз за запрос,
+    отзыв - вместе с произведением.
+    """
+
+    @pytest.mark.parametrize('method, path, data, limit', [
+        ('get', '', None, 4),
+        ('post', '', {'text': 'Новый отзыв', 'score': 7}, 6),
+        ('get', '{review}/', None, 3),
+        ('patch', '{review}/', {'score': 3}, 8),
+        ('delete', '{review}/', None, 9),
+        ('get', '{review}/comments/', None, 4),
+        ('post', '{review}/comments/', {'text': 'Новый'}, 3),
+        ('get', '{review}/comments/{comment}/', None, 3),
+        ('patch', '{review}/comments/{comment}/', {'text': 'Правка'}, 4),
+        ('delete', '{review}/comments/{comment}/', None, 4),
+    ])
+    def test_nested_endpoint(self, user_client, review, user,
+                             method, path, data, limit):
+        comment = create_comments(review, [user])[0]
+        if method == 'post' and not path:
+            review.delete()
+        url = f'/api/v1/titles/{review.title_id}/reviews/' + path.format(
+            review=review.id, comment=comment.id
+        )
+        queries, title_reads = count_write_queries(
+            user_client, method, url, data
+        )
+        assert title_reads <= 1, (
+            f'Проверьте, что {method.upper()}-запрос к `{url}` загружает '
+            'произведение не больше одного раза'
+        )
+        assert queries <= limit, (
+            f'Проверьте, что {method.upper()}-запрос к `{url}` выполняет '
+            f'не больше {limit} запросов к БД, сейчас {queries}'
+        )
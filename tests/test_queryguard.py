@@ -0,0 +1,86 @@
+import logging
+
+import pytest
+from api.queryguard import (QueryGuard, QueryGuardError,
+                            allow_repeated_queries, fingerprint)
+from api.views import TitleViewSet
+from django.db import connection
+from django.test import RequestFactory
+from reviews.models import Title
+
+from .fixtures.fixture_data import create_titles
+
+
+@pytest.fixture
+def n_plus_one(monkeypatch):
+    """Список произведений без select_related и prefetch_related."""
+    create_titles(5)
+    monkeypatch.setattr(TitleViewSet, 'queryset', Title.objects.all())
+
+
+def repeat_query(times):
+    for _ in range(times):
+        list(Title.objects.filter(id=1))
+
+
+def test_fingerprint():
+    assert fingerprint(
+        "SELECT * FROM t WHERE id = 15 AND name = 'it''s' "
+        "AND x IN (%s, %s, %s)   LIMIT 21"
+    ) == 'SELECT * FROM t WHERE id = ? AND name = ? AND x IN (...) LIMIT ?'
+    assert fingerprint('SELECT * FROM genre_2') == 'SELECT * FROM genre_2'
+
+
+@pytest.mark.django_db
+class TestQueryGuard:
+
+    def test_strict_raises_on_n_plus_one(self, client, n_plus_one):
+        with pytest.raises(QueryGuardError, match='N\\+1 in titles-list'):
+            client.get('/api/v1/titles/')
+
+    def test_no_violations(self, client):
+        create_titles(5)
+        assert client.get('/api/v1/titles/').status_code == 200, (
+            'Проверьте, что список произведений читается без N+1'
+        )
+
+    def test_sampling_logs(self, client, n_plus_one, settings, caplog):
+        settings.QUERY_GUARD_MODE = 'sampling'
+        settings.QUERY_GUARD_SAMPLE_RATE = 1
+        with caplog.at_level(logging.WARNING, logger='api.queryguard'):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200, (
+            'Проверьте, что в режиме sampling нарушения не прерывают запрос'
+        )
+        messages = [record.getMessage() for record in caplog.records]
+        assert len(messages) == 2, (
+            'Проверьте, что каждое нарушение попадает в лог один раз'
+        )
+        assert any('N+1 in titles-list' in message for message in messages)
+        assert any('serializers.py' in message for message in messages), (
+            'Проверьте, что в лог попадает стек вызовов'
+        )
+
+    def test_sampling_rate(self, client, n_plus_one, settings, caplog):
+        settings.QUERY_GUARD_MODE = 'sampling'
+        settings.QUERY_GUARD_SAMPLE_RATE = 0
+        with caplog.at_level(logging.WARNING, logger='api.queryguard'):
+            client.get('/api/v1/titles/')
+        assert not caplog.records
+
+    def test_off(self, client, n_plus_one, settings):
+        settings.QUERY_GUARD_MODE = 'off'
+        assert client.get('/api/v1/titles/').status_code == 200
+
+    def test_slow_query(self, client, settings):
+        settings.QUERY_GUARD_SLOW_MS = -1
+        with pytest.raises(QueryGuardError, match='slow query'):
+            client.get('/api/v1/titles/')
+
+    def test_allow_repeated_queries(self):
+        guard = QueryGuard(RequestFactory().get('/'), strict=True)
+        with connection.execute_wrapper(guard):
+            with allow_repeated_queries():
+                repeat_query(5)
+            with pytest.raises(QueryGuardError):
+                repeat_query(3)
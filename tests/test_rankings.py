@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from reviews.models import GenreTitle, Review, Title, TitleDailyScore
+
+from .fixtures.fixture_data import create_titles, create_users
+
+
+def top(client, **params):
+    response = client.get('/api/v1/titles/top/', params)
+    assert response.status_code == 200, (
+        'Проверьте, что GET-запрос к `/api/v1/titles/top/` '
+        'возвращает статус 200'
+    )
+    return [item['id'] for item in response.json()]
+
+
+def review_all(title, authors, score):
+    for author in authors:
+        Review.objects.create(
+            title=title, author=author, text='Отзыв', score=score
+        )
+
+
+@pytest.fixture
+def ranked(django_user_model):
+    """
+    Три произведения: c одной десяткой, c двадцатью девятками и c
+    двадцатью тройками.
+    """
+    authors = create_users(django_user_model, 20)
+    lucky, solid, weak = create_titles(3)
+    review_all(lucky, authors[:1], 10)
+    review_all(solid, authors, 9)
+    review_all(weak, authors, 3)
+    return lucky, solid, weak
+
+
+@pytest.mark.django_db
+class TestTitleRankings:
+
+    def test_bayesian_order(self, client, ranked):
+        lucky, solid, weak = ranked
+        assert top(client) == [solid.id, lucky.id, weak.id], (
+            'Проверьте, что произведение c одним высоким отзывом не '
+            'обходит произведение c множеством высоких оценок'
+        )
+
+    def test_titles_without_reviews_skipped(self, client, ranked):
+        empty = create_titles(1, start=3)[0]
+        assert empty.id not in top(client), (
+            'Проверьте, что в рейтинг не попадают произведения без отзывов'
+        )
+
+    def test_limit(self, client, ranked):
+        assert top(client, limit=1) == [ranked[1].id]
+
+    @pytest.mark.parametrize('params', [
+        {'limit': 0}, {'limit': 1000}, {'window': 'year'},
+    ])
+    def test_invalid_params(self, client, params):
+        response = client.get('/api/v1/titles/top/', params)
+        assert response.status_code == 400, (
+            'Проверьте, что некорректные параметры рейтинга '
+            'возвращают статус 400'
+        )
+
+    def test_category_and_genre(self, client, ranked):
+        lucky, solid, _ = ranked
+        assert top(client, category=lucky.category.slug) == [lucky.id]
+        genre = solid.genre.first()
+        assert top(client, genre=genre.slug) == [solid.id]
+        assert top(client, genre=genre.slug,
+                   category=lucky.category.slug) == []
+
+    def test_genre_rating_follows_reviews(self, client, ranked):
+        lucky, solid, _ = ranked
+        genre = solid.genre.first()
+        lucky.genre.add(genre)
+        assert top(client, genre=genre.slug) == [solid.id, lucky.id], (
+            'Проверьте, что новая связь c жанром получает оценку '
+            'произведения'
+        )
+        Review.objects.filter(title=solid).update(score=1)
+        Title.rebuild_ratings()
+        cache.clear()
+        assert top(client, genre=genre.slug) == [lucky.id, solid.id]
+
+    def test_window(self, client, ranked):
+        lucky, solid, weak = ranked
+        old = timezone.now() - timedelta(days=10)
+        Review.objects.filter(title=solid).update(pub_date=old)
+        Title.rebuild_ratings()
+        assert top(client, window='week') == [lucky.id, weak.id], (
+            'Проверьте, что рейтинг за период учитывает только его отзывы'
+        )
+        assert top(client, window='month')[0] == solid.id
+
+    def test_daily_scores_follow_reviews(self, ranked):
+        lucky, _, _ = ranked
+        review = lucky.reviews.get()
+        review.score = 4
+        review.save()
+        daily = TitleDailyScore.objects.get(title=lucky)
+        assert (daily.reviews_count, daily.score_sum) == (1, 4)
+        review.delete()
+        daily.refresh_from_db()
+        assert (daily.reviews_count, daily.score_sum) == (0, 0)
+        lucky.refresh_from_db()
+        assert lucky.reviews_count == 0
+
+    def test_incremental_matches_rebuild(self, ranked):
+        def snapshot():
+            return (
+                list(Title.objects.order_by('id').values_list(
+                    'weighted_rating', flat=True)),
+                list(GenreTitle.objects.order_by('id').values_list(
+                    'weighted_rating', flat=True)),
+                list(TitleDailyScore.objects.order_by('title', 'day')
+                     .values_list('title', 'day', 'reviews_count',
+                                  'score_sum')),
+            )
+
+        incremental = snapshot()
+        Title.rebuild_ratings()
+        assert snapshot() == incremental, (
+            'Проверьте, что сигналы поддерживают рейтинги так же, '
+            'как их пересчитывает rebuild_ratings'
+        )
+
+    def test_top_queries(self, client, ranked):
+        genre = ranked[1].genre.first()
+        with CaptureQueriesContext(connection) as context:
+            top(client, genre=genre.slug)
+        assert len(context) <= 3, (
+            'Проверьте, что рейтинг читается без агрегации отзывов: '
+            'не больше трех запросов к БД'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReviewedTitleDelete:
+
+    def test_orm(self, ranked):
+        _, solid, _ = ranked
+        Title.objects.get(pk=solid.pk).delete()
+        assert not Title.objects.filter(pk=solid.pk).exists()
+        scores = TitleDailyScore.objects.filter(title_id=solid.pk)
+        assert not scores.exists(), (
+            'Проверьте, что удаление произведения не восстанавливает его '
+            'дневные итоги'
+        )
+
+    def test_api(self, admin_client, ranked):
+        lucky, _, _ = ranked
+        response = admin_client.delete(f'/api/v1/titles/{lucky.id}/')
+        assert response.status_code == 204, (
+            'Проверьте, что администратор может удалить произведение c '
+            'отзывами'
+        )
+        assert not Review.objects.filter(title_id=lucky.id).exists()
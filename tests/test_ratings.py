@@ -0,0 +1,80 @@
+import pytest
+from reviews.models import Review, Title
+
+from .fixtures.fixture_data import create_titles, create_users
+
+
+def ratings():
+    return list(Title.objects.order_by('id').values_list(
+        'rating', 'reviews_count', 'score_sum'
+    ))
+
+
+def assert_matches_rebuild():
+    incremental = ratings()
+    Title.rebuild_ratings()
+    assert ratings() == incremental, (
+        'Проверьте, что рейтинг, обновленный при изменении отзыва, '
+        'совпадает c пересчитанным rebuild_ratings'
+    )
+    return incremental
+
+
+@pytest.mark.django_db
+class TestRatingMaintenance:
+
+    @pytest.fixture
+    def titles(self):
+        return create_titles(2)
+
+    @pytest.fixture
+    def authors(self, django_user_model):
+        return create_users(django_user_model, 3)
+
+    def test_create(self, titles, authors):
+        for author, score in zip(authors, (10, 7, 4)):
+            Review.objects.create(
+                title=titles[0], author=author, text='Отзыв', score=score
+            )
+        assert assert_matches_rebuild()[0] == (7.0, 3, 21)
+
+    def test_update(self, titles, authors):
+        review = Review.objects.create(
+            title=titles[0], author=authors[0], text='Отзыв', score=2
+        )
+        review.score = 8
+        review.save()
+        assert assert_matches_rebuild()[0] == (8.0, 1, 8)
+
+    def test_delete(self, titles, authors):
+        first, second = (
+            Review.objects.create(
+                title=titles[0], author=author, text='Отзыв', score=score
+            )
+            for author, score in zip(authors, (9, 3))
+        )
+        first.delete()
+        assert assert_matches_rebuild()[0] == (3.0, 1, 3)
+        second.delete()
+        assert assert_matches_rebuild()[0] == (None, 0, 0)
+
+    def test_title_change(self, titles, authors):
+        review = Review.objects.create(
+            title=titles[0], author=authors[0], text='Отзыв', score=6
+        )
+        review.title = titles[1]
+        review.save()
+        assert assert_matches_rebuild() == [(None, 0, 0), (6.0, 1, 6)], (
+            'Проверьте, что перенос отзыва обновляет оба произведения'
+        )
+
+    def test_api(self, user_client, titles):
+        url = f'/api/v1/titles/{titles[0].id}/reviews/'
+        response = user_client.post(url, {'text': 'Отзыв', 'score': 5})
+        assert response.status_code == 201
+        review_url = f'{url}{response.json()["id"]}/'
+        response = user_client.patch(review_url, {'score': 1}, format='json')
+        assert response.status_code == 200
+        assert assert_matches_rebuild()[0] == (1.0, 1, 1)
+        assert user_client.delete(review_url).status_code == 204
+        assert assert_matches_rebuild()[0] == (None, 0, 0)
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Review
+
+from .fixtures.fixture_user import get_client
+
+THREADS = 5
+
+
+def post_review(client, title):
+    return client.post(
+        f'/api/v1/titles/{title.id}/reviews/',
+        data={'text': 'Отзыв', 'score': 7},
+        format='json',
+    )
+
+
+@pytest.mark.django_db
+class TestDuplicateReview:
+
+    def test_duplicate_payload(self, user_client, title):
+        assert post_review(user_client, title).status_code == 201
+        response = post_review(user_client, title)
+        assert response.status_code == 400, (
+            'Проверьте, что повторный отзыв на произведение возвращает '
+            'статус 400'
+        )
+        assert response.json() == {
+            'non_field_errors': [
+                f'Отзыв на произведение {title.name} уже существует'
+            ]
+        }
+        title.refresh_from_db()
+        assert title.reviews_count == 1, (
+            'Проверьте, что отклоненный отзыв не меняет рейтинг'
+        )
+
+    def test_no_existence_check(self, user_client, title):
+        with CaptureQueriesContext(connection) as context:
+            post_review(user_client, title)
+        assert not any(
+            'FROM "reviews_review"' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что перед созданием отзыва не выполняется '
+            'отдельный запрос на проверку дубликата'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_duplicates(user, title):
+    if connection.vendor == 'sqlite':
+        pytest.skip('SQLite блокирует таблицы при параллельной записи')
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+
+    def submit():
+        client = get_client(user)
+        try:
+            barrier.wait()
+            statuses.append(post_review(client, title).status_code)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=submit) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] + [400] * (THREADS - 1), (
+        'Проверьте, что из параллельных отзывов одного автора на '
+        f'произведение создается ровно один, получено {statuses}'
+    )
+    assert Review.objects.filter(author=user, title=title).count() == 1
+    title.refresh_from_db()
+    assert title.reviews_count == 1
@@ -0,0 +1,61 @@
+import pytest
+from reviews.models import Category, Genre, Title
+
+
+def search(client, query):
+    response = client.get('/api/v1/titles/', {'search': query})
+    assert response.status_code == 200, (
+        'Проверьте, что поиск по произведениям возвращает статус 200'
+    )
+    return [item['name'] for item in response.json()['results']]
+
+
+@pytest.fixture
+def catalogue():
+    for name, description in (
+        ('Побег из Шоушенка', 'Тюремная драма'),
+        ('Зеленая миля', 'Драма по роману о тюрьме'),
+        ('Тюрьма', 'Фильм'),
+        ('Крестный отец', 'Криминальная сага'),
+    ):
+        Title.objects.create(name=name, year=1990, description=description)
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_exact_word(self, client, catalogue):
+        assert search(client, 'отец') == ['Крестный отец']
+
+    def test_case_insensitive_prefix(self, client, catalogue):
+        assert search(client, 'шоуш') == ['Побег из Шоушенка'], (
+            'Проверьте, что поиск нечувствителен к регистру и находит '
+            'слова по префиксу'
+        )
+
+    def test_typo(self, client, catalogue):
+        assert 'Крестный отец' in search(client, 'крестнй отец'), (
+            'Проверьте, что поиск прощает опечатки'
+        )
+
+    def test_name_ranked_above_description(self, client, catalogue):
+        found = search(client, 'тюрьма')
+        assert found[0] == 'Тюрьма', (
+            'Проверьте, что совпадение в названии ранжируется выше '
+            'совпадения в описании'
+        )
+
+    def test_description(self, client, catalogue):
+        assert search(client, 'криминальная') == ['Крестный отец']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sees_new_titles(self, client, admin_client, catalogue):
+        Category.objects.create(name='Фильм', slug='movie')
+        Genre.objects.create(name='Драма', slug='drama')
+        search(client, 'солярис')
+        response = admin_client.post('/api/v1/titles/', {
+            'name': 'Солярис', 'year': 1972,
+            'genre': ['drama'], 'category': 'movie',
+        })
+        assert response.status_code == 201, response.json()
+        assert search(client, 'солярис') == ['Солярис']
@@ -0,0 +1,49 @@
+import os
+import runpy
+from urllib.parse import urlparse
+
+import pytest
+from django.conf import settings
+from reviews.management.commands.benchmark_serving import http_load
+
+from .fixtures.fixture_data import create_titles
+
+CONFIG = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+
+
+class TestGunicornConfig:
+
+    def test_sync(self, monkeypatch):
+        monkeypatch.delenv('SERVER_MODE', raising=False)
+        monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+        config = runpy.run_path(CONFIG)
+        assert config['wsgi_app'] == 'api_yamdb.wsgi:application'
+        assert 'worker_class' not in config
+        assert config['workers'] == 1, (
+            'Проверьте, что по умолчанию gunicorn запускает один воркер: '
+            'кеши и лимиты живут в памяти процесса'
+        )
+
+    def test_async(self, monkeypatch):
+        monkeypatch.setenv('SERVER_MODE', 'async')
+        monkeypatch.setenv('GUNICORN_WORKERS', '3')
+        config = runpy.run_path(CONFIG)
+        assert config['wsgi_app'] == 'api_yamdb.asgi:application', (
+            'Проверьте, что в режиме async запускается ASGI-приложение'
+        )
+        assert config['worker_class'] == 'uvicorn.workers.UvicornWorker'
+        assert config['workers'] == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_http_load(live_server):
+    create_titles(2)
+    port = urlparse(live_server.url).port
+    result = http_load(
+        port, ['/api/v1/titles/', '/api/v1/genres/'], requests=12,
+        concurrency=3,
+    )
+    assert result['errors'] == 0
+    assert result['requests'] == 12
+    assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+    assert result['throughput_rps'] > 0
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+from django.db import connection, connections
+from rest_framework.test import APIClient
+from users.models import OutgoingEmail, User
+
+from .fixtures.fixture_requests import count_queries, signup
+
+THREADS = 5
+
+
+@pytest.mark.django_db
+class TestSignup:
+
+    def test_new_user_queries(self, client):
+        response, queries = count_queries(signup, client, 'newbie')
+        assert response.status_code == 200, response.json()
+        assert queries <= 3, (
+            'Проверьте, что регистрация нового пользователя выполняет не '
+            'больше трех запросов: поиск, создание пользователя и письма'
+        )
+        assert User.objects.filter(username='newbie').exists()
+
+    def test_repeated_signup_queries(self, client):
+        signup(client, 'newbie')
+        response, queries = count_queries(signup, client, 'newbie')
+        assert response.status_code == 200, response.json()
+        assert queries <= 2, (
+            'Проверьте, что повторная регистрация выполняет не больше двух '
+            'запросов: поиск пользователя и письмо'
+        )
+        assert User.objects.filter(username='newbie').count() == 1
+        assert OutgoingEmail.objects.count() == 2, (
+            'Проверьте, что повторная регистрация снова отправляет код'
+        )
+
+    @pytest.mark.parametrize('username, email, field', [
+        ('newbie', 'other@yamdb.fake', 'username'),
+        ('other', 'newbie@yamdb.fake', 'email'),
+    ])
+    def test_taken(self, client, username, email, field):
+        signup(client, 'newbie')
+        response = signup(client, username, email)
+        assert response.status_code == 400
+        assert list(response.json()) == [field], (
+            f'Проверьте, что занятый другим пользователем {field} '
+            'возвращает ошибку этого поля'
+        )
+
+    def test_username_and_email_of_different_users(self, client):
+        signup(client, 'first')
+        signup(client, 'second')
+        response = signup(client, 'first', 'second@yamdb.fake')
+        assert response.status_code == 400
+        assert set(response.json()) == {'username', 'email'}
+
+    def test_banned_name(self, client):
+        response = signup(client, 'me')
+        assert response.status_code == 400
+        assert 'username' in response.json()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_identical_signups():
+    if connection.vendor == 'sqlite':
+        pytest.skip('SQLite блокирует таблицы при параллельной записи')
+    barrier = threading.Barrier(THREADS)
+    statuses = []
+
+    def submit():
+        try:
+            barrier.wait()
+            statuses.append(signup(APIClient(), 'racer').status_code)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=submit) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * THREADS, (
+        'Проверьте, что одновременные одинаковые регистрации успешны, '
+        f'получено {statuses}'
+    )
+    assert User.objects.filter(username='racer').count() == 1
@@ -0,0 +1,134 @@
+import copy
+
+import pytest
+from users.models import User
+
+from .fixtures.fixture_requests import count_queries, signup
+
+ATTEMPTS = 100
+SIGNUP_QUERIES = 3
+
+
+def set_rate(settings, scope, kind, rate):
+    rates = copy.deepcopy(settings.AUTH_THROTTLE_RATES)
+    rates[scope][kind] = rate
+    settings.AUTH_THROTTLE_RATES = rates
+
+
+def get_token(client, username, ip='10.0.0.1'):
+    return client.post(
+        '/api/v1/auth/token/',
+        {'username': username, 'confirmation_code': 'wrong'},
+        REMOTE_ADDR=ip,
+    )
+
+
+@pytest.mark.django_db
+class TestAuthThrottling:
+
+    def test_signup_flood_from_one_ip(self, client, settings):
+        limit = 30
+        set_rate(settings, 'signup', 'ip', f'{limit}/m')
+        statuses = []
+        queries = 0
+        for number in range(ATTEMPTS):
+            response, executed = count_queries(
+                signup, client, f'bot{number}'
+            )
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                assert not executed, (
+                    'Проверьте, что запрос сверх лимита отклоняется до '
+                    'обращения к БД'
+                )
+                assert 'Retry-After' in response
+            queries += executed
+
+        assert statuses.count(200) == limit, (
+            'Проверьте, что c одного IP проходит не больше '
+            f'{limit} регистраций в минуту'
+        )
+        assert statuses.count(429) == ATTEMPTS - limit
+        assert queries <= limit * SIGNUP_QUERIES, (
+            'Проверьте, что число запросов к БД при потоке регистраций '
+            'ограничено лимитом'
+        )
+        assert User.objects.filter(username__startswith='bot').count() == limit
+
+    def test_signup_limited_by_email(self, client):
+        statuses = [
+            signup(client, f'bot{number}', ip=f'10.0.1.{number}',
+                   email='Victim@yamdb.fake').status_code
+            for number in range(10)
+        ]
+        assert 429 in statuses, (
+            'Проверьте, что регистрации на один email c разных IP '
+            'ограничены'
+        )
+
+    def test_token_limited_by_username(self, client, user):
+        statuses = [
+            get_token(client, user.username, ip=f'10.0.2.{number}')
+            .status_code for number in range(20)
+        ]
+        assert statuses.count(429) == 10, (
+            'Проверьте, что подбор кода подтверждения для одного '
+            'username ограничен'
+        )
+
+    def test_limits_are_per_endpoint(self, client, user, settings):
+        set_rate(settings, 'signup', 'ip', '1/m')
+        assert signup(client, 'first').status_code == 200
+        assert signup(client, 'second').status_code == 429
+        assert get_token(client, user.username).status_code != 429
+
+    def test_cache_backend(self, client, settings):
+        settings.AUTH_THROTTLE_BACKEND = 'api.throttling.CacheBackend'
+        set_rate(settings, 'signup', 'ip', '3/m')
+        statuses = [
+            signup(client, f'bot{number}').status_code for number in range(5)
+        ]
+        assert statuses == [200, 200, 200, 429, 429], (
+            'Проверьте, что лимиты работают c хранением в общем кеше'
+        )
+
+    @pytest.mark.parametrize('backend', [
+        'api.throttling.MemoryBackend', 'api.throttling.CacheBackend',
+    ])
+    def test_rejected_request_not_charged(self, client, settings, backend):
+        settings.AUTH_THROTTLE_BACKEND = backend
+        set_rate(settings, 'signup', 'ip', '1/m')
+        set_rate(settings, 'signup', 'username', '1/m')
+        assert signup(client, 'first', ip='10.0.3.1').status_code == 200
+        assert signup(client, 'second', ip='10.0.3.1').status_code == 429
+        assert signup(client, 'second', ip='10.0.3.2').status_code == 200, (
+            'Проверьте, что отклоненный запрос не расходует остальные '
+            'лимиты'
+        )
+
+    def test_forwarded_for_is_not_trusted(self, client, settings):
+        set_rate(settings, 'signup', 'ip', '2/m')
+        statuses = [
+            client.post(
+                '/api/v1/auth/signup/',
+                {'username': f'bot{number}',
+                 'email': f'bot{number}@yamdb.fake'},
+                HTTP_X_FORWARDED_FOR=f'1.1.1.{number}, 10.0.4.1',
+            ).status_code
+            for number in range(3)
+        ]
+        assert statuses == [200, 200, 429], (
+            'Проверьте, что адрес клиента берется из X-Forwarded-For c '
+            'учетом NUM_PROXIES, а не из подставленного клиентом'
+        )
+
+    @pytest.mark.parametrize('url', [
+        '/api/v1/auth/signup/', '/api/v1/auth/token/',
+    ])
+    @pytest.mark.parametrize('data', [[], 'строка', 1])
+    def test_non_object_body(self, client, url, data):
+        response = client.post(url, data=data, content_type='application/json')
+        assert response.status_code == 400, (
+            f'Проверьте, что тело {data!r} отклоняется проверкой данных, '
+            'а не падает в лимитах'
+        )
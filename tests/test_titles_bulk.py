@@ -0,0 +1,168 @@
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+from reviews.models import Category, Genre, GenreTitle, Title
+
+from .fixtures.fixture_requests import count_queries
+
+URL = '/api/v1/titles/bulk/'
+COUNT = 100
+BULK_QUERIES = 5
+
+
+@pytest.fixture
+def catalogue():
+    categories = [
+        Category.objects.create(name=f'Категория {index}',
+                                slug=f'category-{index}')
+        for index in range(3)
+    ]
+    genres = [
+        Genre.objects.create(name=f'Жанр {index}', slug=f'genre-{index}')
+        for index in range(5)
+    ]
+    return categories, genres
+
+
+def payload(count, start=0):
+    return [
+        {
+            'name': f'Произведение {index}',
+            'year': 2000 + index % 20,
+            'description': 'Описание',
+            'category': f'category-{index % 3}',
+            'genre': [f'genre-{index % 5}', f'genre-{(index + 1) % 5}'],
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def post_queries(client, url, data):
+    response, queries = count_queries(
+        client.post, url, data=data, format='json'
+    )
+    assert response.status_code == 201, response.json()
+    return queries
+
+
+@pytest.mark.django_db
+class TestTitlesBulk:
+
+    def test_create(self, admin_client, catalogue):
+        response = admin_client.post(URL, data=payload(COUNT), format='json')
+        assert response.status_code == 201, (
+            'Проверьте, что POST-запрос администратора к '
+            f'`{URL}` возвращает статус 201'
+        )
+        data = response.json()
+        assert len(data) == COUNT
+        assert data[1]['category'] == 'category-1'
+        assert data[1]['genre'] == ['genre-1', 'genre-2']
+        assert Title.objects.count() == COUNT
+        assert GenreTitle.objects.count() == COUNT * 2
+        title = Title.objects.get(id=data[7]['id'])
+        assert title.name == 'Произведение 7'
+        assert sorted(title.genre.values_list('slug', flat=True)) == [
+            'genre-2', 'genre-3'
+        ]
+
+    def test_per_item_errors(self, admin_client, catalogue):
+        data = payload(4)
+        data[1]['category'] = 'missing'
+        data[2]['genre'] = ['genre-0', 'missing']
+        data[3]['year'] = 3000
+        response = admin_client.post(URL, data=data, format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что пакет c ошибками возвращает статус 400'
+        )
+        errors = response.json()
+        assert len(errors) == 4, (
+            'Проверьте, что ошибки возвращаются по каждому произведению'
+        )
+        assert errors[0] == {}
+        assert list(errors[1]) == ['category']
+        assert list(errors[2]) == ['genre']
+        assert list(errors[3]) == ['year']
+        assert not Title.objects.exists(), (
+            'Проверьте, что при ошибках не создается ни одно произведение'
+        )
+
+    def test_duplicate_genres(self, admin_client, catalogue):
+        data = payload(1)
+        data[0]['genre'] = ['genre-0', 'genre-0']
+        response = admin_client.post(URL, data=data, format='json')
+        assert response.status_code == 201
+        assert GenreTitle.objects.count() == 1
+
+    @pytest.mark.parametrize('data', [{'name': 'Не список'}, ['строка']])
+    def test_invalid_payload(self, admin_client, data):
+        response = admin_client.post(URL, data=data, format='json')
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('field, value', [
+        ('category', ['category-0']),
+        ('category', {'slug': 'category-0'}),
+        ('genre', [{'x': 1}]),
+        ('genre', [['genre-0']]),
+    ])
+    def test_unhashable_slugs(self, admin_client, catalogue, field, value):
+        data = payload(2)
+        data[1][field] = value
+        response = admin_client.post(URL, data=data, format='json')
+        assert response.status_code == 400, (
+            f'Проверьте, что {field}={value!r} отклоняется c ошибкой '
+            'проверки, а не падает'
+        )
+        assert list(response.json()[1]) == [field]
+
+    def test_size_limit(self, admin_client, catalogue, settings):
+        settings.TITLES_BULK_MAX_SIZE = 10
+        response = admin_client.post(URL, data=payload(11), format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что размер пакета ограничен TITLES_BULK_MAX_SIZE'
+        )
+
+    def test_admin_only(self, user_client, moderator_client, catalogue):
+        for not_admin_client in (APIClient(), user_client, moderator_client):
+            response = not_admin_client.post(
+                URL, data=payload(1), format='json'
+            )
+            assert response.status_code in (401, 403), (
+                f'Проверьте, что `{URL}` доступен только администратору'
+            )
+        assert not Title.objects.exists()
+
+    def test_invalidates_list(self, admin_client, catalogue,
+                              django_capture_on_commit_callbacks):
+        assert admin_client.get('/api/v1/titles/').json()['count'] == 0
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.post(URL, data=payload(3), format='json')
+        assert admin_client.get('/api/v1/titles/').json()['count'] == 3, (
+            'Проверьте, что пакетное создание сбрасывает кеш списка '
+            'произведений'
+        )
+
+    def test_queries(self, admin_client, catalogue):
+        queries = post_queries(admin_client, URL, payload(COUNT))
+        budget = BULK_QUERIES
+        if not connection.features.can_return_rows_from_bulk_insert:
+            budget += COUNT
+        assert queries <= budget, (
+            'Проверьте, что slug категорий и жанров разрешаются одним '
+            'запросом на модель, а произведения и жанры вставляются '
+            f'пачками: {queries} запросов на {COUNT} произведений'
+        )
+
+    def test_faster_than_per_item(self, admin_client, catalogue):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            pytest.skip('БД не возвращает id из bulk_create')
+        per_item = sum(
+            post_queries(admin_client, '/api/v1/titles/', item)
+            for item in payload(COUNT)
+        )
+        bulk = post_queries(admin_client, URL, payload(COUNT, COUNT))
+        assert per_item >= bulk * 50, (
+            'Проверьте, что пакетная запись обращается к БД хотя бы в '
+            f'50 раз реже поштучной: {per_item} запросов поштучно, '
+            f'{bulk} пакетом'
+        )
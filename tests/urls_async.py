@@ -0,0 +1,7 @@
+from api.asyncviews import async_reads
+from api.urls import router
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/v1/', include(async_reads(router.urls))),
+]